@@ -0,0 +1,263 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from cliente_http import obtener_cliente
+from metricas import etapa
+
+# Configuración de las alertas (ajustable por variables de entorno)
+ALERTAS_RUTA = os.getenv("ALERTAS_RUTA", "alertas.sqlite")
+# Cambio mínimo de rentabilidad anual, en puntos, para volver a avisar de un contrato
+ALERTA_UMBRAL_CAMBIO = float(os.getenv("ALERTA_UMBRAL_CAMBIO", os.getenv("WATCH_UMBRAL_CAMBIO", "1.0")))
+# Horas tras las que se repite el aviso de un contrato aunque no haya cambiado (0: nunca)
+ALERTA_REPETIR_HORAS = float(os.getenv("ALERTA_REPETIR_HORAS", "24"))
+# Segundos que el envío espera a que lleguen más avisos antes de agruparlos en mensajes
+ALERTAS_LOTE_SEGUNDOS = float(os.getenv("ALERTAS_LOTE_SEGUNDOS", "2"))
+# Si un lote necesita más mensajes que esto, se envía un único mensaje con el detalle adjunto
+ALERTAS_MAX_MENSAJES = int(os.getenv("ALERTAS_MAX_MENSAJES", "3"))
+# Espera máxima al final de la ejecución para los envíos pendientes
+ALERTAS_TIMEOUT_ENVIO = float(os.getenv("ALERTAS_TIMEOUT_ENVIO", "60"))
+
+# Límite de caracteres del contenido de un mensaje de Discord
+DISCORD_MAX_CARACTERES = 2000
+
+
+def clave_contrato(opcion):
+    """Identificador de un contrato o spread: (ticker, vencimiento 'YYYY-MM-DD', strike, strike comprado o 0)."""
+    return opcion.clave
+
+
+def linea_alerta(opcion, motivo):
+    """Línea de un contrato en el mensaje de Discord."""
+    return (f"{opcion.ticker} {opcion.strikes_texto} {opcion.vencimiento_texto} ({opcion.dias_vencimiento}d): "
+            f"rent. anual {opcion.rentabilidad_anual:.2f}%, dif. {opcion.diferencia_porcentual:.2f}%, "
+            f"vol. {opcion.volatilidad_implícita:.2f}%, prima ${opcion.prima:.2f} [{motivo}]")
+
+
+class EstadoAlertas:
+    """Último aviso enviado de cada contrato, por perfil, en SQLite (persiste entre ejecuciones).
+
+    Un contrato se vuelve a avisar si su rentabilidad anual ha cambiado al menos `umbral` puntos
+    desde el último aviso o si han pasado `repetir_horas` (0 para no repetir nunca por tiempo).
+    Los contratos vencidos se purgan al abrir el estado.
+    """
+
+    def __init__(self, ruta=ALERTAS_RUTA, umbral=ALERTA_UMBRAL_CAMBIO, repetir_horas=ALERTA_REPETIR_HORAS):
+        self.ruta = ruta
+        self.umbral = umbral
+        self.repetir_horas = repetir_horas
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        columnas = [fila[1] for fila in self._conexion.execute("PRAGMA table_info(avisos)")]
+        if columnas and "strike_largo" not in columnas:
+            # Estado anterior a los spreads: sus avisos son de puts sueltas (strike_largo = 0)
+            self._conexion.execute("ALTER TABLE avisos RENAME TO avisos_anteriores")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS avisos ("
+            " perfil TEXT NOT NULL, ticker TEXT NOT NULL, vencimiento TEXT NOT NULL, strike REAL NOT NULL,"
+            " strike_largo REAL NOT NULL, rentabilidad REAL NOT NULL, avisado REAL NOT NULL,"
+            " PRIMARY KEY (perfil, ticker, vencimiento, strike, strike_largo))"
+        )
+        if columnas and "strike_largo" not in columnas:
+            self._conexion.execute(
+                "INSERT INTO avisos SELECT perfil, ticker, vencimiento, strike, 0, rentabilidad, avisado FROM avisos_anteriores"
+            )
+            self._conexion.execute("DROP TABLE avisos_anteriores")
+        self._conexion.commit()
+        self.purgar()
+
+    def pendientes(self, perfil, opciones, ahora=None):
+        """[(opción, motivo)] de las opciones nuevas o con cambios relevantes desde su último aviso."""
+        ahora = ahora or time.time()
+        avisados = {}
+        with self._lock:
+            for ticker in {opcion.ticker for opcion in opciones}:
+                for vencimiento, strike, strike_largo, rentabilidad, avisado in self._conexion.execute(
+                    "SELECT vencimiento, strike, strike_largo, rentabilidad, avisado FROM avisos WHERE perfil = ? AND ticker = ?",
+                    (perfil, ticker)
+                ):
+                    avisados[(ticker, vencimiento, round(strike, 4), round(strike_largo, 4))] = (rentabilidad, avisado)
+
+        resultado = []
+        for opcion in opciones:
+            anterior = avisados.get(clave_contrato(opcion))
+            if anterior is None:
+                resultado.append((opcion, "nuevo"))
+                continue
+            rentabilidad, avisado = anterior
+            if abs(opcion.rentabilidad_anual - rentabilidad) >= self.umbral:
+                resultado.append((opcion, f"antes {rentabilidad:.2f}%"))
+            elif self.repetir_horas > 0 and ahora - avisado >= self.repetir_horas * 3600:
+                resultado.append((opcion, f"recordatorio, avisado hace {(ahora - avisado) / 3600:.0f}h"))
+        return resultado
+
+    def registrar(self, perfil, opciones, ahora=None):
+        """Anota como avisadas las opciones (tras enviarlas con éxito)."""
+        ahora = ahora or time.time()
+        with self._lock:
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO avisos (perfil, ticker, vencimiento, strike, strike_largo, rentabilidad, avisado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(perfil, *clave_contrato(opcion), opcion.rentabilidad_anual, ahora) for opcion in opciones]
+            )
+            self._conexion.commit()
+
+    def purgar(self, hoy=None):
+        """Elimina los avisos de contratos ya vencidos."""
+        hoy = (hoy or date.today()).isoformat()
+        with self._lock:
+            borrados = self._conexion.execute("DELETE FROM avisos WHERE vencimiento < ?", (hoy,)).rowcount
+            self._conexion.commit()
+        return borrados
+
+    def resumen(self):
+        with self._lock:
+            return {"contratos": self._conexion.execute("SELECT COUNT(*) FROM avisos").fetchone()[0]}
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+
+def repartir_mensajes(bloques, limite=DISCORD_MAX_CARACTERES):
+    """Como agrupar_mensajes, pero devuelve también qué líneas lleva cada mensaje: [(texto, [(bloque, línea)])]."""
+    mensajes = []
+    actual, posiciones = "", []
+    for indice_bloque, (cabecera, lineas) in enumerate(bloques):
+        encabezado = cabecera + "\n" if cabecera else ""
+        abierto = False
+        for indice_linea, linea in enumerate(lineas):
+            linea = linea[:limite - len(encabezado) - 1]
+            prefijo = "" if abierto else encabezado
+            if actual and len(actual) + 1 + len(prefijo) + len(linea) > limite:
+                mensajes.append((actual, posiciones))
+                actual, posiciones, prefijo = "", [], encabezado
+            actual += ("\n" if actual else "") + prefijo + linea
+            posiciones.append((indice_bloque, indice_linea))
+            abierto = True
+    if actual:
+        mensajes.append((actual, posiciones))
+    return mensajes
+
+
+def agrupar_mensajes(bloques, limite=DISCORD_MAX_CARACTERES):
+    """Reparte las líneas de cada bloque (cabecera, líneas) en el menor número de mensajes de hasta `limite` caracteres.
+
+    Si un bloque continúa en otro mensaje se repite su cabecera (los bloques sin cabecera no la llevan).
+    """
+    return [texto for texto, _ in repartir_mensajes(bloques, limite)]
+
+
+class NotificadorDiscord:
+    """Envía los avisos a un webhook de Discord desde un hilo en segundo plano.
+
+    encolar() no bloquea: el hilo espera ALERTAS_LOTE_SEGUNDOS a que lleguen más avisos y los
+    agrupa en el menor número de mensajes posible (o en uno con el detalle adjunto si serían más
+    de ALERTAS_MAX_MENSAJES). Cada contrato se anota en el EstadoAlertas en cuanto se entrega el
+    mensaje que lo lleva, así que si un envío falla a medias la siguiente ejecución solo repite
+    los que no llegaron. vaciar() espera a que se envíe todo lo encolado.
+    """
+
+    def __init__(self, url, estado, lote_segundos=ALERTAS_LOTE_SEGUNDOS, max_mensajes=ALERTAS_MAX_MENSAJES):
+        self.url = url
+        self.estado = estado
+        self.lote_segundos = lote_segundos
+        self.max_mensajes = max_mensajes
+        self.enviados = 0
+        self.mensajes = 0
+        self.errores = 0
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._trabajar, name="notificador-discord", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, perfil, etiqueta, pendientes):
+        """Encola los avisos [(opción, motivo)] de un perfil; `etiqueta` encabeza sus líneas en el mensaje."""
+        if pendientes:
+            self._cola.put((perfil, etiqueta, pendientes))
+
+    def vaciar(self, timeout=ALERTAS_TIMEOUT_ENVIO):
+        """Espera a que se envíen los avisos encolados; devuelve False si se agota el tiempo."""
+        listo = threading.Event()
+        self._cola.put(listo)
+        return listo.wait(timeout)
+
+    def _trabajar(self):
+        while True:
+            lote = [self._cola.get()]
+            # Agrupar todo lo que llegue durante la ventana, salvo que se pida vaciar
+            limite = time.monotonic() + self.lote_segundos
+            while not isinstance(lote[-1], threading.Event):
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            avisos = [elemento for elemento in lote if not isinstance(elemento, threading.Event)]
+            if avisos:
+                try:
+                    self._enviar(avisos)
+                except Exception as e:
+                    self.errores += 1
+                    print(f"Error al enviar los avisos a Discord: {e}")
+            for elemento in lote:
+                if isinstance(elemento, threading.Event):
+                    elemento.set()
+
+    def _enviar(self, avisos):
+        # Un bloque por perfil con sus contratos en orden de llegada
+        por_perfil = {}
+        for perfil, etiqueta, pendientes in avisos:
+            por_perfil.setdefault((perfil, etiqueta), []).extend(pendientes)
+        total = sum(len(pendientes) for pendientes in por_perfil.values())
+        tickers = sorted({opcion.ticker for pendientes in por_perfil.values() for opcion, _ in pendientes})
+        cabecera = f"Oportunidades nuevas o con cambios que cumplen los filtros de alerta ({total}): {', '.join(tickers)}"
+        bloques = [(etiqueta or "", [linea_alerta(opcion, motivo) for opcion, motivo in pendientes])
+                   for (_, etiqueta), pendientes in por_perfil.items()]
+        mensajes = repartir_mensajes([("", [cabecera])] + bloques)
+        adjunto = len(mensajes) > self.max_mensajes
+        claves = list(por_perfil)
+
+        cliente = obtener_cliente()
+        with etapa("discord") as medida:
+            medida["filas_entrada"] = total
+            if adjunto:
+                detalle = "\n\n".join(f"{etiqueta}\n" + "\n".join(linea_alerta(o, m) for o, m in pendientes)
+                                      for (_, etiqueta), pendientes in por_perfil.items())
+                respuesta = cliente.post(self.url, data={"content": cabecera[:DISCORD_MAX_CARACTERES]},
+                                         files={"file": ("alertas.txt", detalle.encode("utf-8"), "text/plain")})
+                respuesta.raise_for_status()
+                self.mensajes += 1
+                medida["filas_salida"] = self._registrar({clave: [opcion for opcion, _ in pendientes]
+                                                          for clave, pendientes in por_perfil.items()})
+            else:
+                for mensaje, posiciones in mensajes:
+                    respuesta = cliente.post(self.url, json={"content": mensaje})
+                    respuesta.raise_for_status()
+                    self.mensajes += 1
+                    # El bloque 0 es la cabecera general; el resto, uno por perfil en el orden de `claves`
+                    entregados = {}
+                    for indice_bloque, indice_linea in posiciones:
+                        if indice_bloque > 0:
+                            clave = claves[indice_bloque - 1]
+                            entregados.setdefault(clave, []).append(por_perfil[clave][indice_linea][0])
+                    medida["filas_salida"] += self._registrar(entregados)
+
+        print(f"Avisos enviados a Discord: {total} contratos en {1 if adjunto else len(mensajes)} mensaje(s)"
+              f"{' con el detalle adjunto' if adjunto else ''}.")
+
+    def _registrar(self, entregados):
+        """Anota en el estado los contratos {(perfil, etiqueta): [opción]} ya entregados; devuelve cuántos son."""
+        total = 0
+        for (perfil, _), opciones in entregados.items():
+            self.estado.registrar(perfil, opciones)
+            total += len(opciones)
+        self.enviados += total
+        return total
+
+    def resumen(self):
+        return {"contratos_enviados": self.enviados, "mensajes": self.mensajes, "errores": self.errores}
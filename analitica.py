@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+
+# Tipo libre de riesgo anual usado en Black-Scholes (ajustable por variable de entorno)
+TASA_LIBRE_RIESGO = float(os.getenv("TASA_LIBRE_RIESGO", "0.04"))
+
+# Límites y tolerancia del cálculo de volatilidad implícita (en tanto por uno)
+VOLATILIDAD_MINIMA = 1e-4
+VOLATILIDAD_MAXIMA = 5.0
+TOLERANCIA_PRECIO = 1e-5
+MAX_ITERACIONES = 50
+
+
+def cdf_normal(x):
+    """Función de distribución normal estándar, vectorizada (Abramowitz-Stegun 7.1.26, error < 1.5e-7)."""
+    x = np.asarray(x, dtype=float)
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    polinomio = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - polinomio * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+def pdf_normal(x):
+    """Densidad normal estándar, vectorizada."""
+    x = np.asarray(x, dtype=float)
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+def _d1_d2(precio, strike, t, volatilidad, tasa):
+    raiz_t = np.sqrt(t)
+    d1 = (np.log(precio / strike) + (tasa + 0.5 * volatilidad ** 2) * t) / (volatilidad * raiz_t)
+    return d1, d1 - volatilidad * raiz_t
+
+
+def precio_put(precio, strike, t, volatilidad, tasa=TASA_LIBRE_RIESGO):
+    """Precio Black-Scholes de una put europea. `t` en años y volatilidad en tanto por uno."""
+    d1, d2 = _d1_d2(precio, strike, t, volatilidad, tasa)
+    return strike * np.exp(-tasa * t) * cdf_normal(-d2) - precio * cdf_normal(-d1)
+
+
+def griegas_put(precio, strike, t, volatilidad, tasa=TASA_LIBRE_RIESGO):
+    """Delta, theta (por día natural) y vega (por punto de volatilidad) de una put comprada."""
+    precio, strike, t, volatilidad = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (precio, strike, t, volatilidad)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1, d2 = _d1_d2(precio, strike, t, volatilidad, tasa)
+        densidad = pdf_normal(d1)
+        raiz_t = np.sqrt(t)
+        delta = cdf_normal(d1) - 1.0
+        theta = (-precio * densidad * volatilidad / (2 * raiz_t) + tasa * strike * np.exp(-tasa * t) * cdf_normal(-d2)) / 365
+        vega = precio * densidad * raiz_t / 100
+    return delta, theta, vega
+
+
+def probabilidad_por_encima(precio, nivel, t, volatilidad, tasa=TASA_LIBRE_RIESGO):
+    """Probabilidad (riesgo neutral) de que el subyacente termine por encima de `nivel` al vencimiento.
+
+    Para una put vendida con nivel = break-even es la probabilidad de cerrar con beneficio.
+    """
+    precio, nivel, t, volatilidad = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (precio, nivel, t, volatilidad)))
+    probabilidad = np.ones_like(precio)
+    positivo = nivel > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _, d2 = _d1_d2(precio[positivo], nivel[positivo], t[positivo], volatilidad[positivo], tasa)
+    probabilidad[positivo] = cdf_normal(d2)
+    return probabilidad
+
+
+def volatilidad_implicita_put(prima, precio, strike, t, tasa=TASA_LIBRE_RIESGO):
+    """Volatilidad implícita (tanto por uno) de una cadena completa de puts a la vez.
+
+    Newton-Raphson vectorizado con intervalo de seguridad: si un paso sale del intervalo en el
+    que está la solución o la vega es despreciable, se usa bisección en ese contrato. Las primas
+    fuera de los límites de arbitraje (por debajo del valor intrínseco descontado o por encima
+    del strike descontado) devuelven NaN.
+    """
+    prima, precio, strike, t = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (prima, precio, strike, t)))
+    descuento = np.exp(-tasa * t)
+    valida = (prima > 0) & (t > 0) & (prima > np.maximum(strike * descuento - precio, 0.0)) & (prima < strike * descuento)
+    resultado = np.full(prima.shape, np.nan)
+    if not valida.any():
+        return resultado
+
+    c, s, k, tt = prima[valida], precio[valida], strike[valida], t[valida]
+    inferior = np.full(c.shape, VOLATILIDAD_MINIMA)
+    superior = np.full(c.shape, VOLATILIDAD_MAXIMA)
+    # Aproximación inicial de Brenner-Subrahmanyam
+    sigma = np.clip(np.sqrt(2 * np.pi / tt) * c / s, 0.05, 2.0)
+    for _ in range(MAX_ITERACIONES):
+        diferencia = precio_put(s, k, tt, sigma, tasa) - c
+        pendientes = np.abs(diferencia) > TOLERANCIA_PRECIO
+        if not pendientes.any():
+            break
+        # El precio de la put crece con la volatilidad: se estrecha el intervalo por el lado correcto
+        superior = np.where(diferencia > 0, sigma, superior)
+        inferior = np.where(diferencia < 0, sigma, inferior)
+        d1, _ = _d1_d2(s, k, tt, sigma, tasa)
+        vega = s * pdf_normal(d1) * np.sqrt(tt)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = sigma - diferencia / vega
+        fuera = ~np.isfinite(newton) | (newton <= inferior) | (newton >= superior)
+        sigma = np.where(pendientes, np.where(fuera, 0.5 * (inferior + superior), newton), sigma)
+    sigma[np.abs(precio_put(s, k, tt, sigma, tasa) - c) > TOLERANCIA_PRECIO] = np.nan
+    resultado[valida] = sigma
+    return resultado
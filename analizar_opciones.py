@@ -1,236 +1,410 @@
-import yfinance as yf
+"""Análisis de opciones PUT: descarga, combinación, filtrado, informes y avisos.
+
+Importar este módulo carga pandas y numpy, que usan casi todas sus funciones; tabulate solo se
+carga al renderizar. El punto de entrada rápido es cli.py, que solo importa este módulo en los
+subcomandos que analizan o reducen.
+"""
 from datetime import datetime
+from dataclasses import replace
+import glob
+import json
 import os
-from tabulate import tabulate
 import pandas as pd
-import requests
+import numpy as np
+import sys
 import time
-
-# Configuración para Discord - Forzado directamente
-DISCORD_WEBHOOK_URL = "https://discord.com/api/webhooks/1350463523196768356/ePmWnO2XWnfD582oMAr2WzqSFs7ZxU1ApRYi1bz8PiSbZE5zAcR7ZoOD8SPVofxA9UUW"
-print(f"[DEBUG] Valor inicial de DISCORD_WEBHOOK_URL: {DISCORD_WEBHOOK_URL}")  # Depuración inicial
+import hashlib
+import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from alertas import ALERTAS_TIMEOUT_ENVIO, EstadoAlertas, NotificadorDiscord
+from analitica import griegas_put, probabilidad_por_encima, volatilidad_implicita_put
+from archivo_cadenas import ARCHIVO_ACTIVO, ARCHIVO_DIAS_VENCIMIENTO, ARCHIVO_LADO, ArchivoCadenas
+from cache_opciones import CACHE_TTL_SEGUNDOS, CacheOpciones
+from cliente_http import obtener_cliente
+from contratos import CAMPOS, TIPOS, contrato_de_textos, contratos_de_tabla
+from configuracion import diferencias_perfil, filtros_envolventes, obtener_configuracion
+from estrategias import pares_bull_put
+from fragmentos import (DIRECTORIO_PARCIALES, PARCIAL_META, PARCIALES, cargar_pesos, directorio_fragmento, guardar_pesos,
+                        ordenar_por_peso, pesos_de_metricas, tickers_del_fragmento)
+from informes import (FORMATOS, SalidaCSV, SalidaContratos, SalidaTexto, eliminar_si_existe, formatos_exportacion,
+                      ruta_de_perfil)
+from metricas import METRICAS, METRICAS_RUTA, etapa, tamano_en_memoria
+from proveedores import CAMPOS_RESPALDO, cadena_vacia, crear_proveedores
+from ranking import RankingTopK
+
+# Configuración para Discord - Forzado directamente (la variable DISCORD_WEBHOOK_URL lo sustituye)
+DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL") or "https://discord.com/api/webhooks/1350463523196768356/ePmWnO2XWnfD582oMAr2WzqSFs7ZxU1ApRYi1bz8PiSbZE5zAcR7ZoOD8SPVofxA9UUW"
 
 # Variable para evitar ejecuciones múltiples
 SCRIPT_EJECUTADO = False
 ENVIAR_NOTIFICACION_MANUAL = False  # Cambia a True/false para forzar la notificación manualmente
 
-# Configuraciones por defecto (ajustables manualmente)
-DEFAULT_CONFIG = {
-    "TICKERS": "WBD,UNFI,GOOGL,EPAM,NFE,GLNG,GLOB,NVDA",
-    "MIN_RENTABILIDAD_ANUAL": 45.0,
-    "MAX_DIAS_VENCIMIENTO": 45,
-    "MIN_DIFERENCIA_PORCENTUAL": 5.0,
-    "MIN_VOLUMEN": 1,
-    "MIN_VOLATILIDAD_IMPLICITA": 35.0,
-    "MIN_OPEN_INTEREST": 1,
-    "FILTRO_TIPO_OPCION": "OTM",
-    "TOP_CONTRATOS": 5,
-    "ALERTA_RENTABILIDAD_ANUAL": 50.0,
-    "ALERTA_VOLATILIDAD_MINIMA": 50.0,
-    "MIN_BID": 0.99
-}
-
-# Clave API de Finnhub
-FINNHUB_API_KEY = "cvbfudhr01qob7udcs1gcvbfudhr01qob7udcs20"
-
-def obtener_configuracion():
-    """Obtiene la configuración desde variables de entorno con valores por defecto del script."""
-    print(f"[DEBUG] Configuración inicial - DISCORD_WEBHOOK_URL: {DISCORD_WEBHOOK_URL}")  # Depuración
-    # TICKERS
-    TICKERS = os.getenv("TICKERS", DEFAULT_CONFIG["TICKERS"])
-    print(f"Valor de TICKERS desde os.getenv: {TICKERS}")
-    if not TICKERS:
-        raise ValueError("No se especificaron tickers válidos. Define TICKERS en las variables de entorno.")
-    TICKERS = [t.strip() for t in TICKERS.split(",") if t.strip()]  # Eliminar espacios y elementos vacíos
-    TICKERS = list(set(TICKERS))  # Eliminar duplicados
-    if not TICKERS:
-        raise ValueError("La lista de tickers está vacía después de procesar.")
-    print(f"Tickers procesados: {TICKERS}")
-
-    # MIN_RENTABILIDAD_ANUAL
-    min_rentabilidad_env = os.getenv("MIN_RENTABILIDAD_ANUAL", str(DEFAULT_CONFIG["MIN_RENTABILIDAD_ANUAL"]))
-    MIN_RENTABILIDAD_ANUAL = float(min_rentabilidad_env) if min_rentabilidad_env else DEFAULT_CONFIG["MIN_RENTABILIDAD_ANUAL"]
-    print(f"MIN_RENTABILIDAD_ANUAL: {MIN_RENTABILIDAD_ANUAL}")
-
-    # MAX_DIAS_VENCIMIENTO
-    max_dias_env = os.getenv("MAX_DIAS_VENCIMIENTO", str(DEFAULT_CONFIG["MAX_DIAS_VENCIMIENTO"]))
-    MAX_DIAS_VENCIMIENTO = int(max_dias_env) if max_dias_env else DEFAULT_CONFIG["MAX_DIAS_VENCIMIENTO"]
-    print(f"MAX_DIAS_VENCIMIENTO: {MAX_DIAS_VENCIMIENTO}")
-
-    # MIN_DIFERENCIA_PORCENTUAL
-    min_dif_env = os.getenv("MIN_DIFERENCIA_PORCENTUAL", str(DEFAULT_CONFIG["MIN_DIFERENCIA_PORCENTUAL"]))
-    MIN_DIFERENCIA_PORCENTUAL = float(min_dif_env) if min_dif_env else DEFAULT_CONFIG["MIN_DIFERENCIA_PORCENTUAL"]
-    print(f"MIN_DIFERENCIA_PORCENTUAL: {MIN_DIFERENCIA_PORCENTUAL}")
-
-    # MIN_VOLUMEN (hardcodeado)
-    MIN_VOLUMEN = DEFAULT_CONFIG["MIN_VOLUMEN"]
-    print(f"MIN_VOLUMEN: {MIN_VOLUMEN}")
-
-    # MIN_VOLATILIDAD_IMPLICITA
-    min_vol_env = os.getenv("MIN_VOLATILIDAD_IMPLICITA", str(DEFAULT_CONFIG["MIN_VOLATILIDAD_IMPLICITA"]))
-    MIN_VOLATILIDAD_IMPLICITA = float(min_vol_env) if min_vol_env else DEFAULT_CONFIG["MIN_VOLATILIDAD_IMPLICITA"]
-    print(f"MIN_VOLATILIDAD_IMPLICITA: {MIN_VOLATILIDAD_IMPLICITA}")
-
-    # MIN_OPEN_INTEREST (hardcodeado)
-    MIN_OPEN_INTEREST = DEFAULT_CONFIG["MIN_OPEN_INTEREST"]
-    print(f"MIN_OPEN_INTEREST: {MIN_OPEN_INTEREST}")
-
-    # FILTRO_TIPO_OPCION
-    FILTRO_TIPO_OPCION = os.getenv("FILTRO_TIPO_OPCION", DEFAULT_CONFIG["FILTRO_TIPO_OPCION"]).upper()
-    if FILTRO_TIPO_OPCION not in ["OTM", "ITM", "TODAS"]:
-        print(f"Valor inválido para FILTRO_TIPO_OPCION: {FILTRO_TIPO_OPCION}. Usando valor por defecto: {DEFAULT_CONFIG['FILTRO_TIPO_OPCION']}")
-        FILTRO_TIPO_OPCION = DEFAULT_CONFIG["FILTRO_TIPO_OPCION"]
-    print(f"FILTRO_TIPO_OPCION: {FILTRO_TIPO_OPCION}")
-
-    # TOP_CONTRATOS
-    top_contratos_env = os.getenv("TOP_CONTRATOS", str(DEFAULT_CONFIG["TOP_CONTRATOS"]))
-    TOP_CONTRATOS = int(top_contratos_env) if top_contratos_env else DEFAULT_CONFIG["TOP_CONTRATOS"]
-    print(f"TOP_CONTRATOS: {TOP_CONTRATOS}")
-
-    # ALERTA_RENTABILIDAD_ANUAL (hardcodeado)
-    ALERTA_RENTABILIDAD_ANUAL = DEFAULT_CONFIG["ALERTA_RENTABILIDAD_ANUAL"]
-    print(f"ALERTA_RENTABILIDAD_ANUAL: {ALERTA_RENTABILIDAD_ANUAL}")
-
-    # ALERTA_VOLATILIDAD_MINIMA (hardcodeado)
-    ALERTA_VOLATILIDAD_MINIMA = DEFAULT_CONFIG["ALERTA_VOLATILIDAD_MINIMA"]
-    print(f"ALERTA_VOLATILIDAD_MINIMA: {ALERTA_VOLATILIDAD_MINIMA}")
-
-    # MIN_BID (nueva variable)
-    min_bid_env = os.getenv("MIN_BID", str(DEFAULT_CONFIG["MIN_BID"]))
-    MIN_BID = float(min_bid_env) if min_bid_env else DEFAULT_CONFIG["MIN_BID"]
-    print(f"MIN_BID: {MIN_BID}")
-
-    return (TICKERS, MIN_RENTABILIDAD_ANUAL, MAX_DIAS_VENCIMIENTO, MIN_DIFERENCIA_PORCENTUAL,
-            MIN_VOLUMEN, MIN_VOLATILIDAD_IMPLICITA, MIN_OPEN_INTEREST,
-            FILTRO_TIPO_OPCION, TOP_CONTRATOS, ALERTA_RENTABILIDAD_ANUAL, ALERTA_VOLATILIDAD_MINIMA, MIN_BID)
+# Caché de instantáneas en disco (se inicializa en analizar_opciones)
+CACHE = None
+
+# Cotizaciones del subyacente resueltas en lote para la ejecución actual (ticker -> datos)
+COTIZACIONES = {}
+
+# Modo vigilancia: intervalo entre ciclos y cambio mínimo de rentabilidad anual (puntos) para volver a avisar
+WATCH_INTERVALO_SEGUNDOS = int(os.getenv("WATCH_INTERVALO_SEGUNDOS", "300"))
+
+# Presupuesto de tiempo de cada ticker y plazo de toda la ejecución, en segundos (0: sin límite).
+# Un ticker que agota su tiempo queda como parcial o con tiempo agotado y el informe continúa.
+PRESUPUESTO_TICKER_SEGUNDOS = float(os.getenv("PRESUPUESTO_TICKER_SEGUNDOS", "120"))
+PLAZO_EJECUCION_SEGUNDOS = float(os.getenv("PLAZO_EJECUCION_SEGUNDOS", "0"))
+
+# Estado del modo vigilancia entre ciclos (None fuera de ese modo):
+# resultados filtrados por (ticker, vencimiento)
+MEMO_FILTRADO = None
+
+# Avisos ya enviados (persistentes) y envío a Discord en segundo plano; se abren al primer aviso
+ALERTAS = None
+NOTIFICADOR = None
+
+# Directorio de los informes; los fragmentos escriben los suyos en parciales/fragmento_NNN
+DIRECTORIO_INFORMES = os.getenv("DIRECTORIO_INFORMES", ".")
+DIRECTORIO_EJECUCION = DIRECTORIO_INFORMES
+
+# Archivo histórico de cadenas (se inicializa en analizar_opciones; None si está desactivado)
+ARCHIVO = None
+
+# Proveedores de datos en orden de prioridad (se inicializan en analizar_opciones)
+PROVEEDORES = []
+
+def ruta_informe(nombre):
+    """Ruta de un informe de la ejecución en curso."""
+    return os.path.join(DIRECTORIO_EJECUCION, nombre)
+
+def con_cache(ticker, fuente, vencimiento, cargar):
+    """Devuelve la instantánea desde la caché si está activa; si no, la obtiene con cargar()."""
+    if CACHE is None:
+        return cargar()
+    return CACHE.recuperar(ticker, fuente, vencimiento, cargar)
+
+def con_cache_proveedor(proveedor, ticker, vencimiento, cargar):
+    """Como con_cache, pero sin caché para los proveedores que no la admiten (p. ej. el sintético)."""
+    if not proveedor.cacheable:
+        return cargar()
+    return con_cache(ticker, proveedor.nombre, vencimiento, cargar)
+
+def precargar_cotizaciones(tickers):
+    """Resuelve precio, mínimo y máximo de 52 semanas de todos los tickers en lote.
+
+    Cada proveedor recibe en una sola llamada los tickers que sigan pendientes (Yahoo Finance usa
+    una descarga conjunta del histórico diario en lugar de stock.info por ticker). Los resultados
+    quedan en COTIZACIONES para el resto de la ejecución y en la caché; los tickers que falten se
+    resuelven después uno a uno en obtener_datos_subyacente.
+    """
+    # Sin proveedores cacheables (p. ej. solo el sintético) consultar la caché solo sumaría fallos
+    usar_cache = CACHE is not None and any(proveedor.cacheable for proveedor in PROVEEDORES)
+    pendientes = []
+    for ticker in tickers:
+        datos = CACHE.obtener(ticker, "subyacente") if usar_cache else None
+        if datos is not None:
+            COTIZACIONES[ticker] = datos
+        else:
+            pendientes.append(ticker)
+    total = len(pendientes)
+
+    for proveedor in PROVEEDORES:
+        if not pendientes:
+            break
+        if proveedor.cacheable and CACHE is not None and CACHE.offline:
+            continue
+        try:
+            lote = proveedor.cotizaciones(pendientes)
+        except Exception as e:
+            print(f"Error en la descarga en lote de cotizaciones de {proveedor.nombre}: {e}")
+            continue
+        for ticker, datos in lote.items():
+            COTIZACIONES[ticker] = datos
+            if proveedor.cacheable and CACHE is not None:
+                CACHE.guardar(ticker, "subyacente", "", datos)
+        pendientes = [ticker for ticker in pendientes if ticker not in COTIZACIONES]
+
+    if total:
+        print(f"Cotizaciones en lote: {total - len(pendientes)} de {total} tickers"
+              + (f" (se consultarán por separado: {', '.join(pendientes)})" if pendientes else ""))
 
 def obtener_datos_subyacente(ticker):
-    """Obtiene el precio del subyacente, mínimo y máximo de 52 semanas."""
+    """Obtiene el precio del subyacente, mínimo y máximo de 52 semanas.
+
+    Usa la cotización precargada en lote si existe; si no, la pide al primer proveedor que
+    ofrezca cotizaciones.
+    """
     if not ticker:
         raise ValueError("El ticker no puede estar vacío.")
-    stock = yf.Ticker(ticker)
-    precio = stock.info.get('regularMarketPrice', None)
-    minimo_52_semanas = stock.info.get('fiftyTwoWeekLow', None)
-    maximo_52_semanas = stock.info.get('fiftyTwoWeekHigh', None)
-    if precio is None or minimo_52_semanas is None or maximo_52_semanas is None:
-        raise ValueError(f"No se encontraron datos válidos para el subyacente {ticker}")
-    return stock, precio, minimo_52_semanas, maximo_52_semanas
-
-def obtener_opciones_yahoo(stock):
-    """Obtiene las opciones PUT desde Yahoo Finance."""
+    if ticker not in COTIZACIONES:
+        errores = []
+        for proveedor in PROVEEDORES:
+            try:
+                if proveedor.cacheable:
+                    datos = con_cache(ticker, "subyacente", "", lambda: proveedor.cotizacion(ticker))
+                else:
+                    datos = proveedor.cotizacion(ticker)
+            except NotImplementedError:
+                continue
+            except Exception as e:
+                errores.append(f"{proveedor.nombre}: {e}")
+                continue
+            COTIZACIONES[ticker] = datos
+            break
+        else:
+            detalle = f" ({'; '.join(errores)})" if errores else ""
+            raise ValueError(f"No se encontraron datos válidos para el subyacente {ticker}{detalle}")
+    datos = COTIZACIONES[ticker]
+    return datos["precio"], datos["minimo_52_semanas"], datos["maximo_52_semanas"]
+
+# Contadores de la poda de cadenas (vencimientos no descargados y filas descartadas al parsear)
+ESTADISTICAS_PODA = {"vencimientos_omitidos": 0, "filas_descartadas": 0}
+_LOCK_PODA = threading.Lock()
+
+def registrar_poda(vencimientos_omitidos=0, filas_descartadas=0):
+    with _LOCK_PODA:
+        ESTADISTICAS_PODA["vencimientos_omitidos"] += vencimientos_omitidos
+        ESTADISTICAS_PODA["filas_descartadas"] += filas_descartadas
+
+def dias_hasta_vencimiento(vencimiento_str, ahora=None):
+    """Días naturales hasta el vencimiento, con el mismo redondeo que el filtro."""
+    return (datetime.strptime(vencimiento_str, "%Y-%m-%d") - (ahora or datetime.now())).days
+
+def vencimiento_en_rango(vencimiento_str, filtros, ahora=None):
+    """Indica si un vencimiento cae dentro de la ventana (0, MAX_DIAS_VENCIMIENTO]."""
+    dias = dias_hasta_vencimiento(vencimiento_str, ahora)
+    return 0 < dias <= filtros["MAX_DIAS_VENCIMIENTO"]
+
+def mascara_vencimiento_y_strike(cadena, filtros, precio_subyacente=None, ahora=None):
+    """Máscara de las filas dentro de la ventana de vencimiento y del lado OTM/ITM pedido.
+
+    Devuelve la máscara y los días al vencimiento de cada fila. Si no se conoce el precio del
+    subyacente solo se aplica la ventana de vencimiento.
+    """
+    strike = cadena["strike"].astype(float)
+    vencimientos = pd.to_datetime(cadena["expirationDate"], format="%Y-%m-%d")
+    dias_vencimiento = (vencimientos - pd.Timestamp(ahora or datetime.now())).dt.days
+
+    mascara = (dias_vencimiento > 0) & (dias_vencimiento <= filtros["MAX_DIAS_VENCIMIENTO"])
+    if precio_subyacente is not None:
+        if filtros["FILTRO_TIPO_OPCION"] == "OTM":
+            mascara &= strike < precio_subyacente
+        elif filtros["FILTRO_TIPO_OPCION"] == "ITM":
+            mascara &= strike >= precio_subyacente
+    return mascara, dias_vencimiento
+
+def podar_cadena(cadena, filtros=None, precio_subyacente=None):
+    """Descarta al parsear las filas que el filtro rechazaría igualmente por vencimiento o strike."""
+    if filtros is None or cadena.empty:
+        return cadena
+    mascara, _ = mascara_vencimiento_y_strike(cadena, filtros, precio_subyacente)
+    descartadas = int((~mascara).sum())
+    if descartadas:
+        registrar_poda(filas_descartadas=descartadas)
+    return cadena[mascara]
+
+def _lanzar(ejecutor, funcion, *args):
+    """Envía la tarea al ejecutor o, sin ejecutor, la ejecuta en el acto; siempre devuelve un futuro."""
+    if ejecutor is not None:
+        return ejecutor.submit(funcion, *args)
+    futuro = Future()
     try:
-        fechas_vencimiento = stock.options
-        opciones_put = []
-        for fecha in fechas_vencimiento:
-            opcion = stock.option_chain(fecha)
-            puts = opcion.puts
-            for _, put in puts.iterrows():
-                opciones_put.append({
-                    "strike": float(put["strike"]),
-                    "lastPrice": float(put["lastPrice"]),
-                    "bid": float(put.get("bid", 0) or 0),
-                    "expirationDate": fecha,
-                    "volume": put.get("volume", 0) or 0,
-                    "impliedVolatility": (put.get("impliedVolatility", 0) or 0) * 100,
-                    "openInterest": put.get("openInterest", 0) or 0,
-                    "source": "Yahoo Finance"
-                })
-        print(f"Se obtuvieron {len(opciones_put)} opciones PUT de Yahoo Finance para {stock.ticker}")
-        return opciones_put, "Yahoo Finance", None
+        futuro.set_result(funcion(*args))
     except Exception as e:
-        print(f"Error al obtener opciones de Yahoo Finance para {stock.ticker}: {e}")
-        return [], "Yahoo Finance", str(e)
+        futuro.set_exception(e)
+    return futuro
 
-def obtener_opciones_finnhub(ticker):
-    """Obtiene las opciones PUT desde Finnhub como respaldo."""
-    url = f"https://finnhub.io/api/v1/stock/option-chain?symbol={ticker}&token={FINNHUB_API_KEY}"
+class TiempoAgotado(Exception):
+    """Un ticker ha agotado su presupuesto de tiempo o la ejecución su plazo."""
+
+def calcular_limite(segundos, plazo=None):
+    """Instante (time.monotonic()) en que se cumplen `segundos` desde ahora, sin pasar de `plazo`; None si no hay límite."""
+    limite = time.monotonic() + segundos if segundos > 0 else None
+    if plazo is None:
+        return limite
+    return plazo if limite is None else min(limite, plazo)
+
+def segundos_restantes(limite):
+    """Segundos que quedan hasta `limite` (None si no hay límite)."""
+    return None if limite is None else max(0.0, limite - time.monotonic())
+
+def esperar_resultado(futuro, limite):
+    """Resultado del futuro esperando como mucho hasta `limite`; si no llega a tiempo lo cancela y lanza TiempoAgotado.
+
+    Un hilo no se puede interrumpir: si la tarea ya había empezado sigue en segundo plano hasta que
+    termine y su resultado se descarta; si aún no había empezado ya no se ejecuta.
+    """
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        opciones_put = []
-        for expiration in data.get("data", []):
-            fecha = expiration["expirationDate"]
-            for option in expiration["options"]["PUT"]:
-                opciones_put.append({
-                    "strike": float(option["strike"]),
-                    "lastPrice": float(option.get("last", 0) or 0),
-                    "bid": float(option.get("bid", 0) or 0),
-                    "expirationDate": fecha,
-                    "volume": option.get("volume", 0) or 0,
-                    "impliedVolatility": (option.get("impliedVolatility", 0) or 0) * 100,
-                    "openInterest": option.get("openInterest", 0) or 0,
-                    "source": "Finnhub"
-                })
-        print(f"Se obtuvieron {len(opciones_put)} opciones PUT de Finnhub para {ticker}")
-        return opciones_put, "Finnhub", None
-    except requests.exceptions.RequestException as e:
-        print(f"Error al obtener datos de Finnhub para {ticker}: {e}")
-        return [], "Finnhub", str(e)
-
-def combinar_opciones(opciones_yahoo, opciones_finnhub):
-    """Combina opciones de Yahoo Finance y Finnhub, usando Finnhub como respaldo para campos faltantes."""
-    opciones_combinadas = []
-    opciones_dict = {}  # Diccionario para manejar duplicados (clave: strike + expirationDate)
-
-    # Primero agregar todas las opciones de Yahoo Finance
-    for opcion in opciones_yahoo:
-        key = (opcion["strike"], opcion["expirationDate"])
-        opciones_dict[key] = opcion
-
-    # Luego complementar o reemplazar con datos de Finnhub si hay campos faltantes
-    for opcion in opciones_finnhub:
-        key = (opcion["strike"], opcion["expirationDate"])
-        if key not in opciones_dict:  # Si no existe, agregar directamente
-            opciones_dict[key] = opcion
-        else:  # Si existe, complementar si faltan datos (por ejemplo, bid es nan)
-            opcion_existente = opciones_dict[key]
-            updated = False
-            if pd.isna(opcion_existente["bid"]) or opcion_existente["bid"] == 0:  # Si bid está ausente o es 0
-                opcion_existente["bid"] = opcion["bid"]  # Actualizar bid desde Finnhub
-                updated = True
-            if pd.isna(opcion_existente["lastPrice"]) or opcion_existente["lastPrice"] == 0:  # Si lastPrice está ausente o es 0
-                opcion_existente["lastPrice"] = opcion["lastPrice"]  # Actualizar lastPrice desde Finnhub
-                updated = True
-            if pd.isna(opcion_existente["volume"]) or opcion_existente["volume"] == 0:  # Si volume está ausente o es 0
-                opcion_existente["volume"] = opcion["volume"]  # Actualizar volume desde Finnhub
-                updated = True
-            if pd.isna(opcion_existente["openInterest"]) or opcion_existente["openInterest"] == 0:  # Si openInterest está ausente o es 0
-                opcion_existente["openInterest"] = opcion["openInterest"]  # Actualizar openInterest desde Finnhub
-                updated = True
-            if pd.isna(opcion_existente["impliedVolatility"]) or opcion_existente["impliedVolatility"] == 0:  # Si impliedVolatility está ausente o es 0
-                opcion_existente["impliedVolatility"] = opcion["impliedVolatility"]  # Actualizar impliedVolatility desde Finnhub
-                updated = True
-            # Si se actualizó algún campo, cambiar la fuente a "Yahoo + Finnhub"
-            if updated:
-                opcion_existente["source"] = "Yahoo + Finnhub"
-
-    opciones_combinadas = list(opciones_dict.values())
-    return opciones_combinadas
-
-def obtener_opciones_put(ticker, stock):
-    """Obtiene las opciones PUT del ticker combinando Yahoo Finance y Finnhub como respaldo."""
-    opciones_yahoo, source_yahoo, error_yahoo = obtener_opciones_yahoo(stock)
-    opciones_finnhub, source_finnhub, error_finnhub = obtener_opciones_finnhub(ticker)
-
-    opciones_combinadas = combinar_opciones(opciones_yahoo, opciones_finnhub)
+        return futuro.result(timeout=segundos_restantes(limite))
+    except TimeoutError:
+        if not futuro.done():
+            futuro.cancel()
+            raise TiempoAgotado()
+        # El TimeoutError era de la propia tarea (p. ej. un socket), no de la espera
+        return futuro.result()
+
+def obtener_vencimientos(proveedor, ticker, filtros=None):
+    """Vencimientos del ticker en el proveedor; con filtros se omiten los que caen fuera de la ventana de días."""
+    with etapa(f"vencimientos {proveedor.nombre}", ticker) as medida:
+        fechas_vencimiento = con_cache_proveedor(proveedor, ticker, "vencimientos", lambda: proveedor.vencimientos(ticker))
+        medida["filas_salida"] = len(fechas_vencimiento)
+    if filtros is not None:
+        fechas_en_rango = [fecha for fecha in fechas_vencimiento if vencimiento_en_rango(fecha, filtros)]
+        omitidos = len(fechas_vencimiento) - len(fechas_en_rango)
+        if omitidos:
+            registrar_poda(vencimientos_omitidos=omitidos)
+            print(f"Se omitieron {omitidos} de {len(fechas_vencimiento)} vencimientos de {proveedor.nombre} para {ticker} (fuera de {filtros['MAX_DIAS_VENCIMIENTO']} días)")
+        fechas_vencimiento = fechas_en_rango
+    return fechas_vencimiento
+
+def obtener_cadena(proveedor, ticker, vencimiento, filtros=None, precio_subyacente=None):
+    """Cadena de PUTs de un vencimiento, desde la caché o el proveedor, podada según los filtros."""
+    with etapa(f"cadena {proveedor.nombre}", ticker) as medida:
+        cadena = con_cache_proveedor(proveedor, ticker, vencimiento, lambda: proveedor.cadena(ticker, vencimiento))
+        medida["filas_entrada"] = len(cadena)
+        medida["bytes"] = tamano_en_memoria(cadena)
+        cadena = podar_cadena(cadena, filtros, precio_subyacente)
+        medida["filas_salida"] = len(cadena)
+    return cadena
+
+# Nombre corto de cada fuente para las etiquetas combinadas ("Yahoo + Finnhub")
+NOMBRES_CORTOS_FUENTES = {"Yahoo Finance": "Yahoo", "Finnhub": "Finnhub"}
+
+# Bits por campo en la columna procedencia (hasta 8 fuentes por combinación)
+BITS_PROCEDENCIA = 3
+
+def combinar_opciones(*fuentes, prioridad=None):
+    """Combina cadenas de cualquier número de fuentes rellenando campos faltantes por prioridad.
+
+    Los contratos se alinean por (ticker, expirationDate, strike) (sin ticker si alguna fuente no lo
+    trae). Por defecto la prioridad es el orden de los argumentos; `prioridad` permite fijarla con
+    una lista de nombres de fuente. Cada campo de CAMPOS_RESPALDO que falta o vale 0 se toma de la
+    primera fuente que lo tenga. Los contratos conservan el orden de la fuente principal y los que
+    solo existen en fuentes secundarias se añaden al final.
+
+    La columna `procedencia` (int16) guarda, en BITS_PROCEDENCIA bits por campo, el índice de la
+    fuente que aportó cada valor; los nombres quedan en attrs["fuentes"] (ver fuente_de_campo).
+    La columna `source` es categórica con la fuente única o la combinación ("Yahoo + Finnhub").
+    """
+    fuentes = [fuente for fuente in fuentes if fuente is not None and not fuente.empty]
+    if not fuentes:
+        return cadena_vacia()
+    nombres = [str(fuente["source"].iloc[0]) for fuente in fuentes]
+    if prioridad is not None:
+        posicion = lambda i: prioridad.index(nombres[i]) if nombres[i] in prioridad else len(prioridad)
+        orden = sorted(range(len(fuentes)), key=posicion)
+        fuentes = [fuentes[i] for i in orden]
+        nombres = [nombres[i] for i in orden]
+
+    clave = ["expirationDate", "strike"]
+    if all("ticker" in fuente.columns for fuente in fuentes):
+        clave = ["ticker"] + clave
+    todas = pd.concat(
+        [fuente.drop_duplicates(clave, keep="last").assign(_fuente=i) for i, fuente in enumerate(fuentes)],
+        ignore_index=True
+    )
+    grupo = todas.groupby(clave, sort=False).ngroup().to_numpy()
+    primeras = ~pd.Series(grupo).duplicated().to_numpy()
+    combinadas = todas[primeras].copy()
+    grupo_base = grupo[primeras]
+    fuente_base = combinadas["_fuente"].to_numpy(dtype=np.int64)
+
+    procedencia = np.zeros(len(combinadas), dtype=np.int64)
+    contribuyentes = np.left_shift(1, fuente_base)
+    for i, campo in enumerate(CAMPOS_RESPALDO):
+        valores = todas[campo].astype(float)
+        validos = valores.where(valores.notna() & (valores != 0))
+        relleno = validos.groupby(grupo).first().reindex(grupo_base).to_numpy()
+        origen = todas["_fuente"].where(validos.notna()).groupby(grupo).first().reindex(grupo_base).to_numpy()
+        sin_dato = np.isnan(relleno)
+        combinadas[campo] = np.where(sin_dato, combinadas[campo].astype(float).to_numpy(), relleno)
+        fuente_campo = np.where(sin_dato, fuente_base, np.nan_to_num(origen)).astype(np.int64)
+        procedencia |= fuente_campo << (BITS_PROCEDENCIA * i)
+        contribuyentes |= np.left_shift(1, fuente_campo)
+
+    etiquetas = {}
+    for mascara in np.unique(contribuyentes):
+        indices = [i for i in range(len(nombres)) if (mascara >> i) & 1]
+        if len(indices) == 1:
+            etiquetas[mascara] = nombres[indices[0]]
+        else:
+            etiquetas[mascara] = " + ".join(NOMBRES_CORTOS_FUENTES.get(nombres[i], nombres[i]) for i in indices)
+    combinadas["source"] = pd.Categorical(pd.Series(contribuyentes).map(etiquetas).to_numpy())
+    combinadas["procedencia"] = procedencia.astype(np.int16)
+    combinadas = combinadas.drop(columns="_fuente").reset_index(drop=True)
+    combinadas.attrs["fuentes"] = nombres
+    return combinadas
+
+def fuente_de_campo(combinadas, campo):
+    """Devuelve, por contrato, el nombre de la fuente que aportó `campo` en combinar_opciones."""
+    codigos = (combinadas["procedencia"].to_numpy(dtype=np.int64) >> (BITS_PROCEDENCIA * CAMPOS_RESPALDO.index(campo))) & ((1 << BITS_PROCEDENCIA) - 1)
+    return pd.Series(codigos, index=combinadas.index).map(dict(enumerate(combinadas.attrs["fuentes"])))
+
+def obtener_opciones_put(ticker, ejecutor=None, filtros=None, precio_subyacente=None, proveedores=None, limite=None):
+    """Obtiene las opciones PUT del ticker de todos los proveedores y las combina por prioridad.
+
+    Con un ejecutor, primero se piden en paralelo las listas de vencimientos de cada proveedor y
+    después todas las cadenas (proveedor, vencimiento) a la vez. Todas las tareas enviadas al
+    ejecutor son hojas, así que el pool no se bloquea esperándose a sí mismo. Un fallo de un
+    proveedor solo afecta a ese proveedor.
+
+    Con `limite` (time.monotonic()) no se espera a ninguna descarga más allá de ese instante: las
+    pendientes se cancelan y se combinan las cadenas que ya hayan llegado. Devuelve la cadena
+    combinada, las fuentes, los errores y la lista de lo que quedó sin descargar por tiempo.
+    """
+    proveedores = proveedores or PROVEEDORES
+    errores = []
+    pendientes = []
+    futuros_vencimientos = [_lanzar(ejecutor, obtener_vencimientos, proveedor, ticker, filtros) for proveedor in proveedores]
+    futuros_cadenas = []
+    for proveedor, futuro in zip(proveedores, futuros_vencimientos):
+        try:
+            fechas_vencimiento = esperar_resultado(futuro, limite)
+        except TiempoAgotado:
+            print(f"Tiempo agotado esperando los vencimientos de {proveedor.nombre} para {ticker}")
+            pendientes.append(f"{proveedor.nombre}: sin vencimientos")
+            continue
+        except Exception as e:
+            print(f"Error al obtener opciones de {proveedor.nombre} para {ticker}: {e}")
+            errores.append(f"{proveedor.nombre}: {e}")
+            continue
+        futuros_cadenas.append((proveedor, [
+            _lanzar(ejecutor, obtener_cadena, proveedor, ticker, fecha, filtros, precio_subyacente)
+            for fecha in fechas_vencimiento
+        ]))
+
+    cadenas = []
+    fuentes_usadas = []
+    for proveedor, futuros in futuros_cadenas:
+        try:
+            fragmentos = [esperar_resultado(futuro, limite) for futuro in futuros]
+        except TiempoAgotado:
+            # Se conservan los vencimientos que ya habían llegado
+            for futuro in futuros:
+                futuro.cancel()
+            fragmentos = [futuro.result() for futuro in futuros
+                          if futuro.done() and not futuro.cancelled() and futuro.exception() is None]
+            faltan = len(futuros) - len(fragmentos)
+            print(f"Tiempo agotado con {faltan} de {len(futuros)} cadenas de {proveedor.nombre} pendientes para {ticker}")
+            pendientes.append(f"{proveedor.nombre}: faltan {faltan} de {len(futuros)} cadenas")
+        except Exception as e:
+            print(f"Error al obtener opciones de {proveedor.nombre} para {ticker}: {e}")
+            errores.append(f"{proveedor.nombre}: {e}")
+            continue
+        cadena = pd.concat(fragmentos, ignore_index=True) if fragmentos else cadena_vacia()
+        print(f"Se obtuvieron {len(cadena)} opciones PUT de {proveedor.nombre} para {ticker}")
+        if not cadena.empty:
+            fuentes_usadas.append(proveedor.nombre)
+            cadenas.append(cadena)
+
+    with etapa("combinacion", ticker) as medida:
+        medida["filas_entrada"] = sum(len(cadena) for cadena in cadenas)
+        opciones_combinadas = combinar_opciones(*cadenas)
+        medida["filas_salida"] = len(opciones_combinadas)
     print(f"Se combinaron {len(opciones_combinadas)} opciones PUT para {ticker}")
 
-    fuentes_usadas = []
-    if opciones_yahoo:
-        fuentes_usadas.append("Yahoo Finance")
-    if opciones_finnhub:
-        fuentes_usadas.append("Finnhub")
     fuentes_texto = " y ".join(fuentes_usadas) if fuentes_usadas else "Ninguna fuente disponible"
-
-    errores = []
-    if error_yahoo:
-        errores.append(f"Yahoo Finance: {error_yahoo}")
-    if error_finnhub:
-        errores.append(f"Finnhub: {error_finnhub}")
     errores_texto = "; ".join(errores) if errores else "Ninguno"
-
-    return opciones_combinadas, fuentes_texto, errores_texto
+    return opciones_combinadas, fuentes_texto, errores_texto, pendientes
 
 def calcular_rentabilidad(precio_put, precio_subyacente, dias_vencimiento):
     """Calcula la rentabilidad diaria y anualizada."""
@@ -247,446 +421,985 @@ def calcular_diferencia_porcentual(precio_subyacente, break_even):
     """Calcula la diferencia porcentual entre el subyacente y el break-even."""
     return ((precio_subyacente - break_even) / precio_subyacente) * 100
 
-def enviar_notificacion_discord(tipo_opcion_texto, top_contratos, tickers_identificados, alerta_rentabilidad_anual, alerta_volatilidad_minima):
-    """Envía el archivo Mejores_Contratos.txt a Discord como un adjunto y menciona los tickers identificados."""
-    print(f"[DEBUG] Dentro de enviar_notificacion_discord - DISCORD_WEBHOOK_URL: {DISCORD_WEBHOOK_URL}")  # Depuración
-    ticker_list = ", ".join(tickers_identificados) if tickers_identificados else "Ninguno"
-    mensaje = f"Se encontraron contratos que cumplen los filtros de alerta para los siguientes tickers: {ticker_list}"
+# Columnas de cada opción que cumple los filtros (mismo orden que las tablas de salida)
+COLUMNAS_FILTRADAS = [
+    "ticker", "strike", "lastPrice", "bid", "vencimiento", "dias_vencimiento",
+    "rentabilidad_diaria", "rentabilidad_anual", "break_even", "diferencia_porcentual",
+    "volatilidad_implícita", "volumen", "open_interest", "delta", "theta", "prob_beneficio", "source"
+]
+
+def completar_volatilidad(opciones_put, mascara, precio_subyacente, dias_vencimiento):
+    """Volatilidad implícita (%) de la cadena; en las filas de `mascara` sin ella se recupera de la prima.
+
+    La prima es el bid o, si no hay bid, el último precio.
+    """
+    bid = opciones_put["bid"].astype(float)
+    volatilidad = opciones_put["impliedVolatility"].astype(float)
+    sin_volatilidad = mascara & ~(volatilidad > 0)
+    if sin_volatilidad.any():
+        prima = bid.where(bid > 0, opciones_put["lastPrice"].astype(float))[sin_volatilidad]
+        volatilidad = volatilidad.copy()
+        volatilidad[sin_volatilidad] = 100 * volatilidad_implicita_put(
+            prima.to_numpy(), precio_subyacente, opciones_put["strike"].astype(float)[sin_volatilidad].to_numpy(),
+            dias_vencimiento[sin_volatilidad].to_numpy() / 365
+        )
+    return volatilidad
+
+def filtrar_opciones(opciones_put, ticker, precio_subyacente, filtros, ahora=None):
+    """Aplica los filtros y calcula rentabilidad, break-even y griegas sobre toda la cadena de una vez.
+
+    Las máscaras OTM/ITM, días al vencimiento, volumen, volatilidad, interés abierto y bid se
+    evalúan por columnas. Si ninguna fuente trae volatilidad implícita se recupera de la prima
+    (bid, o último precio si no hay bid). Rentabilidad, break-even, diferencia %, delta, theta y
+    probabilidad de beneficio se calculan solo para las filas que superan las máscaras.
+    Devuelve un DataFrame con COLUMNAS_FILTRADAS.
+    """
+    if opciones_put.empty:
+        return pd.DataFrame(columns=COLUMNAS_FILTRADAS)
+    strike = opciones_put["strike"].astype(float)
+    bid = opciones_put["bid"].astype(float)
+    mascara, dias_vencimiento = mascara_vencimiento_y_strike(opciones_put, filtros, precio_subyacente, ahora)
+    mascara &= opciones_put["volume"].astype(float) >= filtros["MIN_VOLUMEN"]
+    mascara &= opciones_put["openInterest"].astype(float) >= filtros["MIN_OPEN_INTEREST"]
+    mascara &= bid >= filtros["MIN_BID"]
+
+    volatilidad = completar_volatilidad(opciones_put, mascara, precio_subyacente, dias_vencimiento)
+    mascara &= volatilidad >= filtros["MIN_VOLATILIDAD_IMPLICITA"]
+
+    candidatas = opciones_put[mascara]
+    dias = dias_vencimiento[mascara]
+    precio_put = candidatas["lastPrice"].astype(float)
+    rent_diaria, rent_anual = calcular_rentabilidad(precio_put, precio_subyacente, dias)
+    break_even = calcular_break_even(strike[mascara], precio_put)
+    diferencia_porcentual = calcular_diferencia_porcentual(precio_subyacente, break_even)
+
+    # Griegas y probabilidad de beneficio de todas las candidatas en una sola pasada
+    t = dias.to_numpy() / 365
+    sigma = volatilidad[mascara].to_numpy() / 100
+    delta, theta, _ = griegas_put(precio_subyacente, strike[mascara].to_numpy(), t, sigma)
+    prob_beneficio = 100 * probabilidad_por_encima(precio_subyacente, break_even.to_numpy(), t, sigma)
+
+    filtradas = pd.DataFrame({
+        "ticker": ticker,
+        "strike": strike[mascara],
+        "lastPrice": precio_put,
+        "bid": bid[mascara],
+        "vencimiento": candidatas["expirationDate"],
+        "dias_vencimiento": dias.astype(int),
+        "rentabilidad_diaria": rent_diaria,
+        "rentabilidad_anual": rent_anual,
+        "break_even": break_even,
+        "diferencia_porcentual": diferencia_porcentual,
+        "volatilidad_implícita": volatilidad[mascara],
+        "volumen": candidatas["volume"].astype(int),
+        "open_interest": candidatas["openInterest"].astype(int),
+        "delta": delta,
+        "theta": theta,
+        "prob_beneficio": prob_beneficio,
+        "source": candidatas["source"]
+    }, columns=COLUMNAS_FILTRADAS)
+    seleccion = ((filtradas["rentabilidad_anual"] >= filtros["MIN_RENTABILIDAD_ANUAL"]) &
+                 (filtradas["diferencia_porcentual"] >= filtros["MIN_DIFERENCIA_PORCENTUAL"]) &
+                 (filtradas["delta"].abs() <= filtros["MAX_DELTA"]) &
+                 (filtradas["prob_beneficio"] >= filtros["MIN_PROB_BENEFICIO"]))
+    return filtradas[seleccion].reset_index(drop=True)
+
+def aplicar_perfil(filtradas, precio_subyacente, filtros, mascara_solo=False):
+    """Opciones que cumplen los filtros de un perfil, a partir de las filtradas con filtros más permisivos.
+
+    Repite sobre las columnas ya calculadas las condiciones de filtrar_opciones, así que cada
+    perfil cuesta una máscara y no un nuevo filtrado (ni una nueva descarga) de la cadena. Con
+    mascara_solo=True devuelve la máscara en lugar de las filas.
+    """
+    if filtradas.empty and not mascara_solo:
+        return filtradas
+    mascara = ((filtradas["dias_vencimiento"] <= filtros["MAX_DIAS_VENCIMIENTO"]) &
+               (filtradas["volumen"] >= filtros["MIN_VOLUMEN"]) &
+               (filtradas["open_interest"] >= filtros["MIN_OPEN_INTEREST"]) &
+               (filtradas["bid"] >= filtros["MIN_BID"]) &
+               (filtradas["volatilidad_implícita"] >= filtros["MIN_VOLATILIDAD_IMPLICITA"]) &
+               (filtradas["rentabilidad_anual"] >= filtros["MIN_RENTABILIDAD_ANUAL"]) &
+               (filtradas["diferencia_porcentual"] >= filtros["MIN_DIFERENCIA_PORCENTUAL"]) &
+               (filtradas["delta"].abs() <= filtros["MAX_DELTA"]) &
+               (filtradas["prob_beneficio"] >= filtros["MIN_PROB_BENEFICIO"]))
+    if filtros["FILTRO_TIPO_OPCION"] == "OTM":
+        mascara &= filtradas["strike"] < precio_subyacente
+    elif filtros["FILTRO_TIPO_OPCION"] == "ITM":
+        mascara &= filtradas["strike"] >= precio_subyacente
+    if mascara_solo:
+        return mascara
+    return filtradas[mascara].reset_index(drop=True)
+
+# Columnas de cada bull put spread que cumple los filtros (mismo orden que las tablas de salida)
+COLUMNAS_SPREAD = [
+    "ticker", "strike", "strike_largo", "bid", "credito", "ancho", "vencimiento", "dias_vencimiento",
+    "rentabilidad_riesgo", "rentabilidad_anual", "break_even", "diferencia_porcentual", "volatilidad_implícita",
+    "volumen", "open_interest", "delta", "theta", "prob_beneficio", "source"
+]
+
+def filtrar_spreads(opciones_put, ticker, precio_subyacente, filtros, ahora=None):
+    """Bull put spreads de la cadena que cumplen los filtros; devuelve un DataFrame con COLUMNAS_SPREAD.
+
+    La pata vendida debe superar los filtros de una put sola (vencimiento, OTM/ITM, volumen,
+    interés abierto, MIN_BID y volatilidad); la comprada, los de vencimiento y liquidez. Como la
+    cadena no trae ask, la pata comprada se valora al mayor de su último precio y su bid. Los
+    pares se enumeran y podan por MAX_ANCHO_SPREAD, MIN_CREDITO_SPREAD y MIN_DIFERENCIA_PORCENTUAL
+    en estrategias.pares_bull_put; rentabilidad sobre el riesgo, break-even, griegas netas y
+    probabilidad de beneficio se calculan en bloque solo para los pares que quedan.
+    """
+    if opciones_put.empty:
+        return pd.DataFrame(columns=COLUMNAS_SPREAD)
+    strike = opciones_put["strike"].astype(float)
+    bid = opciones_put["bid"].astype(float).fillna(0.0)
+    coste = np.fmax(opciones_put["lastPrice"].astype(float).to_numpy(), bid.to_numpy())
+    volumen = opciones_put["volume"].astype(float)
+    interes_abierto = opciones_put["openInterest"].astype(float)
+    mascara, dias_vencimiento = mascara_vencimiento_y_strike(opciones_put, filtros, precio_subyacente, ahora)
+    liquidas = ((dias_vencimiento > 0) & (dias_vencimiento <= filtros["MAX_DIAS_VENCIMIENTO"]) &
+                (volumen >= filtros["MIN_VOLUMEN"]) & (interes_abierto >= filtros["MIN_OPEN_INTEREST"]))
+    cortas = mascara & liquidas & (bid >= filtros["MIN_BID"])
+    # El crédito nunca supera el bid de la vendida, así que su colchón máximo es el de la put sola
+    cortas &= 100 * (precio_subyacente - (strike - bid)) / precio_subyacente >= filtros["MIN_DIFERENCIA_PORCENTUAL"]
+    largas = liquidas & (coste > 0)
+
+    volatilidad = completar_volatilidad(opciones_put, cortas | largas, precio_subyacente, dias_vencimiento)
+    cortas &= volatilidad >= filtros["MIN_VOLATILIDAD_IMPLICITA"]
+    largas &= volatilidad > 0
+
+    strike, bid, volatilidad = strike.to_numpy(), bid.to_numpy(), volatilidad.to_numpy()
+    dias = dias_vencimiento.to_numpy()
+    vendidas, compradas = pares_bull_put(
+        opciones_put["expirationDate"].astype(str).to_numpy(), strike, bid, coste, cortas.to_numpy(), largas.to_numpy(),
+        precio_subyacente, filtros["MAX_ANCHO_SPREAD"], filtros["MIN_CREDITO_SPREAD"], filtros["MIN_DIFERENCIA_PORCENTUAL"]
+    )
 
-    # Verificar si la URL de Discord es válida
-    print(f"[DEBUG] Intentando enviar notificación con URL: {DISCORD_WEBHOOK_URL}")  # Depuración
-    if not DISCORD_WEBHOOK_URL or not DISCORD_WEBHOOK_URL.startswith(('http://', 'https://')):
-        print(f"Error: URL de Discord inválida o no configurada: {DISCORD_WEBHOOK_URL}. Notificación no enviada.")
-        return
+    # Griegas de cada pata una sola vez; las del spread son la diferencia entre la vendida y la comprada
+    patas = np.union1d(vendidas, compradas)
+    delta_patas = np.full(len(strike), np.nan)
+    theta_patas = np.full(len(strike), np.nan)
+    delta_patas[patas], theta_patas[patas], _ = griegas_put(precio_subyacente, strike[patas], dias[patas] / 365,
+                                                            volatilidad[patas] / 100)
+
+    ancho = strike[vendidas] - strike[compradas]
+    credito = bid[vendidas] - coste[compradas]
+    rentabilidad_riesgo = 100 * credito / (ancho - credito)
+    dias_spread = dias[vendidas]
+    break_even = strike[vendidas] - credito
+    spreads = pd.DataFrame({
+        "ticker": ticker,
+        "strike": strike[vendidas],
+        "strike_largo": strike[compradas],
+        "bid": bid[vendidas],
+        "credito": credito,
+        "ancho": ancho,
+        "vencimiento": opciones_put["expirationDate"].to_numpy()[vendidas],
+        "dias_vencimiento": dias_spread.astype(int),
+        "rentabilidad_riesgo": rentabilidad_riesgo,
+        "rentabilidad_anual": rentabilidad_riesgo * 365 / dias_spread,
+        "break_even": break_even,
+        "diferencia_porcentual": calcular_diferencia_porcentual(precio_subyacente, break_even),
+        "volatilidad_implícita": volatilidad[vendidas],
+        "volumen": np.minimum(volumen.to_numpy()[vendidas], volumen.to_numpy()[compradas]).astype(int),
+        "open_interest": np.minimum(interes_abierto.to_numpy()[vendidas], interes_abierto.to_numpy()[compradas]).astype(int),
+        "delta": delta_patas[vendidas] - delta_patas[compradas],
+        "theta": theta_patas[vendidas] - theta_patas[compradas],
+        "prob_beneficio": 100 * probabilidad_por_encima(precio_subyacente, break_even, dias_spread / 365,
+                                                        volatilidad[vendidas] / 100),
+        "source": opciones_put["source"].to_numpy()[vendidas]
+    }, columns=COLUMNAS_SPREAD)
+    seleccion = ((spreads["rentabilidad_anual"] >= filtros["MIN_RENTABILIDAD_ANUAL"]) &
+                 (spreads["delta"].abs() <= filtros["MAX_DELTA"]) &
+                 (spreads["prob_beneficio"] >= filtros["MIN_PROB_BENEFICIO"]))
+    return spreads[seleccion].reset_index(drop=True)
+
+def aplicar_perfil_spread(spreads, precio_subyacente, filtros):
+    """Como aplicar_perfil, para los spreads filtrados con filtros más permisivos."""
+    if spreads.empty:
+        return spreads
+    mascara = ((spreads["ancho"] <= filtros["MAX_ANCHO_SPREAD"]) &
+               (spreads["credito"] >= filtros["MIN_CREDITO_SPREAD"]))
+    mascara &= aplicar_perfil(spreads, precio_subyacente, filtros, mascara_solo=True)
+    return spreads[mascara].reset_index(drop=True)
+
+# Filtrado y subconjunto por perfil de cada estrategia
+FILTRADO_ESTRATEGIA = {"put": filtrar_opciones, "spread": filtrar_spreads}
+PERFIL_ESTRATEGIA = {"put": aplicar_perfil, "spread": aplicar_perfil_spread}
+
+def huella_cadena(cadena):
+    """Huella del contenido de una cadena, independiente del índice."""
+    return hashlib.blake2b(pd.util.hash_pandas_object(cadena, index=False).to_numpy().tobytes(), digest_size=16).hexdigest()
+
+def filtrar_opciones_incremental(opciones_put, ticker, precio_subyacente, filtros):
+    """Como filtrar_opciones, pero en modo vigilancia solo recalcula los vencimientos que han cambiado.
+
+    El resultado de cada (ticker, vencimiento) se reutiliza mientras no cambien ni la huella de su
+    cadena ni el precio del subyacente, la fecha o los filtros.
+    """
+    if MEMO_FILTRADO is None or opciones_put.empty:
+        return filtrar_opciones(opciones_put, ticker, precio_subyacente, filtros)
+    contexto = (precio_subyacente, datetime.now().date(), tuple(sorted(filtros.items())))
+    partes = []
+    vigentes = set()
+    recalculados = 0
+    for vencimiento, cadena in opciones_put.groupby("expirationDate", sort=True):
+        clave = (ticker, vencimiento)
+        vigentes.add(clave)
+        huella = huella_cadena(cadena)
+        previo = MEMO_FILTRADO.get(clave)
+        if previo is None or previo[0] != huella or previo[1] != contexto:
+            previo = (huella, contexto, filtrar_opciones(cadena, ticker, precio_subyacente, filtros))
+            MEMO_FILTRADO[clave] = previo
+            recalculados += 1
+        partes.append(previo[2])
+    # Olvidar los vencimientos del ticker que ya no aparecen
+    for clave in [clave for clave in MEMO_FILTRADO if clave[0] == ticker and clave not in vigentes]:
+        del MEMO_FILTRADO[clave]
+    print(f"{ticker}: {recalculados} de {len(vigentes)} vencimientos recalculados")
+    return pd.concat(partes, ignore_index=True)
+
+def renderizar_tabla(opciones):
+    """Tabla en formato grid de las opciones filtradas de un ticker (sin la columna Ticker)."""
+    from tabulate import tabulate
+    cabeceras, formatear = FORMATOS[opciones[0].estrategia] if opciones else FORMATOS["put"]
+    return tabulate([formatear(opcion)[1:] for opcion in opciones], headers=cabeceras[1:], tablefmt="grid")
+
+def cumple_alerta(opcion, alerta_rentabilidad_anual, alerta_volatilidad_minima):
+    """Indica si la opción supera los umbrales de alerta."""
+    return (opcion.rentabilidad_anual >= alerta_rentabilidad_anual and
+            opcion.volatilidad_implícita >= alerta_volatilidad_minima)
+
+def crear_ranking(top_contratos, alerta_rentabilidad_anual, alerta_volatilidad_minima, top_global=None, clave="rentabilidad"):
+    """Ranking incremental de mejores contratos que solo admite los que cumplen las alertas."""
+    return RankingTopK(
+        top_contratos, top_global=top_global, clave=clave,
+        predicado=lambda opcion: cumple_alerta(opcion, alerta_rentabilidad_anual, alerta_volatilidad_minima)
+    )
+
+def seleccionar_mejores_contratos(todas_las_opciones, tickers, top_contratos, alerta_rentabilidad_anual, alerta_volatilidad_minima):
+    """Mejores contratos de cada ticker que cumplen las alertas, en el orden de `tickers`.
+
+    Se ordena por rentabilidad anual (descendente), días al vencimiento (ascendente) y diferencia
+    porcentual (descendente), y se toman como máximo `top_contratos` por ticker.
+    """
+    ranking = crear_ranking(top_contratos, alerta_rentabilidad_anual, alerta_volatilidad_minima)
+    ranking.agregar_varias(todas_las_opciones)
+    mejores_contratos = []
+    for ticker in tickers:
+        mejores_contratos.extend(ranking.mejores(ticker))
+    return mejores_contratos
+
+CABECERA_MEJORES = f"Mejores Contratos por Ticker (Mayor Rentabilidad Anual, Menor Tiempo, Mayor Diferencia %):\n{'='*50}\n"
+
+def renderizar_mejores_ticker(ticker, contratos):
+    """Bloque de Mejores_Contratos.txt con los contratos de un ticker."""
+    lineas = [f"\nTicker: {ticker}\n{'-'*30}\n"]
+    for i, opcion in enumerate(contratos, 1):
+        cabeceras, formatear = FORMATOS[opcion.estrategia]
+        lineas.append(f"Contrato {i}:\n")
+        for cabecera, valor in zip(cabeceras, formatear(opcion)):
+            lineas.append(f"  {cabecera}: {valor}\n")
+        lineas.append("\n")
+    return "".join(lineas)
+
+def renderizar_mejores_contratos(mejores_contratos):
+    """Contenido de Mejores_Contratos.txt: los contratos agrupados por ticker."""
+    contratos_por_ticker = {}
+    for opcion in mejores_contratos:
+        contratos_por_ticker.setdefault(opcion.ticker, []).append(opcion)
+    return CABECERA_MEJORES + "".join(
+        renderizar_mejores_ticker(ticker, contratos) for ticker, contratos in contratos_por_ticker.items()
+    )
+
+def texto_perfil(ticker, perfil, opciones_filtradas, varios):
+    """Sección de un perfil en el texto de un ticker: tabla de opciones y oportunidades destacadas."""
+    filtros = perfil.filtros
+    texto = f"\n--- Perfil {perfil.nombre} ---\n" if varios else ""
+    if not opciones_filtradas:
+        return texto + "\nNo se consiguieron resultados para este ticker.\n"
+    if perfil.estrategia == "spread":
+        texto += f"\nBull put spreads {perfil.tipo_opcion_texto} (ancho <= ${filtros['MAX_ANCHO_SPREAD']}, crédito >= ${filtros['MIN_CREDITO_SPREAD']}) con rentabilidad anual sobre el riesgo > {filtros['MIN_RENTABILIDAD_ANUAL']}% y diferencia % > {filtros['MIN_DIFERENCIA_PORCENTUAL']}% (máximo {filtros['MAX_DIAS_VENCIMIENTO']} días, volumen > {filtros['MIN_VOLUMEN']}, volatilidad >= {filtros['MIN_VOLATILIDAD_IMPLICITA']}%, interés abierto > {filtros['MIN_OPEN_INTEREST']}, bid vendido >= ${filtros['MIN_BID']}):\n"
+    else:
+        texto += f"\nOpciones PUT {perfil.tipo_opcion_texto} con rentabilidad anual > {filtros['MIN_RENTABILIDAD_ANUAL']}% y diferencia % > {filtros['MIN_DIFERENCIA_PORCENTUAL']}% (máximo {filtros['MAX_DIAS_VENCIMIENTO']} días, volumen > {filtros['MIN_VOLUMEN']}, volatilidad >= {filtros['MIN_VOLATILIDAD_IMPLICITA']}%, interés abierto > {filtros['MIN_OPEN_INTEREST']}, bid >= ${filtros['MIN_BID']}):\n"
+    with etapa("renderizado", ticker) as medida:
+        medida["filas_entrada"] = len(opciones_filtradas)
+        texto += f"\n{renderizar_tabla(opciones_filtradas)}\n"
+
+    for opcion in opciones_filtradas:
+        if cumple_alerta(opcion, filtros['ALERTA_RENTABILIDAD_ANUAL'], filtros['ALERTA_VOLATILIDAD_MINIMA']):
+            alerta_msg = f"¡Oportunidad destacada! {ticker}: Rentabilidad anual: {opcion.rentabilidad_anual:.2f}%, Volatilidad: {opcion.volatilidad_implícita:.2f}% (Strike: {opcion.strikes_texto}, Vencimiento: {opcion.vencimiento_texto})\n"
+            texto += alerta_msg
+    return texto
+
+# Estados de un ticker que no se analizó entero por falta de tiempo
+ESTADOS_INCOMPLETOS = ("parcial", "tiempo agotado", "sin analizar")
+
+def analizar_ticker(ticker, perfiles, ejecutor=None, plazo=None):
+    """Descarga, filtra y formatea los resultados de un ticker para todos los perfiles.
+
+    La cadena se descarga y combina una sola vez con los filtros envolventes de los perfiles y se
+    filtra una vez por estrategia (puts o spreads) con los envolventes de sus perfiles; cada
+    perfil se queda después con su subconjunto (aplicar_perfil). Devuelve el texto de la sección
+    del ticker para resultados.txt, un diccionario {perfil: contratos (Contrato o Spread) que
+    cumplen sus filtros} y el estado del ticker ("completo", "error" o uno de ESTADOS_INCOMPLETOS).
+    Los errores quedan aislados en el texto del propio ticker.
+
+    Las descargas no esperan más de PRESUPUESTO_TICKER_SEGUNDOS desde que empieza el ticker ni
+    más allá de `plazo` (el fin de la ejecución, en time.monotonic()). Si se agota el tiempo con
+    parte de la cadena descargada, se filtra lo que haya llegado y el ticker queda como "parcial".
+    """
+    texto = f"\n{'='*50}\nAnalizando ticker: {ticker}\n{'='*50}\n"
+    if plazo is not None and segundos_restantes(plazo) == 0:
+        texto += "Estado: sin analizar (plazo de la ejecución agotado)\n"
+        return texto, {perfil.nombre: [] for perfil in perfiles}, "sin analizar"
+    limite = calcular_limite(PRESUPUESTO_TICKER_SEGUNDOS, plazo)
+    estado = "completo"
+    filtros = filtros_envolventes(perfiles)
+    # La pata comprada de un spread tiene un strike menor que la vendida: con ITM no se puede podar por strike
+    if any(perfil.estrategia == "spread" and perfil.filtros["FILTRO_TIPO_OPCION"] == "ITM" for perfil in perfiles):
+        filtros["FILTRO_TIPO_OPCION"] = "TODAS"
+    varios = len(perfiles) > 1
+    perfiles_por_estrategia = {}
+    for perfil in perfiles:
+        perfiles_por_estrategia.setdefault(perfil.estrategia, []).append(perfil)
 
-    # Verificar el tamaño del archivo Mejores_Contratos.txt
     try:
-        file_size = os.path.getsize("Mejores_Contratos.txt")
-        max_size_mb = 8  # Límite de 8 MB para Discord (ajusta según el nivel de boost de tu servidor)
-        if file_size > max_size_mb * 1024 * 1024:
-            print(f"Error: El archivo Mejores_Contratos.txt ({file_size / (1024 * 1024):.2f} MB) excede el límite de {max_size_mb} MB para Discord.")
-            mensaje = f"Se encontraron contratos que cumplen los filtros de alerta para los siguientes tickers: {ticker_list}\nEl archivo Mejores_Contratos.txt es demasiado grande ({file_size / (1024 * 1024):.2f} MB) para enviarse a Discord.\nRevisa los artifacts en GitHub Actions para descargar el archivo."
-            payload = {"content": mensaje}
-            response = requests.post(DISCORD_WEBHOOK_URL, json=payload)
-            response.raise_for_status()
-            print("Notificación de error enviada a Discord.")
-            return
-    except FileNotFoundError:
-        print("Error: No se encontró el archivo Mejores_Contratos.txt.")
-        mensaje = f"Se encontraron contratos que cumplen los filtros de alerta para los siguientes tickers: {ticker_list}\nNo se encontró el archivo Mejores_Contratos.txt para enviar a Discord.\nRevisa los logs para más detalles."
-        payload = {"content": mensaje}
-        response = requests.post(DISCORD_WEBHOOK_URL, json=payload)
-        response.raise_for_status()
-        print("Notificación de error enviada a Discord.")
-        return
+        with etapa("subyacente", ticker) as medida:
+            # Las cotizaciones precargadas no pasan por el pool de E/S (sus bytes cuentan en "cotizaciones")
+            precargada = ticker in COTIZACIONES
+            futuro = _lanzar(None if precargada else ejecutor, obtener_datos_subyacente, ticker)
+            try:
+                precio_subyacente, minimo_52_semanas, maximo_52_semanas = esperar_resultado(futuro, limite)
+            except TiempoAgotado:
+                raise TiempoAgotado("sin cotización del subyacente")
+            if not precargada:
+                medida["bytes"] = tamano_en_memoria(pd.DataFrame([COTIZACIONES[ticker]]))
+        texto += f"Precio del subyacente ({ticker}): ${precio_subyacente:.2f}\n"
+        texto += f"Mínimo de las últimas 52 semanas: ${minimo_52_semanas:.2f}\n"
+        texto += f"Máximo de las últimas 52 semanas: ${maximo_52_semanas:.2f}\n"
+
+        # Se archiva la cadena podada del análisis; solo si ARCHIVO_LADO o ARCHIVO_DIAS_VENCIMIENTO piden
+        # más strikes o vencimientos se descarga una cadena más amplia y la poda del análisis se aplica después
+        filtros_descarga = filtros
+        if ARCHIVO is not None:
+            lado_archivo = "TODAS" if ARCHIVO_LADO == "TODAS" else filtros["FILTRO_TIPO_OPCION"]
+            if lado_archivo != filtros["FILTRO_TIPO_OPCION"] or ARCHIVO_DIAS_VENCIMIENTO > filtros["MAX_DIAS_VENCIMIENTO"]:
+                filtros_descarga = dict(filtros, FILTRO_TIPO_OPCION=lado_archivo,
+                                        MAX_DIAS_VENCIMIENTO=max(filtros["MAX_DIAS_VENCIMIENTO"], ARCHIVO_DIAS_VENCIMIENTO))
+        opciones_put, fuentes_texto, errores_texto, pendientes = obtener_opciones_put(
+            ticker, ejecutor, filtros_descarga, precio_subyacente, limite=limite
+        )
+        texto += f"Datos de opciones para {ticker} obtenidos de: {fuentes_texto}\n"
+        texto += f"Errores al obtener datos: {errores_texto}\n"
+        if pendientes:
+            if opciones_put.empty:
+                raise TiempoAgotado("; ".join(pendientes))
+            estado = "parcial"
+            texto += f"Estado: parcial (tiempo agotado: {'; '.join(pendientes)})\n"
+
+        # Una cadena incompleta no se archiva: el backtest la tomaría por la cadena del día
+        if ARCHIVO is not None and estado == "completo":
+            try:
+                with etapa("archivo", ticker) as medida:
+                    medida["filas_entrada"] = len(opciones_put)
+                    ARCHIVO.guardar(ticker, opciones_put, precio_subyacente, huella=huella_cadena(opciones_put),
+                                    dte_maximo=filtros_descarga["MAX_DIAS_VENCIMIENTO"],
+                                    lado=filtros_descarga["FILTRO_TIPO_OPCION"])
+            except Exception as e:
+                print(f"No se pudo archivar la cadena de {ticker}: {e}")
+        if filtros_descarga is not filtros:
+            opciones_put = podar_cadena(opciones_put, filtros, precio_subyacente).reset_index(drop=True)
+
+        print(f"Se encontraron {len(opciones_put)} opciones PUT para {ticker}")
+        filtradas = {}
+        for estrategia, perfiles_estrategia in perfiles_por_estrategia.items():
+            with etapa("filtrado" if estrategia == "put" else f"filtrado {estrategia}", ticker) as medida:
+                medida["filas_entrada"] = len(opciones_put)
+                filtros_estrategia = filtros_envolventes(perfiles_estrategia)
+                if estrategia == "put":
+                    filtradas[estrategia] = filtrar_opciones_incremental(opciones_put, ticker, precio_subyacente, filtros_estrategia)
+                else:
+                    filtradas[estrategia] = FILTRADO_ESTRATEGIA[estrategia](opciones_put, ticker, precio_subyacente, filtros_estrategia)
+                medida["filas_salida"] = len(filtradas[estrategia])
+
+        opciones_por_perfil = {}
+        for perfil in perfiles:
+            tabla = filtradas[perfil.estrategia]
+            with etapa(f"perfil {perfil.nombre}", ticker) as medida:
+                medida["filas_entrada"] = len(tabla)
+                if len(perfiles_por_estrategia[perfil.estrategia]) > 1:
+                    seleccion = PERFIL_ESTRATEGIA[perfil.estrategia](tabla, precio_subyacente, perfil.filtros)
+                else:
+                    seleccion = tabla
+                opciones_por_perfil[perfil.nombre] = contratos_de_tabla(seleccion, TIPOS[perfil.estrategia])
+                medida["filas_salida"] = len(seleccion)
+            if opciones_por_perfil[perfil.nombre]:
+                etiqueta = f" (perfil {perfil.nombre})" if varios else ""
+                print(f"Se encontraron {len(opciones_por_perfil[perfil.nombre])} opciones que cumplen los filtros para {ticker}{etiqueta}")
+            texto += texto_perfil(ticker, perfil, opciones_por_perfil[perfil.nombre], varios)
+
+    except TiempoAgotado as e:
+        texto += f"Estado: tiempo agotado ({str(e) or 'presupuesto de tiempo agotado'})\n"
+        estado = "tiempo agotado"
+        opciones_por_perfil = {perfil.nombre: [] for perfil in perfiles}
 
-    # Enviar el archivo Mejores_Contratos.txt como adjunto
+    except Exception as e:
+        error_msg = f"Error al analizar {ticker}: {e}\n"
+        texto += error_msg
+        estado = "error"
+        opciones_por_perfil = {perfil.nombre: [] for perfil in perfiles}
+
+    return texto, opciones_por_perfil, estado
+
+def resultados_en_orden(tickers, perfiles, max_workers, secuencial=False, plazo=None, pesos=None):
+    """Genera (ticker, futuro con el resultado de analizar_ticker) en el orden de `tickers`.
+
+    Los tickers se procesan en paralelo; las descargas de cada ticker (vencimientos y cadenas de
+    cada proveedor) van a un pool de E/S separado para que un ticker nunca espere a otro. Se
+    lanzan de la cadena más grande a la más pequeña según `pesos` (filas de ejecuciones
+    anteriores), para que ninguna cadena grande empiece al final y alargue la ejecución. Con
+    secuencial=True todo se ejecuta en el hilo actual y en el orden de `tickers` (lo usa el
+    perfilado, que solo ve ese hilo); entonces el tiempo solo se comprueba entre tickers.
+    """
+    if secuencial:
+        for ticker in tickers:
+            yield ticker, _lanzar(None, analizar_ticker, ticker, perfiles, None, plazo)
+        return
+    ejecutor_io = ThreadPoolExecutor(max_workers=max_workers)
+    ejecutor_tickers = ThreadPoolExecutor(max_workers=max_workers)
     try:
-        with open("Mejores_Contratos.txt", "rb") as f:
-            files = {
-                "file": ("Mejores_Contratos.txt", f, "text/plain")
-            }
-            payload = {
-                "content": mensaje
-            }
-            response = requests.post(DISCORD_WEBHOOK_URL, data=payload, files=files)
-            response.raise_for_status()
-            print("Archivo Mejores_Contratos.txt enviado a Discord exitosamente.")
-    except requests.exceptions.RequestException as e:
-        print(f"Error al enviar el archivo a Discord: {e}")
-        if 'response' in locals() and response.text:
-            print(f"Detalles del error: {response.text}")
-
-def analizar_opciones():
-    global SCRIPT_EJECUTADO
+        futuros = {ticker: ejecutor_tickers.submit(analizar_ticker, ticker, perfiles, ejecutor_io, plazo)
+                   for ticker in ordenar_por_peso(tickers, pesos)}
+        for ticker in tickers:
+            # El resultado se libera en cuanto el llamante lo escribe
+            yield ticker, futuros.pop(ticker)
+    finally:
+        # No se espera a las descargas abandonadas por tiempo que sigan en curso
+        ejecutor_tickers.shutdown(wait=False, cancel_futures=True)
+        ejecutor_io.shutdown(wait=False, cancel_futures=True)
+
+def abrir_salidas_perfil(perfil, varios, formatos):
+    """Informes y ranking de mejores contratos de un perfil para una ejecución.
+
+    todas_las_opciones y mejores_contratos se escriben en los `formatos` de exportación (CSV de
+    presentación y/o Parquet tipado, ver formatos_exportacion).
+    """
+    sufijo = perfil.nombre if varios else None
+    ruta_mejores_txt = ruta_informe(ruta_de_perfil("Mejores_Contratos.txt", sufijo))
+    eliminar_si_existe(ruta_mejores_txt)
+    filtros = perfil.filtros
+    return {
+        "perfil": perfil,
+        "todas": SalidaContratos(ruta_informe(ruta_de_perfil("todas_las_opciones.csv", sufijo)), perfil.estrategia, formatos),
+        "mejores": SalidaContratos(ruta_informe(ruta_de_perfil("mejores_contratos.csv", sufijo)), perfil.estrategia, formatos),
+        "mejores_txt": SalidaTexto(ruta_mejores_txt, CABECERA_MEJORES, perezoso=True),
+        # Los contratos entran en el ranking según se filtran; solo se guardan los K mejores
+        "ranking": crear_ranking(perfil.top_contratos, filtros["ALERTA_RENTABILIDAD_ANUAL"], filtros["ALERTA_VOLATILIDAD_MINIMA"],
+                                 top_global=perfil.top_contratos, clave=perfil.orden_mejores),
+        "mejores_contratos": []
+    }
+
+def escribir_ticker_perfil(salidas, ticker, opciones_filtradas):
+    """Escribe las opciones de un ticker en los informes del perfil; devuelve sus mejores contratos."""
+    salidas["todas"].escribir(opciones_filtradas)
+
+    # Mejores contratos del ticker según las reglas de alerta
+    ranking = salidas["ranking"]
+    ranking.agregar_varias(opciones_filtradas)
+    mejores_ticker = ranking.mejores(ticker)
+    if mejores_ticker:
+        salidas["mejores_txt"].escribir(renderizar_mejores_ticker(ticker, mejores_ticker))
+        salidas["mejores"].escribir(mejores_ticker)
+        salidas["mejores_contratos"].extend(mejores_ticker)
+    return mejores_ticker
+
+def registrar_resultados_ticker(salidas_perfiles, ticker, opciones_por_perfil, varios, notificador=None, forzar=False,
+                                salidas_parciales=None):
+    """Escribe las opciones de un ticker en los informes de cada perfil y encola los avisos de sus mejores contratos.
+
+    Con `salidas_parciales` ({estrategia: SalidaCSV}, en los fragmentos) también se guardan los
+    contratos sin formato para la reducción. Devuelve (opciones escritas, mejores contratos,
+    avisos encolados).
+    """
+    filas = mejores = encolados = 0
+    for salidas in salidas_perfiles:
+        perfil = salidas["perfil"]
+        opciones_filtradas = opciones_por_perfil.get(perfil.nombre, [])
+        filas += len(opciones_filtradas)
+        if salidas_parciales is not None:
+            salidas_parciales[perfil.estrategia].escribir_filas((perfil.nombre,) + opcion.valores() for opcion in opciones_filtradas)
+        mejores_ticker = escribir_ticker_perfil(salidas, ticker, opciones_filtradas)
+        mejores += len(mejores_ticker)
+        if notificador is not None and mejores_ticker:
+            # Con FORCE_DISCORD_NOTIFICATION se avisa de todos, aunque ya se hubieran notificado
+            pendientes = ([(opcion, "forzado") for opcion in mejores_ticker] if forzar
+                          else ALERTAS.pendientes(perfil.nombre, mejores_ticker))
+            notificador.encolar(perfil.nombre, f"**{perfil.nombre}**" if varios else "", pendientes)
+            encolados += len(pendientes)
+    return filas, mejores, encolados
+
+def abrir_salidas_parciales(perfiles):
+    """CSV de contratos sin formato de un fragmento, uno por estrategia de los perfiles."""
+    return {estrategia: SalidaCSV(ruta_informe(PARCIALES[estrategia]), ["perfil"] + CAMPOS[estrategia])
+            for estrategia in dict.fromkeys(perfil.estrategia for perfil in perfiles)}
+
+def leer_parciales(directorio):
+    """Contratos de los CSV parciales de un fragmento agrupados por ticker y perfil: {ticker: {perfil: [contrato]}}."""
+    opciones = {}
+    leidos = 0
+    for estrategia, nombre in PARCIALES.items():
+        ruta = os.path.join(directorio, nombre)
+        if not os.path.exists(ruta):
+            continue
+        with open(ruta, newline="") as f:
+            lector = csv.reader(f)
+            if next(lector, None) != ["perfil"] + CAMPOS[estrategia]:
+                raise ValueError(f"columnas inesperadas en {ruta}")
+            for fila in lector:
+                opcion = contrato_de_textos(fila[1:], TIPOS[estrategia])
+                opciones.setdefault(opcion.ticker, {}).setdefault(fila[0], []).append(opcion)
+        leidos += 1
+    if not leidos:
+        raise OSError(f"no hay {' ni '.join(PARCIALES.values())}")
+    return opciones
+
+def cerrar_salidas_perfil(salidas, varios):
+    """Cierra los informes de un perfil y resume sus resultados."""
+    perfil = salidas["perfil"]
+    etiqueta = f"[{perfil.nombre}] " if varios else ""
+    salida_todas, salida_mejores, salida_mejores_txt = salidas["todas"], salidas["mejores"], salidas["mejores_txt"]
+    mejores_contratos_por_ticker = salidas["mejores_contratos"]
+    salida_todas.cerrar()
+    salida_mejores.cerrar()
+    salida_mejores_txt.cerrar()
+
+    if salida_todas.filas:
+        print(f"{etiqueta}Total de opciones filtradas (todos los tickers): {salida_todas.filas}")
+        print(f"{etiqueta}Todas las opciones exportadas a '{salida_todas.ruta}'.")
+    else:
+        print(f"{etiqueta}No se encontraron opciones que cumplan los filtros. Archivo {salida_todas.ruta} generado (vacío).")
+
+    if not mejores_contratos_por_ticker:
+        print(f"{etiqueta}No se encontraron contratos que cumplan las reglas de alerta en ningún ticker.")
+        print(f"{etiqueta}Archivo {salida_mejores.ruta} generado (vacío).")
+        return
 
-    print(f"[DEBUG] Iniciando ejecución del script a las {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} UTC")
+    print(f"{etiqueta}Mejores contratos por ticker exportados a '{salida_mejores_txt.ruta}'.")
+    print(f"{etiqueta}Mejores contratos exportados a '{salida_mejores.ruta}'.")
+
+    # Extraer tickers únicos de los contratos seleccionados
+    tickers_identificados = sorted(list(set([opcion.ticker for opcion in mejores_contratos_por_ticker])))
+    ticker_list = ", ".join(tickers_identificados)
+    print(f"{etiqueta}Tickers identificados como oportunidades: {ticker_list}")
+    print(f"{etiqueta}Mejores contratos de todos los tickers:")
+    for opcion in salidas["ranking"].mejores_globales():
+        print(f"  {opcion.ticker} strike {opcion.strikes_texto} vencimiento {opcion.vencimiento_texto}: "
+              f"rentabilidad anual {opcion.rentabilidad_anual:.2f}%, diferencia {opcion.diferencia_porcentual:.2f}%")
+
+def preparar_notificador(offline, datos_reales, es_ejecucion_manual, force_discord):
+    """Abre el estado de avisos y el notificador de Discord si esta ejecución debe avisar; si no, devuelve None."""
+    global ALERTAS, NOTIFICADOR
+    if offline:
+        print("Modo offline: no se envían notificaciones a Discord.")
+        return None
+    if not datos_reales:
+        print("Datos sintéticos: no se envían notificaciones a Discord.")
+        return None
+    if es_ejecucion_manual and not force_discord and not ENVIAR_NOTIFICACION_MANUAL:
+        print("Ejecución manual: no se envían notificaciones a Discord.")
+        return None
+    if not DISCORD_WEBHOOK_URL or not DISCORD_WEBHOOK_URL.startswith(('http://', 'https://')):
+        print(f"Error: URL de Discord inválida o no configurada: {DISCORD_WEBHOOK_URL}. Notificación no enviada.")
+        return None
+    if ALERTAS is None:
+        try:
+            ALERTAS = EstadoAlertas()
+            print(f"Estado de avisos: {ALERTAS.ruta} (cambio mínimo {ALERTAS.umbral} puntos, repetición cada {ALERTAS.repetir_horas}h)")
+        except Exception as e:
+            # Sin estado persistente solo se evita repetir avisos dentro del mismo proceso
+            print(f"No se pudo abrir el estado de avisos ({e}). Se usa un estado en memoria.")
+            ALERTAS = EstadoAlertas(":memory:")
+    if NOTIFICADOR is None or NOTIFICADOR.url != DISCORD_WEBHOOK_URL:
+        NOTIFICADOR = NotificadorDiscord(DISCORD_WEBHOOK_URL, ALERTAS)
+    return NOTIFICADOR
+
+def analizar_opciones(offline=False, proveedores=None, secuencial=False, fragmento=None):
+    """Ejecuta el análisis completo.
+
+    Con offline=True no se consulta ningún proveedor: todo se reproduce desde las instantáneas
+    guardadas en la caché, sin importar su antigüedad. `proveedores` permite sustituir los
+    proveedores configurados en la variable PROVEEDORES (p. ej. por un ProveedorSintetico).
+    Con fragmento=(I, N) solo se analizan los tickers del fragmento I de N, los informes se
+    escriben en parciales/fragmento_I y no se avisa a Discord (lo hace reducir_fragmentos).
+    Al terminar se escriben las métricas por etapa y ticker en METRICAS_RUTA (metrics.json).
+
+    Cada ticker dispone de PRESUPUESTO_TICKER_SEGUNDOS y, con PLAZO_EJECUCION_SEGUNDOS, ninguno
+    espera más allá del plazo de la ejecución: los que no terminan a tiempo quedan marcados en
+    resultados.txt y el resto del informe se completa igualmente.
+    """
+    global SCRIPT_EJECUTADO, CACHE, PROVEEDORES, ARCHIVO, DIRECTORIO_EJECUCION
 
     if SCRIPT_EJECUTADO:
         print("El script ya ha sido ejecutado. Evitando repetición.")
         return
     SCRIPT_EJECUTADO = True
+    METRICAS.reiniciar()
+    plazo = calcular_limite(PLAZO_EJECUCION_SEGUNDOS)
+    DIRECTORIO_EJECUCION = directorio_fragmento(fragmento[0]) if fragmento else DIRECTORIO_INFORMES
+    os.makedirs(DIRECTORIO_EJECUCION, exist_ok=True)
+
+    try:
+        # En modo vigilancia la caché se abre una vez y se reutiliza en cada ciclo
+        if CACHE is None or CACHE.offline != offline:
+            CACHE = CacheOpciones(offline=offline)
+        print(f"Caché de instantáneas: {CACHE.ruta} (TTL {CACHE.ttl}s, offline: {offline})")
+    except Exception as e:
+        print(f"No se pudo abrir la caché ({e}). Se continúa sin caché.")
+        if offline:
+            with open(ruta_informe("resultados.txt"), "w") as f:
+                f.write(f"Error al abrir la caché en modo offline: {e}\n")
+            return
+        CACHE = None
+
+    try:
+        PROVEEDORES = proveedores or crear_proveedores(offline=offline)
+    except ValueError as e:
+        error_msg = f"Error al crear los proveedores de datos: {e}\n"
+        print(error_msg)
+        with open(ruta_informe("resultados.txt"), "w") as f:
+            f.write(error_msg)
+        return
+    print(f"Proveedores de datos: {', '.join(proveedor.nombre for proveedor in PROVEEDORES)}")
+
+    # Solo se archivan datos reales recién descargados (no la reproducción offline ni los sintéticos)
+    if not ARCHIVO_ACTIVO or offline or not all(proveedor.datos_reales for proveedor in PROVEEDORES):
+        ARCHIVO = None
+    elif ARCHIVO is None:
+        try:
+            ARCHIVO = ArchivoCadenas()
+            print(f"Archivo histórico de cadenas: {ARCHIVO.ruta}")
+        except ImportError as e:
+            print(f"Archivo histórico desactivado (falta pyarrow): {e}")
 
     # Obtener configuración desde variables de entorno con valores por defecto del script
     try:
-        (TICKERS, MIN_RENTABILIDAD_ANUAL, MAX_DIAS_VENCIMIENTO, MIN_DIFERENCIA_PORCENTUAL,
-         MIN_VOLUMEN, MIN_VOLATILIDAD_IMPLICITA, MIN_OPEN_INTEREST,
-         FILTRO_TIPO_OPCION, TOP_CONTRATOS, ALERTA_RENTABILIDAD_ANUAL, ALERTA_VOLATILIDAD_MINIMA, MIN_BID) = obtener_configuracion()
+        config, _ = obtener_configuracion()
     except Exception as e:
         error_msg = f"Error al obtener la configuración: {e}\n"
         print(error_msg)
-        with open("resultados.txt", "w") as f:
+        with open(ruta_informe("resultados.txt"), "w") as f:
             f.write(error_msg)
         return  # Terminar ejecución si falla la configuración
+    try:
+        formatos = formatos_exportacion()
+    except ValueError as e:
+        error_msg = f"Error en la configuración de los informes: {e}\n"
+        print(error_msg)
+        with open(ruta_informe("resultados.txt"), "w") as f:
+            f.write(error_msg)
+        return
+
+    if fragmento is not None:
+        indice, total = fragmento
+        try:
+            tickers_fragmento = tickers_del_fragmento(config.tickers, indice, total)
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            error_msg = f"Error al obtener los tickers del fragmento {indice}/{total}: {e}\n"
+            print(error_msg)
+            with open(ruta_informe("resultados.txt"), "w") as f:
+                f.write(error_msg)
+            return
+        print(f"Fragmento {indice}/{total}: {len(tickers_fragmento)} de {len(config.tickers)} tickers. Informes en {DIRECTORIO_EJECUCION}")
+        config = replace(config, tickers=tickers_fragmento)
 
     # Detectar si es una ejecución manual o automática
     es_ejecucion_manual = os.getenv("GITHUB_EVENT_NAME", "schedule") == "workflow_dispatch"
     force_discord = os.getenv("FORCE_DISCORD_NOTIFICATION", "false").lower() == "true"
     print(f"Es ejecución manual: {es_ejecucion_manual}, Forzar notificación Discord: {force_discord}")
+    # Los avisos se envían en segundo plano según termina cada ticker, solo de contratos nuevos o con cambios
+    datos_reales = all(proveedor.datos_reales for proveedor in PROVEEDORES)
+    if fragmento is not None:
+        print("Fragmento: los avisos a Discord se envían al reducir los resultados parciales.")
+        notificador = None
+    else:
+        notificador = preparar_notificador(offline, datos_reales, es_ejecucion_manual, force_discord)
+    avisos_encolados = 0
 
     # Resumen de condiciones para el archivo .txt
     resumen_condiciones = (
         f"Resumen de condiciones de ejecución - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}:\n"
-        f"Tickers analizados: {', '.join(TICKERS)}\n"
-        f"Filtro tipo opción: {FILTRO_TIPO_OPCION}\n"
-        f"Mínima rentabilidad anual: {MIN_RENTABILIDAD_ANUAL}%\n"
-        f"Máximo días al vencimiento: {MAX_DIAS_VENCIMIENTO}\n"
-        f"Mínima diferencia porcentual: {MIN_DIFERENCIA_PORCENTUAL}%\n"
-        f"Mínimo volumen: {MIN_VOLUMEN}\n"
-        f"Volatilidad implícita mínima: {MIN_VOLATILIDAD_IMPLICITA}%\n"
-        f"Mínimo interés abierto: {MIN_OPEN_INTEREST}\n"
-        f"Mínimo bid: ${MIN_BID}\n"
-        f"{'='*50}\n\n"
+        f"Tickers analizados: {', '.join(config.tickers)}\n"
+        f"Filtro tipo opción: {config.filtro_tipo_opcion}\n"
+        f"Mínima rentabilidad anual: {config.min_rentabilidad_anual}%\n"
+        f"Máximo días al vencimiento: {config.max_dias_vencimiento}\n"
+        f"Mínima diferencia porcentual: {config.min_diferencia_porcentual}%\n"
+        f"Mínimo volumen: {config.min_volumen}\n"
+        f"Volatilidad implícita mínima: {config.min_volatilidad_implicita}%\n"
+        f"Mínimo interés abierto: {config.min_open_interest}\n"
+        f"Mínimo bid: ${config.min_bid}\n"
+        f"Delta máxima (valor absoluto): {config.max_delta}\n"
+        f"Mínima probabilidad de beneficio: {config.min_prob_beneficio}%\n"
+        f"Orden de los mejores contratos: {config.orden_mejores}\n"
+        + "".join(f"Perfil {perfil.nombre}: {diferencias_perfil(config, perfil) or 'sin cambios'}\n"
+                  for perfil in config.perfiles if len(config.perfiles) > 1)
+        + f"{'='*50}\n\n"
     )
 
-    resultado = resumen_condiciones
-    todas_las_opciones = []
-    todas_las_opciones_df = []
+    # Los informes se escriben a medida que termina cada ticker: en memoria solo queda la
+    # selección de mejores contratos y, si la ejecución se interrumpe, lo escrito se conserva.
+    # Con varios perfiles cada uno tiene sus propios CSV y Mejores_Contratos (con su nombre como sufijo).
+    varios = len(config.perfiles) > 1
+    salida_resultados = SalidaTexto(ruta_informe("resultados.txt"), resumen_condiciones)
+    salidas_perfiles = [abrir_salidas_perfil(perfil, varios, formatos) for perfil in config.perfiles]
+    # Los fragmentos guardan además los contratos sin formato, que es lo que combina la reducción
+    salidas_parciales = abrir_salidas_parciales(config.perfiles) if fragmento else None
+    # Tickers que no se analizaron enteros por falta de tiempo: {ticker: estado}
+    incompletos = {}
 
     try:
-        print(f"[DEBUG] Analizando {len(TICKERS)} tickers: {TICKERS}")
-        for ticker in TICKERS:
-            resultado += f"\n{'='*50}\nAnalizando ticker: {ticker}\n{'='*50}\n"
-            print(f"\n{'='*50}\nAnalizando ticker: {ticker}\n{'='*50}\n")
-
+        if varios:
+            print(f"Perfiles evaluados sobre una única descarga: {', '.join(perfil.nombre for perfil in config.perfiles)}")
+
+        with etapa("cotizaciones") as medida:
+            medida["filas_entrada"] = len(config.tickers)
+            precargar_cotizaciones(config.tickers)
+            medida["filas_salida"] = len(COTIZACIONES)
+            if COTIZACIONES:
+                medida["bytes"] = tamano_en_memoria(pd.DataFrame.from_dict(COTIZACIONES, orient="index"))
+
+        # Los resultados se recogen en el orden de TICKERS para que el informe sea determinista
+        for ticker, futuro in resultados_en_orden(config.tickers, config.perfiles, config.max_workers, secuencial,
+                                                  plazo, cargar_pesos()):
             try:
-                stock, precio_subyacente, minimo_52_semanas, maximo_52_semanas = obtener_datos_subyacente(ticker)
-                resultado += f"Precio del subyacente ({ticker}): ${precio_subyacente:.2f}\n"
-                resultado += f"Mínimo de las últimas 52 semanas: ${minimo_52_semanas:.2f}\n"
-                resultado += f"Máximo de las últimas 52 semanas: ${maximo_52_semanas:.2f}\n"
-                print(f"Precio del subyacente ({ticker}): ${precio_subyacente:.2f}")
-                print(f"Mínimo de las últimas 52 semanas: ${minimo_52_semanas:.2f}")
-                print(f"Máximo de las últimas 52 semanas: ${maximo_52_semanas:.2f}")
-
-                opciones_put, fuentes_texto, errores_texto = obtener_opciones_put(ticker, stock)
-                resultado += f"Datos de opciones para {ticker} obtenidos de: {fuentes_texto}\n"
-                resultado += f"Errores al obtener datos: {errores_texto}\n"
-                print(f"Datos de opciones para {ticker} obtenidos de: {fuentes_texto}")
-                print(f"Errores al obtener datos: {errores_texto}")
-
-                print(f"Se encontraron {len(opciones_put)} opciones PUT para {ticker}")
-                opciones_filtradas = []
-                for contrato in opciones_put:
-                    strike = float(contrato["strike"])
-                    precio_put = float(contrato["lastPrice"])
-                    vencimiento_str = contrato["expirationDate"]
-                    dias_vencimiento = (datetime.strptime(vencimiento_str, "%Y-%m-%d") - datetime.now()).days
-                    volumen = contrato["volume"]
-                    volatilidad_implícita = contrato["impliedVolatility"]
-                    open_interest = contrato["openInterest"]
-                    bid = contrato["bid"]
-                    source = contrato["source"]
-
-                    if FILTRO_TIPO_OPCION == "OTM":
-                        if strike >= precio_subyacente:
-                            continue
-                    elif FILTRO_TIPO_OPCION == "ITM":
-                        if strike < precio_subyacente:
-                            continue
-
-                    if dias_vencimiento <= 0 or dias_vencimiento > MAX_DIAS_VENCIMIENTO:
-                        continue
-                    if volumen < MIN_VOLUMEN:
-                        continue
-                    if volatilidad_implícita < MIN_VOLATILIDAD_IMPLICITA:
-                        continue
-                    if open_interest < MIN_OPEN_INTEREST:
-                        continue
-                    if bid < MIN_BID:
-                        continue
-
-                    rent_diaria, rent_anual = calcular_rentabilidad(precio_put, precio_subyacente, dias_vencimiento)
-                    break_even = calcular_break_even(strike, precio_put)
-                    diferencia_porcentual = calcular_diferencia_porcentual(precio_subyacente, break_even)
-
-                    if rent_anual >= MIN_RENTABILIDAD_ANUAL and diferencia_porcentual >= MIN_DIFERENCIA_PORCENTUAL:
-                        opcion = {
-                            "ticker": ticker,
-                            "strike": strike,
-                            "lastPrice": precio_put,
-                            "bid": bid,
-                            "vencimiento": vencimiento_str,
-                            "dias_vencimiento": dias_vencimiento,
-                            "rentabilidad_diaria": rent_diaria,
-                            "rentabilidad_anual": rent_anual,
-                            "break_even": break_even,
-                            "diferencia_porcentual": diferencia_porcentual,
-                            "volatilidad_implícita": volatilidad_implícita,
-                            "volumen": volumen,
-                            "open_interest": open_interest,
-                            "source": source
-                        }
-                        opciones_filtradas.append(opcion)
-                        todas_las_opciones.append(opcion)
-
-                        todas_las_opciones_df.append([
-                            ticker,
-                            f"${strike:.2f}",
-                            f"${precio_put:.2f}",
-                            f"${bid:.2f}",
-                            vencimiento_str,
-                            dias_vencimiento,
-                            f"{rent_diaria:.2f}%",
-                            f"{rent_anual:.2f}%",
-                            f"${break_even:.2f}",
-                            f"{diferencia_porcentual:.2f}%",
-                            f"{volatilidad_implícita:.2f}%",
-                            volumen,
-                            open_interest,
-                            source
-                        ])
-
-                if opciones_filtradas:
-                    tipo_opcion_texto = "Out of the Money" if FILTRO_TIPO_OPCION == "OTM" else "In the Money" if FILTRO_TIPO_OPCION == "ITM" else "Todas"
-                    resultado += f"\nOpciones PUT {tipo_opcion_texto} con rentabilidad anual > {MIN_RENTABILIDAD_ANUAL}% y diferencia % > {MIN_DIFERENCIA_PORCENTUAL}% (máximo {MAX_DIAS_VENCIMIENTO} días, volumen > {MIN_VOLUMEN}, volatilidad >= {MIN_VOLATILIDAD_IMPLICITA}%, interés abierto > {MIN_OPEN_INTEREST}, bid >= ${MIN_BID}):\n"
-                    print(f"Se encontraron {len(opciones_filtradas)} opciones que cumplen los filtros para {ticker}")
-                    
-                    tabla_datos = []
-                    for opcion in opciones_filtradas:
-                        tabla_datos.append([
-                            f"${opcion['strike']:.2f}",
-                            f"${opcion['lastPrice']:.2f}",
-                            f"${opcion['bid']:.2f}",
-                            opcion['vencimiento'],
-                            opcion['dias_vencimiento'],
-                            f"{opcion['rentabilidad_diaria']:.2f}%",
-                            f"{opcion['rentabilidad_anual']:.2f}%",
-                            f"${opcion['break_even']:.2f}",
-                            f"{opcion['diferencia_porcentual']:.2f}%",
-                            f"{opcion['volatilidad_implícita']:.2f}%",
-                            opcion['volumen'],
-                            opcion['open_interest'],
-                            opcion['source']
-                        ])
-                    
-                    headers = [
-                        "Strike",
-                        "Last Closed",
-                        "Bid",
-                        "Vencimiento",
-                        "Días Venc.",
-                        "Rent. Diaria",
-                        "Rent. Anual",
-                        "Break-even",
-                        "Dif. % (Suby.-Break.)",
-                        "Volatilidad Implícita",
-                        "Volumen",
-                        "Interés Abierto",
-                        "Fuente"
-                    ]
-                    
-                    tabla = tabulate(tabla_datos, headers=headers, tablefmt="grid")
-                    resultado += f"\n{tabla}\n"
-                    print(tabla)
-
-                    for opcion in opciones_filtradas:
-                        if (opcion['rentabilidad_anual'] >= ALERTA_RENTABILIDAD_ANUAL and 
-                            opcion['volatilidad_implícita'] >= ALERTA_VOLATILIDAD_MINIMA):
-                            alerta_msg = f"¡Oportunidad destacada! {ticker}: Rentabilidad anual: {opcion['rentabilidad_anual']:.2f}%, Volatilidad: {opcion['volatilidad_implícita']:.2f}% (Strike: ${opcion['strike']:.2f}, Vencimiento: {opcion['vencimiento']})\n"
-                            resultado += alerta_msg
-                            print(alerta_msg)
-
-                else:
-                    resultado += "\nNo se consiguieron resultados para este ticker.\n"
-                    print("No se consiguieron resultados para este ticker.")
-
+                texto_ticker, opciones_por_perfil, estado = futuro.result()
             except Exception as e:
-                error_msg = f"Error al analizar {ticker}: {e}\n"
-                resultado += error_msg
-                print(error_msg)
-                continue
-
-        # Guardar resultados.txt antes de procesar más datos
-        with open("resultados.txt", "w") as f:
-            f.write(resultado)
+                texto_ticker = f"\n{'='*50}\nAnalizando ticker: {ticker}\n{'='*50}\nError al analizar {ticker}: {e}\n"
+                opciones_por_perfil, estado = {}, "error"
+            if estado in ESTADOS_INCOMPLETOS:
+                incompletos[ticker] = estado
+            print(texto_ticker)
+
+            with etapa("escritura", ticker) as medida:
+                salida_resultados.escribir(texto_ticker)
+                filas, mejores, encolados = registrar_resultados_ticker(
+                    salidas_perfiles, ticker, opciones_por_perfil, varios, notificador, force_discord, salidas_parciales
+                )
+                medida["filas_entrada"] = filas
+                medida["filas_salida"] = mejores
+                avisos_encolados += encolados
+
+        if incompletos:
+            resumen_tiempo = (f"\n{'='*50}\nTickers incompletos por falta de tiempo ({len(incompletos)} de {len(config.tickers)}): "
+                              + ", ".join(f"{ticker} ({estado})" for ticker, estado in incompletos.items()) + "\n")
+            print(resumen_tiempo)
+            salida_resultados.escribir(resumen_tiempo)
         print("Archivo resultados.txt generado.")
+        for salidas in salidas_perfiles:
+            cerrar_salidas_perfil(salidas, varios)
 
-        # Generar todas_las_opciones.csv (incluso si está vacío)
-        headers_csv = [
-            "Ticker",
-            "Strike",
-            "Last Closed",
-            "Bid",
-            "Vencimiento",
-            "Días Venc.",
-            "Rent. Diaria",
-            "Rent. Anual",
-            "Break-even",
-            "Dif. % (Suby.-Break.)",
-            "Volatilidad Implícita",
-            "Volumen",
-            "Interés Abierto",
-            "Fuente"
-        ]
-        if todas_las_opciones_df:
-            print(f"Total de opciones filtradas (todos los tickers): {len(todas_las_opciones)}")
-            df_todas = pd.DataFrame(todas_las_opciones_df, columns=headers_csv)
-            df_todas.to_csv("todas_las_opciones.csv", index=False)
-            print("Todas las opciones exportadas a 'todas_las_opciones.csv'.")
-        else:
-            print("No se encontraron opciones que cumplan los filtros. Generando todas_las_opciones.csv vacío.")
-            df_todas = pd.DataFrame(columns=headers_csv)
-            df_todas.to_csv("todas_las_opciones.csv", index=False)
-            print("Archivo todas_las_opciones.csv generado (vacío).")
-
-        # Seleccionar los mejores contratos por ticker y aplicar reglas de alerta
-        mejores_contratos_df = []
-
-        # Diccionario para almacenar opciones filtradas por ticker
-        opciones_por_ticker = {}
-        for ticker in TICKERS:
-            opciones_por_ticker[ticker] = []
-
-        # Llenar opciones_por_ticker con las opciones filtradas
-        for opcion in todas_las_opciones:
-            opciones_por_ticker[opcion['ticker']].append(opcion)
-
-        # Seleccionar los mejores contratos por ticker
-        mejores_contratos_por_ticker = []
-        for ticker, opciones in opciones_por_ticker.items():
-            if opciones:
-                # Ordenar opciones por rentabilidad anual (descendente), días al vencimiento (ascendente), diferencia porcentual (descendente)
-                opciones_ordenadas = sorted(
-                    opciones,
-                    key=lambda x: (-x['rentabilidad_anual'], x['dias_vencimiento'], -x['diferencia_porcentual'])
-                )
-                # Filtrar por reglas de alerta
-                opciones_filtradas_alerta = [
-                    opcion for opcion in opciones_ordenadas
-                    if (opcion['rentabilidad_anual'] >= ALERTA_RENTABILIDAD_ANUAL and 
-                        opcion['volatilidad_implícita'] >= ALERTA_VOLATILIDAD_MINIMA)
-                ]
-                # Tomar los mejores contratos según TOP_CONTRATOS (o menos si no hay suficientes que cumplan las alertas)
-                mejores_n = opciones_filtradas_alerta[:TOP_CONTRATOS]
-                mejores_contratos_por_ticker.extend(mejores_n)
-
-                # Preparar datos para la tabla y el CSV
-                for opcion in mejores_n:
-                    mejores_contratos_df.append([
-                        opcion['ticker'],
-                        f"${opcion['strike']:.2f}",
-                        f"${opcion['lastPrice']:.2f}",
-                        f"${opcion['bid']:.2f}",
-                        opcion['vencimiento'],
-                        opcion['dias_vencimiento'],
-                        f"{opcion['rentabilidad_diaria']:.2f}%",
-                        f"{opcion['rentabilidad_anual']:.2f}%",
-                        f"${opcion['break_even']:.2f}",
-                        f"{opcion['diferencia_porcentual']:.2f}%",
-                        f"{opcion['volatilidad_implícita']:.2f}%",
-                        opcion['volumen'],
-                        opcion['open_interest'],
-                        opcion['source']
-                    ])
-
-        # Generar Mejores_Contratos.txt y mejores_contratos.csv
-        headers_mejores = [
-            "Ticker",
-            "Strike",
-            "Last Closed",
-            "Bid",
-            "Vencimiento",
-            "Días Venc.",
-            "Rent. Diaria",
-            "Rent. Anual",
-            "Break-even",
-            "Dif. % (Suby.-Break.)",
-            "Volatilidad Implícita",
-            "Volumen",
-            "Interés Abierto",
-            "Fuente"
-        ]
-        if mejores_contratos_por_ticker:
-            # Extraer tickers únicos de los contratos seleccionados
-            tickers_identificados = sorted(list(set([opcion['ticker'] for opcion in mejores_contratos_por_ticker])))
-            ticker_list = ", ".join(tickers_identificados)
-            print(f"Tickers identificados como oportunidades: {ticker_list}")
-
-            tipo_opcion_texto = "Out of the Money" if FILTRO_TIPO_OPCION == "OTM" else "In the Money" if FILTRO_TIPO_OPCION == "ITM" else "Todas"
-            contenido_mejores = f"Mejores Contratos por Ticker (Mayor Rentabilidad Anual, Menor Tiempo, Mayor Diferencia %):\n{'='*50}\n"
-
-            # Agrupar contratos por ticker para una mejor presentación
-            contratos_por_ticker = {}
-            for opcion in mejores_contratos_por_ticker:
-                ticker = opcion['ticker']
-                if ticker not in contratos_por_ticker:
-                    contratos_por_ticker[ticker] = []
-                contratos_por_ticker[ticker].append(opcion)
-
-            # Generar lista por ticker (formato simple)
-            for ticker, contratos in contratos_por_ticker.items():
-                contenido_mejores += f"\nTicker: {ticker}\n{'-'*30}\n"
-                for i, opcion in enumerate(contratos, 1):
-                    contenido_mejores += f"Contrato {i}:\n"
-                    contenido_mejores += f"  Ticker: {opcion['ticker']}\n"
-                    contenido_mejores += f"  Strike: ${opcion['strike']:.2f}\n"
-                    contenido_mejores += f"  Last Closed: ${opcion['lastPrice']:.2f}\n"
-                    contenido_mejores += f"  Bid: ${opcion['bid']:.2f}\n"
-                    contenido_mejores += f"  Vencimiento: {opcion['vencimiento']}\n"
-                    contenido_mejores += f"  Días Venc.: {opcion['dias_vencimiento']}\n"
-                    contenido_mejores += f"  Rent. Diaria: {opcion['rentabilidad_diaria']:.2f}%\n"
-                    contenido_mejores += f"  Rent. Anual: {opcion['rentabilidad_anual']:.2f}%\n"
-                    contenido_mejores += f"  Break-even: ${opcion['break_even']:.2f}\n"
-                    contenido_mejores += f"  Dif. % (Suby.-Break.): {opcion['diferencia_porcentual']:.2f}%\n"
-                    contenido_mejores += f"  Volatilidad Implícita: {opcion['volatilidad_implícita']:.2f}%\n"
-                    contenido_mejores += f"  Volumen: {opcion['volumen']}\n"
-                    contenido_mejores += f"  Interés Abierto: {opcion['open_interest']}\n"
-                    contenido_mejores += f"  Fuente: {opcion['source']}\n"
-                    contenido_mejores += "\n"
-
-            # Guardar en Mejores_Contratos.txt
-            with open("Mejores_Contratos.txt", "w") as f:
-                f.write(contenido_mejores)
-            print("Mejores contratos por ticker exportados a 'Mejores_Contratos.txt'.")
-
-            # Guardar en mejores_contratos.csv
-            df_mejores = pd.DataFrame(mejores_contratos_df, columns=headers_mejores)
-            df_mejores.to_csv("mejores_contratos.csv", index=False)
-            print("Mejores contratos exportados a 'mejores_contratos.csv'.")
-
-            # Verificar y depurar antes de enviar a Discord
-            print(f"[DEBUG] Valor de DISCORD_WEBHOOK_URL antes de enviar: {DISCORD_WEBHOOK_URL}")
-            if not es_ejecucion_manual or force_discord or ENVIAR_NOTIFICACION_MANUAL:
-                enviar_notificacion_discord(tipo_opcion_texto, TOP_CONTRATOS, tickers_identificados, ALERTA_RENTABILIDAD_ANUAL, ALERTA_VOLATILIDAD_MINIMA)
+        esperar_avisos(notificador, avisos_encolados)
 
-        else:
-            print("No se encontraron contratos que cumplan las reglas de alerta en ningún ticker.")
-            # Generar mejores_contratos.csv vacío
-            df_mejores = pd.DataFrame(columns=headers_mejores)
-            df_mejores.to_csv("mejores_contratos.csv", index=False)
-            print("Archivo mejores_contratos.csv generado (vacío).")
+        if fragmento is not None:
+            for salida_parcial in salidas_parciales.values():
+                salida_parcial.cerrar()
+            with open(ruta_informe(PARCIAL_META), "w") as f:
+                json.dump({"fragmento": fragmento[0], "fragmentos": fragmento[1], "tickers": config.tickers,
+                           "perfiles": [perfil.nombre for perfil in config.perfiles], "datos_reales": datos_reales,
+                           "generado": datetime.now().isoformat(timespec="seconds")}, f, indent=2)
+            print(f"Resultado parcial del fragmento {fragmento[0]}/{fragmento[1]} guardado en {DIRECTORIO_EJECUCION}.")
 
     except Exception as e:
+        # Los informes conservan lo escrito hasta el error
         error_msg = f"Error general: {e}\n"
         print(error_msg)
-        resultado += error_msg
-        with open("resultados.txt", "w") as f:
-            f.write(resultado)
-
-        # Generar archivos vacíos para evitar problemas con los artefactos
-        headers_csv = [
-            "Ticker",
-            "Strike",
-            "Last Closed",
-            "Bid",
-            "Vencimiento",
-            "Días Venc.",
-            "Rent. Diaria",
-            "Rent. Anual",
-            "Break-even",
-            "Dif. % (Suby.-Break.)",
-            "Volatilidad Implícita",
-            "Volumen",
-            "Interés Abierto",
-            "Fuente"
-        ]
-        df_todas = pd.DataFrame(columns=headers_csv)
-        df_todas.to_csv("todas_las_opciones.csv", index=False)
-        print("Archivo todas_las_opciones.csv generado (vacío debido a error).")
-
-        df_mejores = pd.DataFrame(columns=headers_csv)
-        df_mejores.to_csv("mejores_contratos.csv", index=False)
-        print("Archivo mejores_contratos.csv generado (vacío debido a error).")
+        salida_resultados.escribir(error_msg)
+
+    finally:
+        salida_resultados.cerrar()
+        for salidas in salidas_perfiles:
+            for clave in ("todas", "mejores", "mejores_txt"):
+                salidas[clave].cerrar()
+        for salida_parcial in (salidas_parciales or {}).values():
+            salida_parcial.cerrar()
+
+    print(f"Poda de cadenas: {ESTADISTICAS_PODA['vencimientos_omitidos']} peticiones de vencimiento evitadas, "
+          f"{ESTADISTICAS_PODA['filas_descartadas']} filas descartadas al parsear")
+    if CACHE is not None:
+        print(f"Resumen de la caché: {CACHE.resumen()}")
+    if ARCHIVO is not None:
+        print(f"Instantáneas archivadas en {ARCHIVO.ruta}: {ARCHIVO.escritas}")
+    resumen_http = obtener_cliente().resumen()
+    for host, contador in resumen_http.items():
+        print(f"Resumen HTTP {host}: {contador}")
+    try:
+        ruta = METRICAS.guardar(ruta_informe(METRICAS_RUTA), http=resumen_http, cache=CACHE.resumen() if CACHE is not None else None,
+                                poda=dict(ESTADISTICAS_PODA),
+                                archivo={"ruta": ARCHIVO.ruta, "escritas": ARCHIVO.escritas} if ARCHIVO is not None else None,
+                                alertas=dict(ALERTAS.resumen(), **NOTIFICADOR.resumen()) if NOTIFICADOR is not None else None,
+                                plazos={"presupuesto_ticker_segundos": PRESUPUESTO_TICKER_SEGUNDOS,
+                                        "plazo_ejecucion_segundos": PLAZO_EJECUCION_SEGUNDOS,
+                                        "incompletos": list(incompletos), "estados": incompletos})
+        print(f"Métricas por etapa guardadas en {ruta}.")
+        # Los fragmentos no actualizan los pesos: lo hace la reducción con las métricas de todos
+        if fragmento is None and datos_reales:
+            pesos = pesos_de_metricas(ruta)
+            if pesos:
+                guardar_pesos(pesos)
+    except OSError as e:
+        print(f"No se pudieron guardar las métricas: {e}")
+
+def esperar_avisos(notificador, avisos_encolados):
+    """Al final de la ejecución, espera (con límite) a que se envíen los avisos encolados."""
+    if notificador is None:
+        return
+    if avisos_encolados:
+        print(f"Avisos nuevos o con cambios para Discord: {avisos_encolados}. Esperando a que terminen los envíos...")
+        if not notificador.vaciar(ALERTAS_TIMEOUT_ENVIO):
+            print(f"Los envíos a Discord siguen en curso tras {ALERTAS_TIMEOUT_ENVIO:.0f}s; se continúan en segundo plano.")
+    else:
+        print("Sin oportunidades nuevas desde el último aviso: no se envía la notificación a Discord.")
+
+def reducir_fragmentos(directorios=None, offline=False):
+    """Combina los resultados parciales de los fragmentos en los informes globales.
+
+    Escribe resultados.txt (las secciones de cada fragmento), todas_las_opciones.csv y los mejores
+    contratos por ticker de cada perfil, en el orden de TICKERS, y envía un único aviso a Discord
+    con los contratos nuevos o con cambios. Actualiza pesos_tickers.json con el tamaño de las
+    cadenas medido por cada fragmento, para equilibrar el siguiente reparto. Devuelve 0 si ha
+    podido reducir algún fragmento y 1 si no.
+    """
+    global DIRECTORIO_EJECUCION
+    DIRECTORIO_EJECUCION = DIRECTORIO_INFORMES
+    os.makedirs(DIRECTORIO_EJECUCION, exist_ok=True)
+    directorios = directorios or sorted(glob.glob(os.path.join(DIRECTORIO_PARCIALES, "fragmento_*")))
+    config, _ = obtener_configuracion(mostrar=False)
+    try:
+        formatos = formatos_exportacion()
+    except ValueError as e:
+        print(e)
+        return 1
+
+    parciales = []
+    for directorio in directorios:
+        try:
+            with open(os.path.join(directorio, PARCIAL_META)) as f:
+                meta = json.load(f)
+            opciones = leer_parciales(directorio)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Se omite {directorio}: no contiene un resultado parcial válido ({e}).")
+            continue
+        parciales.append((directorio, meta, opciones))
+    if not parciales:
+        print(f"No hay resultados parciales que reducir en {', '.join(directorios) or DIRECTORIO_PARCIALES}.")
+        return 1
+    parciales.sort(key=lambda parcial: parcial[1]["fragmento"])
+
+    avisos_cobertura = []
+    totales = {meta["fragmentos"] for _, meta, _ in parciales}
+    if len(totales) > 1:
+        avisos_cobertura.append(f"Los parciales proceden de repartos distintos (N = {sorted(totales)}).")
+    else:
+        faltan = sorted(set(range(1, totales.pop() + 1)) - {meta["fragmento"] for _, meta, _ in parciales})
+        if faltan:
+            avisos_cobertura.append(f"Faltan los fragmentos {', '.join(map(str, faltan))}: el resultado es incompleto.")
+    nombres_perfiles = [perfil.nombre for perfil in config.perfiles]
+    for directorio, meta, _ in parciales:
+        if meta.get("perfiles", nombres_perfiles) != nombres_perfiles:
+            avisos_cobertura.append(f"{directorio} se generó con otros perfiles ({', '.join(meta['perfiles'])}).")
+    for aviso in avisos_cobertura:
+        print(f"Aviso: {aviso}")
+
+    # Orden de TICKERS; los tickers de los parciales que no estén en la configuración actual van al final
+    analizados = [ticker for _, meta, _ in parciales for ticker in meta["tickers"]]
+    tickers = [ticker for ticker in config.tickers if ticker in set(analizados)]
+    tickers += [ticker for ticker in analizados if ticker not in set(tickers)]
+    opciones = {}
+    for _, _, opciones_parcial in parciales:
+        opciones.update(opciones_parcial)
+
+    es_ejecucion_manual = os.getenv("GITHUB_EVENT_NAME", "schedule") == "workflow_dispatch"
+    force_discord = os.getenv("FORCE_DISCORD_NOTIFICATION", "false").lower() == "true"
+    datos_reales = all(meta.get("datos_reales", True) for _, meta, _ in parciales)
+    notificador = preparar_notificador(offline, datos_reales, es_ejecucion_manual, force_discord)
+
+    varios = len(config.perfiles) > 1
+    cabecera = (f"Resultado combinado de {len(parciales)} fragmentos - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}:\n"
+                f"Tickers analizados: {len(tickers)}\n" + "".join(f"Aviso: {aviso}\n" for aviso in avisos_cobertura) +
+                f"{'='*50}\n")
+    salidas_perfiles = [abrir_salidas_perfil(perfil, varios, formatos) for perfil in config.perfiles]
+    avisos_encolados = 0
+    try:
+        with SalidaTexto(ruta_informe("resultados.txt"), cabecera) as salida_resultados:
+            for directorio, meta, _ in parciales:
+                try:
+                    with open(os.path.join(directorio, "resultados.txt")) as f:
+                        salida_resultados.escribir(f"\n{'#'*50}\nFragmento {meta['fragmento']}/{meta['fragmentos']}\n{'#'*50}\n{f.read()}")
+                except OSError as e:
+                    salida_resultados.escribir(f"\nFragmento {meta['fragmento']}: sin resultados.txt ({e})\n")
+
+        for ticker in tickers:
+            _, _, encolados = registrar_resultados_ticker(salidas_perfiles, ticker, opciones.get(ticker, {}), varios,
+                                                          notificador, force_discord)
+            avisos_encolados += encolados
+        for salidas in salidas_perfiles:
+            cerrar_salidas_perfil(salidas, varios)
+        esperar_avisos(notificador, avisos_encolados)
+    finally:
+        for salidas in salidas_perfiles:
+            for clave in ("todas", "mejores", "mejores_txt"):
+                salidas[clave].cerrar()
+
+    pesos = {}
+    for directorio, _, _ in parciales:
+        pesos.update(pesos_de_metricas(os.path.join(directorio, METRICAS_RUTA)))
+    if pesos:
+        guardar_pesos(pesos)
+        print(f"Pesos de {len(pesos)} tickers actualizados para el próximo reparto.")
+    return 0
+
+def reiniciar_estado_ejecucion():
+    """Deja el estado de módulo listo para un nuevo ciclo (cotizaciones y estadísticas de la ejecución anterior)."""
+    global SCRIPT_EJECUTADO
+    SCRIPT_EJECUTADO = False
+    COTIZACIONES.clear()
+    with _LOCK_PODA:
+        ESTADISTICAS_PODA["vencimientos_omitidos"] = 0
+        ESTADISTICAS_PODA["filas_descartadas"] = 0
+
+def vigilar(intervalo=WATCH_INTERVALO_SEGUNDOS, offline=False, proveedores=None, max_ciclos=None):
+    """Modo vigilancia: repite el análisis cada `intervalo` segundos en el mismo proceso.
+
+    Solo se vuelven a descargar las instantáneas caducadas en la caché (CACHE_TTL_SEGUNDOS), solo
+    se recalculan los vencimientos cuya cadena ha cambiado y solo se notifica a Discord cuando
+    aparecen oportunidades nuevas o cambia su rentabilidad. Se detiene con Ctrl+C.
+    """
+    global MEMO_FILTRADO
+    MEMO_FILTRADO = {}
+    if CACHE_TTL_SEGUNDOS > intervalo:
+        print(f"Aviso: CACHE_TTL_SEGUNDOS ({CACHE_TTL_SEGUNDOS}s) es mayor que el intervalo ({intervalo}s); "
+              "algunas cadenas se reutilizarán durante varios ciclos.")
+    ciclo = 0
+    try:
+        while max_ciclos is None or ciclo < max_ciclos:
+            inicio = time.monotonic()
+            reiniciar_estado_ejecucion()
+            try:
+                analizar_opciones(offline=offline, proveedores=proveedores)
+            except Exception as e:
+                print(f"Error en el ciclo {ciclo + 1}: {e}")
+            ciclo += 1
+            if max_ciclos is not None and ciclo >= max_ciclos:
+                break
+            espera = max(0.0, intervalo - (time.monotonic() - inicio))
+            print(f"Ciclo {ciclo} completado en {time.monotonic() - inicio:.1f}s. Siguiente en {espera:.0f}s.")
+            time.sleep(espera)
+    except KeyboardInterrupt:
+        print("Modo vigilancia detenido.")
+    finally:
+        if CACHE is not None:
+            CACHE.cerrar()
+        if NOTIFICADOR is not None:
+            NOTIFICADOR.vaciar()
 
 if __name__ == "__main__":
-    analizar_opciones()
+    from cli import main
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Archivo histórico de cadenas de opciones en Parquet, particionado por fecha y ticker.
+
+Estructura en disco (particiones al estilo Hive):
+
+    ARCHIVO_RUTA/fecha=2025-01-06/ticker=NVDA/153012000000.parquet
+
+Cada fichero es una instantánea de la cadena combinada de un ticker con tipos compactos: precios
+en float32, ticker y fuente categóricos y fechas como días desde 1970-01-01 (int32). Las
+consultas eligen los ficheros por la ruta, así que nunca se lee más que las particiones pedidas.
+Requiere pyarrow.
+
+Se archiva la cadena que descarga el análisis, ya podada a su ventana de días y a su lado de
+strikes (FILTRO_TIPO_OPCION), así que archivar no cuesta descargas ni memoria de más. Con
+ARCHIVO_LADO=TODAS y ARCHIVO_DIAS_VENCIMIENTO se descarga y archiva una cadena más amplia. Cada
+instantánea registra su ventana (dte_maximo) y su lado de strikes (lado), para que las consultas
+y el backtest detecten cuándo piden más de lo que el archivo cubre. En las instantáneas
+anteriores a estas columnas se deducen de sus propios datos.
+"""
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from contratos import a_dias
+
+# Configuración del archivo (ajustable por variables de entorno)
+ARCHIVO_RUTA = os.getenv("ARCHIVO_RUTA", "archivo_cadenas")
+ARCHIVO_ACTIVO = os.getenv("ARCHIVO_ACTIVO", "true").lower() == "true"
+# Días al vencimiento que se descargan y archivan como mínimo aunque el análisis use menos
+# (0: la ventana MAX_DIAS_VENCIMIENTO de la ejecución). Cada vencimiento de más es una petición.
+ARCHIVO_DIAS_VENCIMIENTO = int(os.getenv("ARCHIVO_DIAS_VENCIMIENTO", "0"))
+# TODAS descarga y archiva los strikes de ambos lados; vacío, solo el lado del análisis (FILTRO_TIPO_OPCION)
+ARCHIVO_LADO = os.getenv("ARCHIVO_LADO", "").strip().upper()
+
+# Columnas y tipos de cada instantánea archivada
+ESQUEMA = {
+    "capturado": "int64",          # segundos desde la época (UTC)
+    "fecha": "int32",              # día de la captura, en días desde la época
+    "ticker": "category",
+    "vencimiento": "int32",        # días desde la época
+    "dias_vencimiento": "int16",
+    "strike": "float32",
+    "lastPrice": "float32",
+    "bid": "float32",
+    "volume": "int32",
+    "openInterest": "int32",
+    "impliedVolatility": "float32",
+    "precio_subyacente": "float32",
+    "source": "category",
+    "dte_maximo": "int16",         # ventana de días al vencimiento descargada en la captura
+    "lado": "category"             # strikes archivados: TODAS, OTM (< subyacente) o ITM (>= subyacente)
+}
+
+# Columnas de cobertura (ausentes en las instantáneas anteriores a su introducción)
+COLUMNAS_COBERTURA = ["dte_maximo", "lado"]
+
+
+def lado_de_strikes(strike, precio_subyacente):
+    """Lado de strikes que contiene una cadena: TODAS si los tiene a ambos lados del subyacente."""
+    strike = np.asarray(strike, dtype=float)
+    if len(strike) and (strike < precio_subyacente).all():
+        return "OTM"
+    if len(strike) and (strike >= precio_subyacente).all():
+        return "ITM"
+    return "TODAS"
+
+
+def compactar_cadena(cadena, ticker, precio_subyacente, capturado=None, dte_maximo=None, lado="TODAS"):
+    """Convierte una cadena combinada (COLUMNAS_CADENA) al ESQUEMA del archivo.
+
+    `dte_maximo` es la ventana de días al vencimiento que se descargó (por defecto, el mayor
+    presente) y `lado` los strikes que se conservaron.
+    """
+    capturado = capturado or datetime.now()
+    fecha = a_dias(capturado)
+    vencimiento = (pd.to_datetime(cadena["expirationDate"], format="%Y-%m-%d").to_numpy(dtype="datetime64[D]")
+                   .astype(np.int64)).astype(np.int32)
+    if dte_maximo is None:
+        dte_maximo = int((vencimiento - fecha).max()) if len(vencimiento) else 0
+    return pd.DataFrame({
+        "capturado": np.int64(capturado.timestamp()),
+        "fecha": np.int32(fecha),
+        "ticker": pd.Categorical([ticker] * len(cadena)),
+        "vencimiento": vencimiento,
+        "dias_vencimiento": (vencimiento - fecha).astype(np.int16),
+        "strike": cadena["strike"].astype(np.float32).to_numpy(),
+        "lastPrice": cadena["lastPrice"].astype(np.float32).to_numpy(),
+        "bid": cadena["bid"].astype(np.float32).to_numpy(),
+        "volume": cadena["volume"].fillna(0).astype(np.int32).to_numpy(),
+        "openInterest": cadena["openInterest"].fillna(0).astype(np.int32).to_numpy(),
+        "impliedVolatility": cadena["impliedVolatility"].astype(np.float32).to_numpy(),
+        "precio_subyacente": np.float32(precio_subyacente),
+        "source": pd.Categorical(cadena["source"].astype(str).to_numpy()),
+        "dte_maximo": np.int16(dte_maximo),
+        "lado": pd.Categorical([lado] * len(cadena))
+    }, columns=list(ESQUEMA))
+
+
+def leer_instantanea(ruta, columnas=None):
+    """Lee un fichero del archivo; a las instantáneas sin columnas de cobertura se les deducen de sus datos."""
+    import pyarrow.parquet as pq
+    if "dte_maximo" in pq.read_schema(ruta).names:
+        return pd.read_parquet(ruta, engine="pyarrow", columns=columnas)
+    leer = None if columnas is None else list(dict.fromkeys(
+        [columna for columna in columnas if columna not in COLUMNAS_COBERTURA] +
+        ["dias_vencimiento", "strike", "precio_subyacente"]))
+    instantanea = pd.read_parquet(ruta, engine="pyarrow", columns=leer)
+    # Antes se archivaba la cadena ya podada: la ventana y el lado son los que muestran sus datos
+    dte_maximo = int(instantanea["dias_vencimiento"].max()) if len(instantanea) else 0
+    lado = lado_de_strikes(instantanea["strike"], float(instantanea["precio_subyacente"].iloc[0])) if len(instantanea) else "TODAS"
+    instantanea["dte_maximo"] = np.int16(dte_maximo)
+    instantanea["lado"] = pd.Categorical([lado] * len(instantanea))
+    return instantanea[list(ESQUEMA) if columnas is None else list(columnas)]
+
+
+class ArchivoCadenas:
+    """Archivo particionado de instantáneas de cadenas con consultas por ticker, fechas y DTE."""
+
+    def __init__(self, ruta=ARCHIVO_RUTA):
+        import pyarrow  # noqa: F401  (falla aquí, y no al primer guardado, si no está instalado)
+        self.ruta = ruta
+        self.escritas = 0
+        self._ultimas_huellas = {}
+        self._lock = threading.Lock()
+
+    def _directorio(self, fecha, ticker):
+        return os.path.join(self.ruta, f"fecha={fecha.isoformat()}", f"ticker={ticker}")
+
+    def guardar(self, ticker, cadena, precio_subyacente, capturado=None, huella=None, dte_maximo=None, lado="TODAS"):
+        """Añade la instantánea de un ticker; si `huella` coincide con la última guardada no se repite.
+
+        `dte_maximo` y `lado` describen la cobertura de la cadena (ver compactar_cadena()).
+        """
+        if cadena.empty:
+            return None
+        if huella is not None:
+            with self._lock:
+                if self._ultimas_huellas.get(ticker) == huella:
+                    return None
+                self._ultimas_huellas[ticker] = huella
+        capturado = capturado or datetime.now()
+        directorio = self._directorio(capturado.date(), ticker)
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f"{capturado.strftime('%H%M%S%f')}.parquet")
+        compactar_cadena(cadena, ticker, precio_subyacente, capturado, dte_maximo, lado).to_parquet(
+            ruta, engine="pyarrow", index=False)
+        with self._lock:
+            self.escritas += 1
+        return ruta
+
+    def particiones(self, tickers=None, desde=None, hasta=None):
+        """Ficheros de las particiones que cumplen ticker y rango de fechas de captura (inclusive)."""
+        if not os.path.isdir(self.ruta):
+            return []
+        tickers = {tickers} if isinstance(tickers, str) else set(tickers) if tickers else None
+        desde = a_dias(desde) if desde is not None else None
+        hasta = a_dias(hasta) if hasta is not None else None
+        ficheros = []
+        for nombre_fecha in sorted(os.listdir(self.ruta)):
+            if not nombre_fecha.startswith("fecha="):
+                continue
+            dias = a_dias(nombre_fecha[len("fecha="):])
+            if (desde is not None and dias < desde) or (hasta is not None and dias > hasta):
+                continue
+            ruta_fecha = os.path.join(self.ruta, nombre_fecha)
+            for nombre_ticker in sorted(os.listdir(ruta_fecha)):
+                if not nombre_ticker.startswith("ticker="):
+                    continue
+                if tickers is not None and nombre_ticker[len("ticker="):] not in tickers:
+                    continue
+                ruta_ticker = os.path.join(ruta_fecha, nombre_ticker)
+                ficheros.extend(os.path.join(ruta_ticker, f) for f in sorted(os.listdir(ruta_ticker)) if f.endswith(".parquet"))
+        return ficheros
+
+    def iterar(self, tickers=None, desde=None, hasta=None, dte_min=None, dte_max=None, columnas=None):
+        """Genera las instantáneas que cumplen la consulta, fichero a fichero (memoria acotada por instantánea)."""
+        leer = None if columnas is None else list(dict.fromkeys(list(columnas) + ["dias_vencimiento"]))
+        for ruta in self.particiones(tickers, desde, hasta):
+            instantanea = leer_instantanea(ruta, leer)
+            if dte_min is not None or dte_max is not None:
+                dte = instantanea["dias_vencimiento"]
+                mascara = np.ones(len(instantanea), dtype=bool)
+                if dte_min is not None:
+                    mascara &= (dte >= dte_min).to_numpy()
+                if dte_max is not None:
+                    mascara &= (dte <= dte_max).to_numpy()
+                instantanea = instantanea[mascara]
+            if columnas is not None:
+                instantanea = instantanea[list(columnas)]
+            if not instantanea.empty:
+                yield instantanea
+
+    def consultar(self, tickers=None, desde=None, hasta=None, dte_min=None, dte_max=None, columnas=None):
+        """Como iterar(), pero concatenado en un único DataFrame.
+
+        Ejemplo: puts de NVDA con 20 a 40 días al vencimiento en los últimos seis meses:
+
+            archivo.consultar("NVDA", desde=date.today() - timedelta(days=182), dte_min=20, dte_max=40)
+        """
+        partes = list(self.iterar(tickers, desde, hasta, dte_min, dte_max, columnas))
+        if not partes:
+            return pd.DataFrame({columna: pd.Series(dtype=tipo) for columna, tipo in ESQUEMA.items()
+                                 if columnas is None or columna in columnas})
+        combinadas = pd.concat(partes, ignore_index=True)
+        # concat pierde el tipo categórico si las categorías difieren entre ficheros
+        for columna in ("ticker", "source", "lado"):
+            if columna in combinadas.columns:
+                combinadas[columna] = combinadas[columna].astype("category")
+        return combinadas
+
+    def cobertura(self, tickers=None, desde=None, hasta=None):
+        """Lo que cubren todas las instantáneas de la consulta.
+
+        Devuelve {"instantaneas", "dte_maximo": la menor ventana de días al vencimiento descargada
+        (None si no hay instantáneas), "lados": lados de strikes presentes}. Una consulta o un
+        backtest con más días que dte_maximo, o con strikes de un lado que falta, estaría incompleto.
+        """
+        instantaneas = 0
+        dte_maximo = None
+        lados = set()
+        for instantanea in self.iterar(tickers, desde, hasta, columnas=COLUMNAS_COBERTURA):
+            instantaneas += 1
+            dte = int(instantanea["dte_maximo"].iloc[0])
+            dte_maximo = dte if dte_maximo is None else min(dte_maximo, dte)
+            lados.update(instantanea["lado"].astype(str).unique())
+        return {"instantaneas": instantaneas, "dte_maximo": dte_maximo, "lados": sorted(lados)}
+
+
+def lado_cubierto(lados, filtro_tipo_opcion):
+    """Indica si instantáneas con estos `lados` contienen todos los strikes que pide FILTRO_TIPO_OPCION."""
+    admitidos = {"TODAS"} if filtro_tipo_opcion == "TODAS" else {"TODAS", filtro_tipo_opcion}
+    return set(lados) <= admitidos
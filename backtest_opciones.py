@@ -0,0 +1,353 @@
+"""Backtest y barrido de parámetros sobre las instantáneas del archivo histórico.
+
+Cada instantánea archivada se filtra una sola vez con filtrar_opciones(), usando los umbrales más
+permisivos de la rejilla, y cada contrato candidato se liquida al vencimiento con el precio del
+subyacente archivado ese día (venta de put: se cobra el bid y se paga max(strike - precio, 0)).
+Después, cada combinación de parámetros es una máscara vectorizada sobre esas candidatas, y la
+selección de mejores contratos reproduce la del script (alertas y TOP_CONTRATOS por ticker y
+ejecución). Las combinaciones se reparten entre varios procesos.
+
+    python backtest_opciones.py --desde 2025-01-01
+    python backtest_opciones.py --param MIN_RENTABILIDAD_ANUAL=20:80:5 --param MIN_BID=0.5,1,2 --procesos 8
+
+El archivo solo contiene los vencimientos de la ventana que se descargó en cada captura (y las
+instantáneas antiguas, solo el lado OTM/ITM de su ejecución). Antes de evaluar se comprueba esa
+cobertura: una rejilla con MAX_DIAS_VENCIMIENTO mayor que la ventana archivada, o un
+FILTRO_TIPO_OPCION con strikes que faltan, se rechaza en lugar de dar resultados sesgados.
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from analizar_opciones import filtrar_opciones
+from archivo_cadenas import ARCHIVO_RUTA, ArchivoCadenas, lado_cubierto
+from configuracion import obtener_configuracion
+
+# Días que se admite retroceder desde el vencimiento para encontrar el precio de liquidación
+TOLERANCIA_LIQUIDACION_DIAS = int(os.getenv("TOLERANCIA_LIQUIDACION_DIAS", "3"))
+
+# Contratos mínimos seleccionados para que una combinación entre en la clasificación final
+MIN_OPERACIONES = int(os.getenv("BACKTEST_MIN_OPERACIONES", "20"))
+
+# Parámetros que se pueden barrer: columna de las candidatas y sentido del umbral
+PARAMETROS_BARRIBLES = {
+    "MIN_RENTABILIDAD_ANUAL": ("rentabilidad_anual", "min"),
+    "MIN_DIFERENCIA_PORCENTUAL": ("diferencia_porcentual", "min"),
+    "MIN_VOLATILIDAD_IMPLICITA": ("volatilidad_implícita", "min"),
+    "MIN_BID": ("bid", "min"),
+    "MAX_DIAS_VENCIMIENTO": ("dias_vencimiento", "max"),
+    "MAX_DELTA": ("delta_abs", "max"),
+    "MIN_PROB_BENEFICIO": ("prob_beneficio", "min"),
+    "ALERTA_RENTABILIDAD_ANUAL": ("rentabilidad_anual", "min"),
+    "ALERTA_VOLATILIDAD_MINIMA": ("volatilidad_implícita", "min"),
+    "TOP_CONTRATOS": (None, "max")
+}
+
+# Rejilla por defecto (13 x 7 x 9 x 4 = 3276 combinaciones); el resto toma el valor de la configuración
+REJILLA_POR_DEFECTO = {
+    "MIN_RENTABILIDAD_ANUAL": list(np.arange(20.0, 80.1, 5.0)),
+    "MIN_DIFERENCIA_PORCENTUAL": list(np.arange(0.0, 15.1, 2.5)),
+    "MIN_VOLATILIDAD_IMPLICITA": list(np.arange(20.0, 60.1, 5.0)),
+    "MIN_BID": [0.25, 0.5, 0.99, 1.5]
+}
+
+# Columnas de orden de cada criterio de ranking.CLAVES_ORDEN (la primera es la principal)
+ORDEN_CANDIDATAS = {
+    "rentabilidad": [("rentabilidad_anual", -1), ("dias_vencimiento", 1), ("diferencia_porcentual", -1)],
+    "diferencia": [("diferencia_porcentual", -1), ("rentabilidad_anual", -1), ("dias_vencimiento", 1)],
+    "volatilidad": [("volatilidad_implícita", -1), ("rentabilidad_anual", -1), ("dias_vencimiento", 1)],
+    "delta": [("delta_abs", 1), ("rentabilidad_anual", -1), ("dias_vencimiento", 1)],
+    "probabilidad": [("prob_beneficio", -1), ("rentabilidad_anual", -1), ("dias_vencimiento", 1)]
+}
+
+
+def parsear_valores(texto):
+    """'20:80:5' (inicio:fin:paso, fin incluido) o '0.5,1,2' a lista de floats."""
+    if ":" in texto:
+        inicio, fin, paso = (float(parte) for parte in texto.split(":"))
+        return list(np.arange(inicio, fin + paso / 2, paso))
+    return [float(parte) for parte in texto.split(",") if parte.strip()]
+
+
+def construir_rejilla(config, parametros=None):
+    """Lista de valores de cada parámetro barrible: los de `parametros` o, si no, los de la configuración."""
+    filtros = config.filtros()
+    filtros["TOP_CONTRATOS"] = config.top_contratos
+    parametros = REJILLA_POR_DEFECTO if parametros is None else parametros
+    desconocidos = set(parametros) - set(PARAMETROS_BARRIBLES)
+    if desconocidos:
+        raise ValueError(f"Parámetros no barribles: {', '.join(sorted(desconocidos))}. "
+                         f"Disponibles: {', '.join(PARAMETROS_BARRIBLES)}")
+    return {nombre: [float(v) for v in parametros.get(nombre, [filtros[nombre]])] for nombre in PARAMETROS_BARRIBLES}
+
+
+def filtros_permisivos(config, rejilla):
+    """Filtros de la configuración con cada umbral barrido en su valor más permisivo de la rejilla."""
+    filtros = config.filtros()
+    for nombre, (_, sentido) in PARAMETROS_BARRIBLES.items():
+        if nombre in filtros:
+            filtros[nombre] = max(rejilla[nombre]) if sentido == "max" else min(rejilla[nombre])
+    # Las alertas se aplican después, en la máscara; aquí no deben descartar nada
+    filtros["MIN_RENTABILIDAD_ANUAL"] = min(filtros["MIN_RENTABILIDAD_ANUAL"], *rejilla["ALERTA_RENTABILIDAD_ANUAL"])
+    filtros["MIN_VOLATILIDAD_IMPLICITA"] = min(filtros["MIN_VOLATILIDAD_IMPLICITA"], *rejilla["ALERTA_VOLATILIDAD_MINIMA"])
+    filtros["MAX_DIAS_VENCIMIENTO"] = int(filtros["MAX_DIAS_VENCIMIENTO"])
+    return filtros
+
+
+def validar_cobertura(filtros, cobertura):
+    """Lanza ValueError si los filtros permisivos piden vencimientos o strikes que el archivo no tiene."""
+    if cobertura["dte_maximo"] is None:
+        return
+    if filtros["MAX_DIAS_VENCIMIENTO"] > cobertura["dte_maximo"]:
+        raise ValueError(f"MAX_DIAS_VENCIMIENTO={filtros['MAX_DIAS_VENCIMIENTO']} supera la ventana archivada "
+                         f"({cobertura['dte_maximo']} días en alguna instantánea). Usa como mucho {cobertura['dte_maximo']} "
+                         f"o limita el periodo con --desde/--hasta.")
+    if not lado_cubierto(cobertura["lados"], filtros["FILTRO_TIPO_OPCION"]):
+        raise ValueError(f"FILTRO_TIPO_OPCION={filtros['FILTRO_TIPO_OPCION']} necesita strikes que faltan en el archivo "
+                         f"(lados archivados: {', '.join(cobertura['lados'])}).")
+
+
+def precios_liquidacion(archivo, tickers=None, desde=None, hasta=None):
+    """Último precio archivado del subyacente de cada día: {(ticker, día): precio}."""
+    precios = {}
+    for parte in archivo.iterar(tickers, desde, hasta, columnas=["ticker", "fecha", "capturado", "precio_subyacente"]):
+        ultima = parte.iloc[int(parte["capturado"].to_numpy().argmax())]
+        clave = (str(ultima["ticker"]), int(ultima["fecha"]))
+        anterior = precios.get(clave)
+        if anterior is None or ultima["capturado"] >= anterior[0]:
+            precios[clave] = (int(ultima["capturado"]), float(ultima["precio_subyacente"]))
+    return {clave: precio for clave, (_, precio) in precios.items()}
+
+
+def precio_al_vencimiento(precios, ticker, vencimiento):
+    """Precio de liquidación: el del día del vencimiento o, si falta, el más cercano anterior dentro de la tolerancia."""
+    for retroceso in range(TOLERANCIA_LIQUIDACION_DIAS + 1):
+        precio = precios.get((ticker, vencimiento - retroceso))
+        if precio is not None:
+            return precio
+    return np.nan
+
+
+def cargar_candidatas(archivo, filtros, tickers=None, desde=None, hasta=None):
+    """Filtra cada instantánea del archivo con la lógica del script y liquida las candidatas al vencimiento.
+
+    Devuelve (DataFrame de candidatas liquidadas, número de instantáneas, candidatas sin liquidar).
+    """
+    precios = precios_liquidacion(archivo, tickers)
+    partes = []
+    instantaneas = 0
+    pendientes = 0
+    for instantanea in archivo.iterar(tickers, desde, hasta):
+        instantaneas += 1
+        ticker = str(instantanea["ticker"].iloc[0])
+        capturado = int(instantanea["capturado"].iloc[0])
+        precio_subyacente = float(instantanea["precio_subyacente"].iloc[0])
+        vencimientos = instantanea["vencimiento"].to_numpy()
+        cadena = pd.DataFrame({
+            "strike": instantanea["strike"].to_numpy(),
+            "lastPrice": instantanea["lastPrice"].to_numpy(),
+            "bid": instantanea["bid"].to_numpy(),
+            "volume": instantanea["volume"].to_numpy(),
+            "openInterest": instantanea["openInterest"].to_numpy(),
+            "impliedVolatility": instantanea["impliedVolatility"].to_numpy(),
+            "expirationDate": vencimientos.astype(np.int64).astype("datetime64[D]").astype(str),
+            "source": instantanea["source"].astype(str).to_numpy()
+        })
+        filtradas = filtrar_opciones(cadena, ticker, precio_subyacente, filtros, ahora=datetime.fromtimestamp(capturado))
+        if filtradas.empty:
+            continue
+        vencimiento = (pd.to_datetime(filtradas["vencimiento"], format="%Y-%m-%d").to_numpy(dtype="datetime64[D]")
+                       .astype(np.int64))
+        por_vencimiento = {v: precio_al_vencimiento(precios, ticker, v) for v in np.unique(vencimiento)}
+        liquidacion = np.array([por_vencimiento[v] for v in vencimiento], dtype=float)
+        resueltas = ~np.isnan(liquidacion)
+        pendientes += int((~resueltas).sum())
+        if not resueltas.any():
+            continue
+        filtradas = filtradas[resueltas]
+        strike = filtradas["strike"].to_numpy(dtype=float)
+        prima = filtradas["bid"].to_numpy(dtype=float)
+        resultado = prima - np.maximum(strike - liquidacion[resueltas], 0.0)
+        partes.append(pd.DataFrame({
+            "instantanea": instantaneas - 1,
+            "ticker": ticker,
+            "rentabilidad_anual": filtradas["rentabilidad_anual"].to_numpy(dtype=float),
+            "diferencia_porcentual": filtradas["diferencia_porcentual"].to_numpy(dtype=float),
+            "volatilidad_implícita": filtradas["volatilidad_implícita"].to_numpy(dtype=float),
+            "bid": prima,
+            "dias_vencimiento": filtradas["dias_vencimiento"].to_numpy(dtype=float),
+            "delta_abs": filtradas["delta"].abs().to_numpy(dtype=float),
+            "prob_beneficio": filtradas["prob_beneficio"].to_numpy(dtype=float),
+            # Venta de put garantizada con efectivo: resultado sobre el capital comprometido (strike)
+            "retorno": 100 * resultado / strike,
+            "asignada": liquidacion[resueltas] < strike
+        }))
+    candidatas = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    return candidatas, instantaneas, pendientes
+
+
+def preparar_columnas(candidatas, orden="rentabilidad"):
+    """Arrays de las candidatas ordenadas por instantánea y criterio de ranking, listos para las máscaras."""
+    claves = [signo * candidatas[columna].to_numpy() for columna, signo in reversed(ORDEN_CANDIDATAS[orden])]
+    indices = np.lexsort(claves + [candidatas["instantanea"].to_numpy()])
+    columnas = {columna: candidatas[columna].to_numpy()[indices] for columna in candidatas.columns if columna != "ticker"}
+    # Posición de inicio de la instantánea de cada fila, para numerar las seleccionadas dentro de cada una
+    instantanea = columnas["instantanea"]
+    inicio = np.r_[True, instantanea[1:] != instantanea[:-1]]
+    columnas["inicio_grupo"] = np.maximum.accumulate(np.where(inicio, np.arange(len(instantanea)), 0))
+    return columnas
+
+
+def resumir(retorno, asignada, dias):
+    """Estadísticas de un conjunto de operaciones."""
+    n = len(retorno)
+    if n == 0:
+        return {"operaciones": 0, "acierto": np.nan, "retorno_medio": np.nan, "retorno_anual_medio": np.nan,
+                "asignadas": np.nan, "peor_retorno": np.nan}
+    return {
+        "operaciones": n,
+        "acierto": 100 * float((retorno > 0).mean()),
+        "retorno_medio": float(retorno.mean()),
+        "retorno_anual_medio": float((retorno * 365 / dias).mean()),
+        "asignadas": 100 * float(asignada.mean()),
+        "peor_retorno": float(retorno.min())
+    }
+
+
+def evaluar_combinacion(columnas, combinacion):
+    """Máscara de filtros, alertas y top por instantánea de una combinación, con sus estadísticas."""
+    mascara = np.ones(len(columnas["retorno"]), dtype=bool)
+    for nombre, valor in combinacion.items():
+        columna, sentido = PARAMETROS_BARRIBLES[nombre]
+        if columna is None or nombre.startswith("ALERTA_"):
+            continue
+        mascara &= (columnas[columna] <= valor) if sentido == "max" else (columnas[columna] >= valor)
+
+    alerta = (mascara & (columnas["rentabilidad_anual"] >= combinacion["ALERTA_RENTABILIDAD_ANUAL"]) &
+              (columnas["volatilidad_implícita"] >= combinacion["ALERTA_VOLATILIDAD_MINIMA"]))
+    # Puesto de cada alerta dentro de su instantánea (las filas ya están en orden de ranking)
+    acumuladas = np.cumsum(alerta)
+    previas = np.where(columnas["inicio_grupo"] > 0, acumuladas[columnas["inicio_grupo"] - 1], 0)
+    mejores = alerta & (acumuladas - previas <= combinacion["TOP_CONTRATOS"])
+
+    fila = dict(combinacion)
+    for prefijo, seleccion in (("filtradas", mascara), ("mejores", mejores)):
+        for clave, valor in resumir(columnas["retorno"][seleccion], columnas["asignada"][seleccion],
+                                    columnas["dias_vencimiento"][seleccion]).items():
+            fila[f"{prefijo}_{clave}"] = valor
+    return fila
+
+
+# Columnas de las candidatas en cada proceso del pool (se envían una vez, en el inicializador)
+_COLUMNAS_PROCESO = None
+
+
+def _iniciar_proceso(columnas):
+    global _COLUMNAS_PROCESO
+    _COLUMNAS_PROCESO = columnas
+
+
+def _evaluar_bloque(combinaciones):
+    return [evaluar_combinacion(_COLUMNAS_PROCESO, combinacion) for combinacion in combinaciones]
+
+
+def barrer(columnas, rejilla, procesos=None):
+    """Evalúa todas las combinaciones de la rejilla, repartidas en bloques entre `procesos` procesos."""
+    nombres = list(rejilla)
+    combinaciones = [dict(zip(nombres, valores)) for valores in itertools.product(*(rejilla[n] for n in nombres))]
+    procesos = procesos or os.cpu_count() or 1
+    if procesos <= 1 or len(combinaciones) < 2:
+        return pd.DataFrame(evaluar_combinacion(columnas, c) for c in combinaciones)
+    # Varios bloques por proceso para repartir bien la carga sin pagar un envío por combinación
+    tamano = max(1, len(combinaciones) // (procesos * 4))
+    bloques = [combinaciones[i:i + tamano] for i in range(0, len(combinaciones), tamano)]
+    filas = []
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso, initargs=(columnas,)) as ejecutor:
+        for resultado in ejecutor.map(_evaluar_bloque, bloques):
+            filas.extend(resultado)
+    return pd.DataFrame(filas)
+
+
+def ejecutar_backtest(archivo, config, rejilla, tickers=None, desde=None, hasta=None, procesos=None):
+    """Carga y liquida las candidatas del archivo y barre la rejilla. Devuelve (resultados, resumen).
+
+    Lanza ValueError si la rejilla pide más de lo que cubre el archivo (ver validar_cobertura()).
+    """
+    filtros = filtros_permisivos(config, rejilla)
+    validar_cobertura(filtros, archivo.cobertura(tickers, desde, hasta))
+    inicio = time.perf_counter()
+    candidatas, instantaneas, pendientes = cargar_candidatas(archivo, filtros, tickers, desde, hasta)
+    carga = time.perf_counter() - inicio
+    resumen = {"instantaneas": instantaneas, "candidatas": len(candidatas), "sin_liquidar": pendientes,
+               "segundos_carga": round(carga, 3)}
+    if candidatas.empty:
+        return pd.DataFrame(), resumen
+
+    columnas = preparar_columnas(candidatas, config.orden_mejores)
+    inicio = time.perf_counter()
+    resultados = barrer(columnas, rejilla, procesos)
+    resumen["combinaciones"] = len(resultados)
+    resumen["segundos_barrido"] = round(time.perf_counter() - inicio, 3)
+    resultados = resultados.sort_values(["mejores_retorno_medio", "mejores_operaciones"], ascending=False,
+                                        na_position="last", kind="stable").reset_index(drop=True)
+    return resultados, resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest y barrido de parámetros sobre el archivo histórico.")
+    parser.add_argument("--ruta", default=ARCHIVO_RUTA, help="Directorio del archivo histórico.")
+    parser.add_argument("--ticker", action="append", help="Ticker a incluir (se puede repetir; por defecto todos).")
+    parser.add_argument("--desde", help="Primera fecha de captura, YYYY-MM-DD.")
+    parser.add_argument("--hasta", help="Última fecha de captura, YYYY-MM-DD.")
+    parser.add_argument("--param", action="append", default=[], metavar="NOMBRE=VALORES",
+                        help="Valores a barrer: NOMBRE=inicio:fin:paso o NOMBRE=v1,v2,... (sustituye a la rejilla por defecto).")
+    parser.add_argument("--procesos", type=int, help="Procesos del pool (por defecto: núcleos disponibles).")
+    parser.add_argument("--mostrar", type=int, default=15, help="Combinaciones a mostrar (por defecto: 15).")
+    parser.add_argument("--salida", default="backtest_resultados.csv")
+    args = parser.parse_args(argv)
+
+    config, _ = obtener_configuracion(mostrar=False)
+    try:
+        parametros = None
+        if args.param:
+            parametros = {}
+            for texto in args.param:
+                nombre, valores = texto.split("=", 1)
+                parametros[nombre.strip().upper()] = parsear_valores(valores)
+        rejilla = construir_rejilla(config, parametros)
+    except ValueError as e:
+        print(f"Rejilla no válida: {e}")
+        return 1
+
+    archivo = ArchivoCadenas(args.ruta)
+    try:
+        resultados, resumen = ejecutar_backtest(archivo, config, rejilla, args.ticker, args.desde, args.hasta, args.procesos)
+    except ValueError as e:
+        print(f"Rejilla no válida: {e}")
+        return 1
+    print(f"{resumen['instantaneas']} instantáneas, {resumen['candidatas']} candidatas liquidadas, "
+          f"{resumen['sin_liquidar']} sin precio de liquidación ({resumen['segundos_carga']:.2f}s)")
+    if resultados.empty:
+        print("No hay candidatas liquidadas que evaluar.")
+        return 0
+    print(f"{resumen['combinaciones']} combinaciones evaluadas en {resumen['segundos_barrido']:.2f}s")
+
+    resultados.to_csv(args.salida, index=False)
+    print(f"Resultados guardados en {args.salida}")
+    barridos = [nombre for nombre, valores in rejilla.items() if len(valores) > 1]
+    mejores = resultados[resultados["mejores_operaciones"] >= MIN_OPERACIONES].head(args.mostrar)
+    print(f"Mejores combinaciones (al menos {MIN_OPERACIONES} operaciones seleccionadas):")
+    print(mejores[barridos + ["mejores_operaciones", "mejores_acierto", "mejores_retorno_medio",
+                              "mejores_asignadas", "mejores_peor_retorno"]].to_string(index=False, float_format="%.2f"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""Benchmark de las etapas críticas del análisis sobre cadenas sintéticas.
+
+Mide por separado el parseo de cadenas, la combinación de fuentes, el filtrado, la selección de
+los mejores contratos y el renderizado de informes/CSV, para varios tamaños de cadena y número de
+tickers. Guarda los resultados en JSON y, si se indica una línea base, marca las regresiones.
+
+    python benchmark_opciones.py --salida benchmark_resultados.json
+    python benchmark_opciones.py --rapido --baseline benchmarks/baseline.json
+    python benchmark_opciones.py --rapido --memoria-contratos 1000000
+    python benchmark_opciones.py --rapido --exportacion 1000000
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from analizar_opciones import (combinar_opciones, filtrar_opciones, renderizar_mejores_contratos, renderizar_tabla,
+                               seleccionar_mejores_contratos)
+from configuracion import DEFAULT_CONFIG
+from contratos import CAMPOS_CONTRATO, Contrato, a_dias, contratos_de_tabla
+from informes import HEADERS_CSV, SalidaContratos, SalidaCSV, formatear_opcion
+from proveedores import ProveedorSintetico, normalizar_cadena
+
+# Escenarios (contratos totales, tickers)
+ESCENARIOS_COMPLETOS = [(1_000, 1), (10_000, 10), (100_000, 50), (1_000_000, 500)]
+ESCENARIOS_RAPIDOS = [(1_000, 1), (10_000, 10)]
+
+# Vencimientos semanales por ticker en las cadenas sintéticas
+VENCIMIENTOS_POR_TICKER = 8
+
+# Fecha fija para que las cadenas y los días al vencimiento sean reproducibles
+FECHA_BASE = datetime(2025, 1, 6)
+
+ETAPAS = ["parseo", "combinacion", "filtrado", "top_n", "renderizado"]
+
+
+def filtros_benchmark():
+    """Umbrales por defecto del script, con una ventana de días que cubre todos los vencimientos generados."""
+    filtros = {clave: DEFAULT_CONFIG[clave] for clave in [
+        "MIN_RENTABILIDAD_ANUAL", "MIN_DIFERENCIA_PORCENTUAL", "MIN_VOLUMEN", "MIN_VOLATILIDAD_IMPLICITA",
+        "MIN_OPEN_INTEREST", "FILTRO_TIPO_OPCION", "ALERTA_RENTABILIDAD_ANUAL", "ALERTA_VOLATILIDAD_MINIMA", "MIN_BID",
+        "MAX_DELTA", "MIN_PROB_BENEFICIO"
+    ]}
+    filtros["MAX_DIAS_VENCIMIENTO"] = 7 * (VENCIMIENTOS_POR_TICKER + 1)
+    return filtros
+
+
+def generar_datos(contratos, num_tickers, semilla=42):
+    """Genera cadenas crudas al estilo de yfinance (una tabla por ticker y vencimiento) y sus cotizaciones."""
+    strikes = max(1, math.ceil(contratos / (num_tickers * VENCIMIENTOS_POR_TICKER)))
+    proveedor = ProveedorSintetico(semilla=semilla, num_vencimientos=VENCIMIENTOS_POR_TICKER,
+                                   strikes_por_vencimiento=strikes, fecha_base=FECHA_BASE)
+    tickers = [f"T{i:04d}" for i in range(num_tickers)]
+    crudas = {}
+    cotizaciones = {}
+    for ticker in tickers:
+        cotizaciones[ticker] = proveedor.cotizacion(ticker)["precio"]
+        crudas[ticker] = []
+        for vencimiento in proveedor.vencimientos(ticker):
+            cadena = proveedor.cadena(ticker, vencimiento)
+            # Mismas columnas que option_chain().puts de yfinance (IV en tanto por uno)
+            crudas[ticker].append((vencimiento, pd.DataFrame({
+                "strike": cadena["strike"],
+                "lastPrice": cadena["lastPrice"],
+                "bid": cadena["bid"],
+                "ask": cadena["bid"] * 1.05 + 0.01,
+                "volume": cadena["volume"],
+                "openInterest": cadena["openInterest"],
+                "impliedVolatility": cadena["impliedVolatility"] / 100
+            })))
+    return tickers, crudas, cotizaciones
+
+
+class Medidor:
+    """Cronometra etapas y, si se pide, registra su pico de memoria de Python (tracemalloc)."""
+
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self.medidas = {}
+
+    @contextmanager
+    def etapa(self, nombre):
+        medida = {"filas": 0}
+        if self.memoria:
+            tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        yield medida
+        medida["segundos"] = time.perf_counter() - inicio
+        if self.memoria:
+            medida["pico_memoria_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        self.medidas[nombre] = medida
+
+
+def ejecutar_etapas(tickers, crudas, cotizaciones, filtros, top_contratos, medidor):
+    """Ejecuta cada etapa una vez, registrando tiempo y filas de entrada en el medidor."""
+    with medidor.etapa("parseo") as medida:
+        cadenas_yahoo = {
+            ticker: pd.concat([normalizar_cadena(puts, fecha, "Yahoo Finance") for fecha, puts in crudas[ticker]], ignore_index=True)
+            for ticker in tickers
+        }
+        medida["filas"] = sum(len(c) for c in cadenas_yahoo.values())
+
+    # Fuente secundaria: la misma cadena con otra etiqueta; en la principal faltan algunos bid
+    cadenas_finnhub = {ticker: cadena.assign(source="Finnhub") for ticker, cadena in cadenas_yahoo.items()}
+    for cadena in cadenas_yahoo.values():
+        cadena.loc[cadena.index % 10 == 0, "bid"] = 0.0
+
+    with medidor.etapa("combinacion") as medida:
+        combinadas = {ticker: combinar_opciones(cadenas_yahoo[ticker], cadenas_finnhub[ticker]) for ticker in tickers}
+        medida["filas"] = 2 * sum(len(c) for c in cadenas_yahoo.values())
+
+    with medidor.etapa("filtrado") as medida:
+        todas_las_opciones = []
+        por_ticker = {}
+        for ticker in tickers:
+            por_ticker[ticker] = contratos_de_tabla(filtrar_opciones(combinadas[ticker], ticker, cotizaciones[ticker],
+                                                                     filtros, ahora=FECHA_BASE))
+            todas_las_opciones.extend(por_ticker[ticker])
+        medida["filas"] = sum(len(c) for c in combinadas.values())
+
+    with medidor.etapa("top_n") as medida:
+        mejores = seleccionar_mejores_contratos(todas_las_opciones, tickers, top_contratos,
+                                                filtros["ALERTA_RENTABILIDAD_ANUAL"], filtros["ALERTA_VOLATILIDAD_MINIMA"])
+        medida["filas"] = len(todas_las_opciones)
+
+    with medidor.etapa("renderizado") as medida:
+        for ticker in tickers:
+            if por_ticker[ticker]:
+                renderizar_tabla(por_ticker[ticker])
+        with SalidaCSV(os.devnull, HEADERS_CSV) as salida:
+            salida.escribir_filas(formatear_opcion(opcion) for opcion in todas_las_opciones)
+        renderizar_mejores_contratos(mejores)
+        medida["filas"] = len(todas_las_opciones)
+    return medidor.medidas
+
+
+def ejecutar_benchmark(escenarios, repeticiones=3, top_contratos=DEFAULT_CONFIG["TOP_CONTRATOS"]):
+    """Ejecuta los escenarios: el mejor tiempo de `repeticiones` pasadas y los picos de memoria de una pasada aparte."""
+    filtros = filtros_benchmark()
+    resultados = []
+    for contratos, num_tickers in escenarios:
+        print(f"Escenario: {contratos} contratos, {num_tickers} tickers")
+        tickers, crudas, cotizaciones = generar_datos(contratos, num_tickers)
+        mejores_tiempos = {}
+        for _ in range(repeticiones):
+            gc.collect()
+            for etapa, medida in ejecutar_etapas(tickers, crudas, cotizaciones, filtros, top_contratos, Medidor()).items():
+                if etapa not in mejores_tiempos or medida["segundos"] < mejores_tiempos[etapa]["segundos"]:
+                    mejores_tiempos[etapa] = medida
+
+        # La medición de memoria ralentiza la ejecución, así que se hace en una pasada aparte
+        gc.collect()
+        tracemalloc.start()
+        try:
+            picos = ejecutar_etapas(tickers, crudas, cotizaciones, filtros, top_contratos, Medidor(memoria=True))
+        finally:
+            tracemalloc.stop()
+
+        etapas = {}
+        for etapa in ETAPAS:
+            segundos, filas = mejores_tiempos[etapa]["segundos"], mejores_tiempos[etapa]["filas"]
+            etapas[etapa] = {
+                "segundos": round(segundos, 6),
+                "filas": filas,
+                "filas_por_segundo": round(filas / segundos, 1) if segundos > 0 else None,
+                "pico_memoria_mb": round(picos[etapa]["pico_memoria_mb"], 3)
+            }
+            print(f"  {etapa:<12} {segundos * 1000:10.2f} ms  {filas:>9} filas  {etapas[etapa]['pico_memoria_mb']:8.2f} MB")
+        resultados.append({"contratos": contratos, "tickers": num_tickers, "etapas": etapas})
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeticiones": repeticiones,
+        "escenarios": resultados
+    }
+
+
+def vencimientos_sinteticos():
+    """Vencimientos semanales ('YYYY-MM-DD') de las cadenas sintéticas."""
+    return [(FECHA_BASE + timedelta(days=7 * (i + 1))).strftime("%Y-%m-%d") for i in range(VENCIMIENTOS_POR_TICKER)]
+
+
+def filas_contratos(num_contratos, num_tickers=500):
+    """Valores de `num_contratos` contratos filtrados sintéticos, con el vencimiento como texto."""
+    tickers = [f"T{i:04d}" for i in range(num_tickers)]
+    vencimientos = vencimientos_sinteticos()
+    for i in range(num_contratos):
+        x = i / num_contratos
+        yield (tickers[i % num_tickers], 100.0 + x, 1.5 + x, 1.4 + x, vencimientos[i % len(vencimientos)], 7 * (i % 8 + 1),
+               0.2 + x, 50.0 + x, 98.5 + x, 6.0 + x, 45.0 + x, 100 + i, 500 + i, -0.2 - x, -0.05 - x, 80.0 + x,
+               "Yahoo + Finnhub")
+
+
+def medir_memoria_contratos(num_contratos, num_tickers=500):
+    """Memoria de Python (tracemalloc) de `num_contratos` contratos filtrados: como Contrato y como diccionario.
+
+    El diccionario es la representación anterior (una fila de to_dict("records"), con el
+    vencimiento como texto). En ambos casos cada contrato tiene sus propios valores numéricos
+    y comparte ticker, fuente y vencimiento con los demás, como al salir del filtrado.
+    """
+    dias = {vencimiento: a_dias(vencimiento) for vencimiento in vencimientos_sinteticos()}
+
+    resultado = {"contratos": num_contratos}
+    for nombre, construir in [
+        ("dict", lambda fila: dict(zip(CAMPOS_CONTRATO, fila))),
+        ("Contrato", lambda fila: Contrato(*fila[:4], dias[fila[4]], *fila[5:]))
+    ]:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            contratos = [construir(fila) for fila in filas_contratos(num_contratos, num_tickers)]
+            memoria = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del contratos
+        resultado[nombre] = {"bytes_por_contrato": round(memoria / num_contratos, 1), "mb": round(memoria / (1024 * 1024), 1)}
+        print(f"  {nombre:<9} {resultado[nombre]['mb']:8.1f} MB  {resultado[nombre]['bytes_por_contrato']:7.1f} bytes/contrato")
+    return resultado
+
+
+def leer_csv_formateado(ruta):
+    """Lo que tiene que hacer un consumidor del CSV de presentación: leerlo y volver a convertir "$12.50" y "48.31%" en números."""
+    tabla = pd.read_csv(ruta)
+    for columna in tabla.columns:
+        if tabla[columna].dtype == object and tabla[columna].astype(str).str.match(r"^\$?-?[\d.]+%?$").all():
+            tabla[columna] = pd.to_numeric(tabla[columna].str.strip("$%"))
+    return tabla
+
+
+def medir_exportacion(num_contratos, num_tickers=500):
+    """Tiempo de escritura, tamaño y tiempo de lectura (a columnas numéricas) de todas_las_opciones en CSV y en Parquet."""
+    dias = {vencimiento: a_dias(vencimiento) for vencimiento in vencimientos_sinteticos()}
+    contratos = [Contrato(*fila[:4], dias[fila[4]], *fila[5:]) for fila in filas_contratos(num_contratos, num_tickers)]
+    resultado = {"contratos": num_contratos}
+    with tempfile.TemporaryDirectory() as directorio:
+        for formato, leer in [("csv", leer_csv_formateado), ("parquet", pd.read_parquet)]:
+            ruta = os.path.join(directorio, "todas_las_opciones.csv")
+            inicio = time.perf_counter()
+            with SalidaContratos(ruta, "put", [formato]) as salida:
+                salida.escribir(contratos)
+            escritura = time.perf_counter() - inicio
+            ruta = os.path.splitext(ruta)[0] + "." + formato
+            inicio = time.perf_counter()
+            leer(ruta)
+            lectura = time.perf_counter() - inicio
+            resultado[formato] = {"escritura_segundos": round(escritura, 3), "lectura_segundos": round(lectura, 3),
+                                  "mb": round(os.path.getsize(ruta) / (1024 * 1024), 1)}
+            print(f"  {formato:<8} escritura {escritura:7.2f}s  lectura {lectura:7.2f}s  {resultado[formato]['mb']:8.1f} MB")
+    return resultado
+
+
+def comparar_con_baseline(resultado, baseline, tolerancia):
+    """Devuelve la lista de regresiones (tiempo mayor que baseline * (1 + tolerancia))."""
+    base = {(e["contratos"], e["tickers"]): e["etapas"] for e in baseline.get("escenarios", [])}
+    regresiones = []
+    for escenario in resultado["escenarios"]:
+        etapas_base = base.get((escenario["contratos"], escenario["tickers"]))
+        if etapas_base is None:
+            continue
+        for etapa, medida in escenario["etapas"].items():
+            if etapa not in etapas_base or not etapas_base[etapa]["segundos"]:
+                continue
+            ratio = medida["segundos"] / etapas_base[etapa]["segundos"]
+            estado = "REGRESIÓN" if ratio > 1 + tolerancia else "ok"
+            print(f"  {escenario['contratos']:>8}x{escenario['tickers']:<4} {etapa:<12} x{ratio:5.2f}  {estado}")
+            if ratio > 1 + tolerancia:
+                regresiones.append({"contratos": escenario["contratos"], "tickers": escenario["tickers"],
+                                    "etapa": etapa, "ratio": round(ratio, 3)})
+    return regresiones
+
+
+def _parsear_escenarios(texto):
+    escenarios = []
+    for parte in texto.split(","):
+        contratos, tickers = parte.lower().split("x")
+        escenarios.append((int(contratos), int(tickers)))
+    return escenarios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del análisis de opciones.")
+    parser.add_argument("--escenarios", type=_parsear_escenarios,
+                        help="Lista CONTRATOSxTICKERS separada por comas, p. ej. 1000x1,100000x50.")
+    parser.add_argument("--rapido", action="store_true", help="Solo escenarios pequeños (para CI).")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", default="benchmark_resultados.json")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con la que comparar.")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="Aumento relativo de tiempo admitido antes de marcar regresión (por defecto: 0.25).")
+    parser.add_argument("--memoria-contratos", type=int, default=0, metavar="N",
+                        help="Mide además la memoria de N contratos filtrados (Contrato frente a diccionario).")
+    parser.add_argument("--exportacion", type=int, default=0, metavar="N",
+                        help="Mide además la escritura y la lectura de N contratos en CSV y en Parquet.")
+    args = parser.parse_args()
+
+    escenarios = args.escenarios or (ESCENARIOS_RAPIDOS if args.rapido else ESCENARIOS_COMPLETOS)
+    resultado = ejecutar_benchmark(escenarios, args.repeticiones)
+    if args.memoria_contratos:
+        print(f"Memoria de {args.memoria_contratos} contratos filtrados:")
+        resultado["memoria_contratos"] = medir_memoria_contratos(args.memoria_contratos)
+    if args.exportacion:
+        print(f"Exportación de {args.exportacion} contratos:")
+        resultado["exportacion"] = medir_exportacion(args.exportacion)
+
+    regresiones = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Comparación con {args.baseline} (tolerancia {args.tolerancia:.0%}):")
+        regresiones = comparar_con_baseline(resultado, baseline, args.tolerancia)
+        resultado["regresiones"] = regresiones
+
+    with open(args.salida, "w") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+    sys.exit(1 if regresiones else 0)
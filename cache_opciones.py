@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Configuración de la caché (ajustable por variables de entorno)
+CACHE_RUTA = os.getenv("CACHE_RUTA", "cache_opciones.sqlite")
+CACHE_TTL_SEGUNDOS = int(os.getenv("CACHE_TTL_SEGUNDOS", "900"))  # 15 minutos
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "200"))
+
+
+class SinDatosEnCache(Exception):
+    """Se lanza en modo offline cuando una instantánea no está en la caché."""
+
+
+def _serializar(valor):
+    """Convierte un DataFrame o un valor JSON en (tipo, bytes comprimidos)."""
+    if hasattr(valor, "to_json"):
+        return "df", zlib.compress(valor.to_json(orient="split", index=False).encode("utf-8"))
+    return "json", zlib.compress(json.dumps(valor).encode("utf-8"))
+
+
+def _deserializar(tipo, datos):
+    texto = zlib.decompress(datos).decode("utf-8")
+    if tipo == "df":
+        # pandas solo se importa al leer cadenas, no para inspeccionar la caché
+        import pandas as pd
+        return pd.read_json(io.StringIO(texto), orient="split", dtype=False, convert_dates=False)
+    return json.loads(texto)
+
+
+class CacheOpciones:
+    """Caché en disco (SQLite) de instantáneas de cadenas y cotizaciones.
+
+    Cada entrada se identifica por (ticker, fuente, vencimiento). Las entradas caducan tras
+    `ttl` segundos y, si el tamaño total supera `max_bytes`, se eliminan las menos usadas.
+    En modo offline se ignora el TTL y nunca se consulta la red: si falta una instantánea se
+    lanza SinDatosEnCache.
+    """
+
+    def __init__(self, ruta=CACHE_RUTA, ttl=CACHE_TTL_SEGUNDOS, max_bytes=int(CACHE_MAX_MB * 1024 * 1024), offline=False):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS instantaneas ("
+            " ticker TEXT NOT NULL, fuente TEXT NOT NULL, vencimiento TEXT NOT NULL,"
+            " guardado REAL NOT NULL, accedido REAL NOT NULL, tamano INTEGER NOT NULL,"
+            " tipo TEXT NOT NULL, datos BLOB NOT NULL,"
+            " PRIMARY KEY (ticker, fuente, vencimiento))"
+        )
+        self._conexion.commit()
+
+    def obtener(self, ticker, fuente, vencimiento=""):
+        """Devuelve el valor guardado o None si no existe o ha caducado (el TTL no aplica offline)."""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT guardado, tipo, datos FROM instantaneas WHERE ticker = ? AND fuente = ? AND vencimiento = ?",
+                (ticker, fuente, vencimiento)
+            ).fetchone()
+            if fila is None or (not self.offline and time.time() - fila[0] > self.ttl):
+                self.fallos += 1
+                return None
+            self._conexion.execute(
+                "UPDATE instantaneas SET accedido = ? WHERE ticker = ? AND fuente = ? AND vencimiento = ?",
+                (time.time(), ticker, fuente, vencimiento)
+            )
+            self._conexion.commit()
+            self.aciertos += 1
+        return _deserializar(fila[1], fila[2])
+
+    def guardar(self, ticker, fuente, vencimiento, valor):
+        """Guarda una instantánea y aplica el límite de tamaño."""
+        if self.offline:
+            return
+        tipo, datos = _serializar(valor)
+        ahora = time.time()
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO instantaneas VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (ticker, fuente, vencimiento, ahora, ahora, len(datos), tipo, datos)
+            )
+            self._evictar()
+            self._conexion.commit()
+
+    def recuperar(self, ticker, fuente, vencimiento, cargar):
+        """Devuelve la instantánea de la caché o la obtiene con cargar() y la guarda."""
+        valor = self.obtener(ticker, fuente, vencimiento)
+        if valor is not None:
+            return valor
+        if self.offline:
+            detalle = f"{fuente} {vencimiento}".strip()
+            raise SinDatosEnCache(f"No hay datos en caché para {ticker} ({detalle}).")
+        valor = cargar()
+        self.guardar(ticker, fuente, vencimiento, valor)
+        return valor
+
+    def _evictar(self):
+        total = self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM instantaneas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        filas = self._conexion.execute(
+            "SELECT ticker, fuente, vencimiento, tamano FROM instantaneas ORDER BY accedido"
+        ).fetchall()
+        for ticker, fuente, vencimiento, tamano in filas:
+            if total <= self.max_bytes:
+                break
+            self._conexion.execute(
+                "DELETE FROM instantaneas WHERE ticker = ? AND fuente = ? AND vencimiento = ?",
+                (ticker, fuente, vencimiento)
+            )
+            total -= tamano
+
+    def resumen(self):
+        """Devuelve número de entradas, tamaño total en bytes y aciertos/fallos de esta ejecución."""
+        with self._lock:
+            entradas, tamano = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM instantaneas"
+            ).fetchone()
+        return {"entradas": entradas, "bytes": tamano, "aciertos": self.aciertos, "fallos": self.fallos}
+
+    def listar(self):
+        """Entradas guardadas (sin los datos), de la más reciente a la más antigua."""
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT ticker, fuente, vencimiento, guardado, tamano FROM instantaneas ORDER BY guardado DESC"
+            ).fetchall()
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
@@ -0,0 +1,264 @@
+"""Punto de entrada de línea de comandos.
+
+    python cli.py analizar [--offline] [--vigilar] [--intervalo SEGUNDOS] [--perfil] [--fragmento I/N]
+    python cli.py informe [--todas] [--csv salida.csv]
+    python cli.py validar-config
+    python cli.py cache [--detalle]
+    python cli.py archivo [--ticker NVDA] [--desde 2025-01-01] [--hasta ...] [--dte 20 40]
+    python cli.py fragmentos N [--modo peso|hash] [--salida plan_fragmentos.json] [--matriz]
+    python cli.py reducir [DIRECTORIO ...] [--offline]
+
+`analizar` y `reducir` cargan pandas y NumPy (`analizar`, además, yfinance al crear el proveedor de
+Yahoo); `archivo` carga pandas y pyarrow para consultar el archivo e `informe`, pyarrow si lee el
+Parquet. `validar-config`, `cache` y `fragmentos` no cargan ninguno y arrancan en milisegundos.
+Sin subcomando se ejecuta `analizar`.
+"""
+import argparse
+import os
+import sys
+import time
+
+SUBCOMANDOS = ["analizar", "informe", "validar-config", "cache", "archivo", "fragmentos", "reducir"]
+
+
+def comando_analizar(args):
+    from fragmentos import parsear_fragmento
+    try:
+        fragmento = parsear_fragmento(args.fragmento) if args.fragmento else None
+    except ValueError as e:
+        print(e)
+        return 1
+    if fragmento and args.vigilar:
+        print("--fragmento no se puede combinar con --vigilar.")
+        return 1
+    import analizar_opciones
+    from metricas import perfilado
+    perfil = args.perfil or os.getenv("PERFIL", "false").lower() == "true"
+    with perfilado(perfil):
+        if args.vigilar:
+            analizar_opciones.vigilar(args.intervalo or analizar_opciones.WATCH_INTERVALO_SEGUNDOS, offline=args.offline)
+        else:
+            # cProfile solo ve el hilo que lo activa, así que al perfilar no se usan los pools
+            analizar_opciones.analizar_opciones(offline=args.offline, secuencial=perfil, fragmento=fragmento)
+    return 0
+
+
+def leer_informe_parquet(ruta):
+    """Cabeceras y filas formateadas de un informe Parquet tipado (el formato se aplica al leerlo)."""
+    import pyarrow.parquet as pq
+    from contratos import contratos_de_arrow
+    from informes import FORMATOS
+    contratos = contratos_de_arrow(pq.read_table(ruta))
+    if not contratos:
+        return [], []
+    cabeceras, formatear = FORMATOS[contratos[0].estrategia]
+    return cabeceras, [formatear(contrato) for contrato in contratos]
+
+
+def comando_informe(args):
+    """Vuelve a mostrar el último informe, sin descargar ni recalcular nada.
+
+    Se lee el Parquet tipado si existe (y pyarrow está instalado) y, si no, el CSV. Con --csv la
+    tabla mostrada se escribe además en un CSV con el formato de presentación.
+    """
+    import csv
+    from tabulate import tabulate
+    base = "todas_las_opciones" if args.todas else "mejores_contratos"
+    ruta = f"{base}.parquet"
+    try:
+        cabeceras, filas = leer_informe_parquet(ruta)
+    except (ImportError, OSError):
+        ruta = f"{base}.csv"
+        try:
+            with open(ruta, newline="") as f:
+                filas = list(csv.reader(f))
+        except FileNotFoundError:
+            print(f"No existe {base}.csv ni {base}.parquet. Ejecuta antes `python cli.py analizar`.")
+            return 1
+        cabeceras, filas = (filas[0], filas[1:]) if filas else ([], [])
+    if not filas:
+        print(f"{ruta} no contiene contratos.")
+        return 0
+    generado = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(os.path.getmtime(ruta)))
+    print(f"{ruta} (generado {generado}, {len(filas)} contratos)")
+    print(tabulate(filas, headers=cabeceras, tablefmt="grid"))
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(cabeceras)
+            escritor.writerows(filas)
+        print(f"Exportado a {args.csv}")
+    return 0
+
+
+def comando_validar_config(args):
+    from configuracion import obtener_configuracion
+    try:
+        _, avisos = obtener_configuracion(mostrar=True)
+    except ValueError as e:
+        print(f"Configuración no válida: {e}")
+        return 1
+    if avisos:
+        print(f"Configuración válida con {len(avisos)} aviso(s).")
+        return 1 if args.estricto else 0
+    print("Configuración válida.")
+    return 0
+
+
+def comando_cache(args):
+    from cache_opciones import CACHE_RUTA, CacheOpciones
+    if not os.path.exists(CACHE_RUTA):
+        print(f"No existe la caché {CACHE_RUTA}.")
+        return 0
+    cache = CacheOpciones(offline=True)
+    try:
+        resumen = cache.resumen()
+        print(f"Caché {cache.ruta}: {resumen['entradas']} instantáneas, {resumen['bytes'] / (1024 * 1024):.2f} MB (TTL {cache.ttl}s)")
+        ahora = time.time()
+        por_ticker = {}
+        for ticker, fuente, vencimiento, guardado, tamano in cache.listar():
+            entrada = por_ticker.setdefault(ticker, {"instantaneas": 0, "bytes": 0, "mas_reciente": guardado})
+            entrada["instantaneas"] += 1
+            entrada["bytes"] += tamano
+            if args.detalle:
+                estado = "vigente" if ahora - guardado <= cache.ttl else "caducada"
+                print(f"  {ticker:<8} {fuente:<14} {vencimiento or '-':<10} {tamano:>9} B  hace {ahora - guardado:8.0f}s  {estado}")
+        for ticker, entrada in sorted(por_ticker.items()):
+            print(f"{ticker:<8} {entrada['instantaneas']:>4} instantáneas  {entrada['bytes'] / 1024:9.1f} KB  "
+                  f"última hace {ahora - entrada['mas_reciente']:.0f}s")
+    finally:
+        cache.cerrar()
+    return 0
+
+
+def comando_archivo(args):
+    """Resume (o exporta a CSV) las instantáneas del archivo histórico que cumplen la consulta."""
+    from archivo_cadenas import ARCHIVO_RUTA, ArchivoCadenas
+    from contratos import desde_dias
+    try:
+        archivo = ArchivoCadenas(args.ruta or ARCHIVO_RUTA)
+    except ImportError as e:
+        print(f"El archivo histórico necesita pyarrow: {e}")
+        return 1
+    dte_min, dte_max = args.dte if args.dte else (None, None)
+    datos = archivo.consultar(args.ticker, args.desde, args.hasta, dte_min, dte_max)
+    if datos.empty:
+        print(f"No hay instantáneas en {archivo.ruta} que cumplan la consulta.")
+        return 0
+    if dte_max is not None:
+        cobertura = archivo.cobertura(args.ticker, args.desde, args.hasta)
+        if cobertura["dte_maximo"] is not None and dte_max > cobertura["dte_maximo"]:
+            print(f"Aviso: alguna instantánea solo se descargó hasta {cobertura['dte_maximo']} días al vencimiento; "
+                  f"por encima de eso la consulta está incompleta.")
+    memoria = datos.memory_usage(deep=True).sum()
+    print(f"{len(datos)} contratos de {datos['capturado'].nunique()} instantáneas "
+          f"({memoria / (1024 * 1024):.2f} MB en memoria)")
+    for (ticker, fecha), grupo in datos.groupby(["ticker", "fecha"], observed=True):
+        print(f"  {ticker:<8} {desde_dias(fecha)}  {grupo['capturado'].nunique():>3} instantáneas  {len(grupo):>7} contratos")
+    if args.csv:
+        datos.to_csv(args.csv, index=False)
+        print(f"Exportado a {args.csv}")
+    return 0
+
+
+def comando_fragmentos(args):
+    """Reparte los tickers configurados en N fragmentos equilibrados y guarda el plan."""
+    import json
+    from configuracion import obtener_configuracion
+    from fragmentos import PESOS_RUTA, cargar_pesos, crear_plan
+    if args.num_fragmentos < 1:
+        print("El número de fragmentos debe ser al menos 1.")
+        return 1
+    try:
+        config, _ = obtener_configuracion(mostrar=False)
+    except ValueError as e:
+        print(f"Configuración no válida: {e}")
+        return 1
+    pesos = cargar_pesos()
+    plan = crear_plan(config.tickers, args.num_fragmentos, pesos, args.modo)
+    with open(args.salida, "w") as f:
+        json.dump(plan, f, indent=2)
+    if args.matriz:
+        # Índices de los fragmentos en JSON, para la matriz de un flujo de GitHub Actions
+        print(json.dumps([fragmento["indice"] for fragmento in plan["fragmentos"]]))
+        return 0
+    conocidos = sum(ticker in pesos for ticker in config.tickers)
+    print(f"{len(config.tickers)} tickers en {args.num_fragmentos} fragmentos (modo {args.modo}, "
+          f"{conocidos} con peso conocido en {PESOS_RUTA}). Plan guardado en {args.salida}.")
+    for fragmento in plan["fragmentos"]:
+        print(f"  {fragmento['indice']:>3}  peso {fragmento['peso']:>10.1f}  {len(fragmento['tickers']):>4} tickers: "
+              f"{', '.join(fragmento['tickers'])}")
+    return 0
+
+
+def comando_reducir(args):
+    import analizar_opciones
+    return analizar_opciones.reducir_fragmentos(args.directorios, offline=args.offline)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Análisis automático de opciones PUT.")
+    subparsers = parser.add_subparsers(dest="comando")
+
+    analizar = subparsers.add_parser("analizar", help="Descarga las cadenas, aplica los filtros y genera los informes.")
+    analizar.add_argument("--offline", action="store_true",
+                          help="Reproduce el análisis solo con las instantáneas de la caché, sin acceder a la red.")
+    analizar.add_argument("--vigilar", action="store_true",
+                          help="Mantiene el proceso activo y repite el análisis periódicamente.")
+    analizar.add_argument("--intervalo", type=int,
+                          help="Segundos entre ciclos en modo vigilancia (por defecto: WATCH_INTERVALO_SEGUNDOS o 300).")
+    analizar.add_argument("--perfil", action="store_true",
+                          help="Ejecuta el análisis bajo cProfile y guarda el perfil en PERFIL_RUTA (perfil.prof).")
+    analizar.add_argument("--fragmento", metavar="I/N",
+                          help="Analiza solo el fragmento I de N del universo de tickers (véase `fragmentos`).")
+    analizar.set_defaults(funcion=comando_analizar)
+
+    informe = subparsers.add_parser("informe", help="Muestra el último informe generado sin recalcularlo.")
+    informe.add_argument("--todas", action="store_true", help="Muestra todas las opciones filtradas, no solo las mejores.")
+    informe.add_argument("--csv", help="Escribe además la tabla mostrada en este CSV, con el formato de presentación.")
+    informe.set_defaults(funcion=comando_informe)
+
+    validar = subparsers.add_parser("validar-config", help="Lee y valida la configuración de las variables de entorno.")
+    validar.add_argument("--estricto", action="store_true", help="Termina con error también si hay avisos.")
+    validar.set_defaults(funcion=comando_validar_config)
+
+    cache = subparsers.add_parser("cache", help="Resume el contenido de la caché de instantáneas.")
+    cache.add_argument("--detalle", action="store_true", help="Lista cada instantánea.")
+    cache.set_defaults(funcion=comando_cache)
+
+    archivo = subparsers.add_parser("archivo", help="Consulta el archivo histórico de cadenas (Parquet).")
+    archivo.add_argument("--ruta", help="Directorio del archivo (por defecto: ARCHIVO_RUTA o archivo_cadenas).")
+    archivo.add_argument("--ticker", action="append", help="Ticker a consultar (se puede repetir).")
+    archivo.add_argument("--desde", help="Primera fecha de captura, YYYY-MM-DD.")
+    archivo.add_argument("--hasta", help="Última fecha de captura, YYYY-MM-DD.")
+    archivo.add_argument("--dte", type=int, nargs=2, metavar=("MIN", "MAX"), help="Rango de días al vencimiento.")
+    archivo.add_argument("--csv", help="Exporta el resultado de la consulta a este CSV.")
+    archivo.set_defaults(funcion=comando_archivo)
+
+    fragmentos = subparsers.add_parser("fragmentos", help="Reparte los tickers en N fragmentos equilibrados por tamaño de cadena.")
+    fragmentos.add_argument("num_fragmentos", type=int, metavar="N", help="Número de fragmentos.")
+    fragmentos.add_argument("--modo", choices=["peso", "hash"], default="peso",
+                            help="peso: equilibra el tamaño de las cadenas; hash: cada ticker va siempre al mismo fragmento.")
+    fragmentos.add_argument("--salida", default="plan_fragmentos.json", help="Fichero del plan (por defecto: plan_fragmentos.json).")
+    fragmentos.add_argument("--matriz", action="store_true", help="Imprime solo los índices en JSON, para una matriz de CI.")
+    fragmentos.set_defaults(funcion=comando_fragmentos)
+
+    reducir = subparsers.add_parser("reducir", help="Combina los resultados parciales de los fragmentos en los informes globales.")
+    reducir.add_argument("directorios", nargs="*", metavar="DIRECTORIO",
+                         help="Directorios de los fragmentos (por defecto: parciales/fragmento_*).")
+    reducir.add_argument("--offline", action="store_true", help="No envía el aviso a Discord.")
+    reducir.set_defaults(funcion=comando_reducir)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Sin subcomando (p. ej. `--offline` o nada) se analiza, como hacía el script original
+    if not argv or (argv[0] not in SUBCOMANDOS and argv[0] not in ("-h", "--help")):
+        argv = ["analizar"] + argv
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
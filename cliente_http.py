@@ -0,0 +1,163 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configuración del cliente HTTP (ajustable por variables de entorno)
+HTTP_TIMEOUT_CONEXION = float(os.getenv("HTTP_TIMEOUT_CONEXION", "5"))
+HTTP_TIMEOUT_LECTURA = float(os.getenv("HTTP_TIMEOUT_LECTURA", "30"))
+HTTP_MAX_REINTENTOS = int(os.getenv("HTTP_MAX_REINTENTOS", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1.0"))
+HTTP_TAMANO_POOL = int(os.getenv("HTTP_TAMANO_POOL", "16"))
+# Espera máxima antes de un reintento: si el servidor pide más (Retry-After), la petición falla
+HTTP_MAX_ESPERA = float(os.getenv("HTTP_MAX_ESPERA", "60"))
+
+# Límites por host: (peticiones por segundo, ráfaga máxima)
+LIMITES_POR_HOST = {
+    # Plan gratuito de Finnhub: 60 peticiones por minuto
+    "finnhub.io": (float(os.getenv("FINNHUB_PETICIONES_POR_MINUTO", "60")) / 60, 5),
+    # Webhooks de Discord: 5 peticiones cada 2 segundos
+    "discord.com": (2.5, 5)
+}
+
+# Códigos que se reintentan con backoff
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class LimitadorTokens:
+    """Token bucket: permite `tasa` peticiones por segundo con ráfagas de hasta `capacidad`."""
+
+    def __init__(self, tasa, capacidad):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = capacidad
+        self.ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloquea hasta disponer de un token y devuelve los segundos esperados."""
+        esperado = 0.0
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return esperado
+                espera = (1 - self.tokens) / self.tasa
+            time.sleep(espera)
+            esperado += espera
+
+
+class ClienteHTTP:
+    """Sesión HTTP compartida con keep-alive, límite de peticiones por host y reintentos.
+
+    Las respuestas 429 y 5xx, y los errores de conexión o timeout, se reintentan con backoff
+    exponencial y jitter. Si el servidor indica cuánto esperar (cabecera Retry-After o el campo
+    retry_after de Discord) se respeta ese valor, salvo que supere `max_espera`: entonces no se
+    reintenta y se devuelve esa respuesta. Lleva contadores por host para el resumen.
+    """
+
+    def __init__(self, timeout=(HTTP_TIMEOUT_CONEXION, HTTP_TIMEOUT_LECTURA), max_reintentos=HTTP_MAX_REINTENTOS,
+                 backoff_base=HTTP_BACKOFF_BASE, limites=LIMITES_POR_HOST, tamano_pool=HTTP_TAMANO_POOL,
+                 max_espera=HTTP_MAX_ESPERA):
+        self.timeout = timeout
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.max_espera = max_espera
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool)
+        self.sesion.mount("https://", adaptador)
+        self.sesion.mount("http://", adaptador)
+        self.limitadores = {host: LimitadorTokens(tasa, capacidad) for host, (tasa, capacidad) in limites.items()}
+        self.contadores = {}
+        self._lock = threading.Lock()
+
+    def _contar(self, host, **incrementos):
+        with self._lock:
+            contador = self.contadores.setdefault(host, {
+                "peticiones": 0, "reintentos": 0, "respuestas_429": 0, "errores": 0, "esperas_excesivas": 0,
+                "bytes": 0, "segundos_espera_limite": 0.0, "segundos_backoff": 0.0
+            })
+            for clave, valor in incrementos.items():
+                contador[clave] += valor
+
+    def _limitador(self, host):
+        for dominio, limitador in self.limitadores.items():
+            if host == dominio or host.endswith("." + dominio):
+                return limitador
+        return None
+
+    def _espera_reintento(self, respuesta, intento):
+        if respuesta is not None:
+            retry_after = respuesta.headers.get("Retry-After")
+            if retry_after is None and respuesta.status_code == 429:
+                try:
+                    retry_after = respuesta.json().get("retry_after")
+                except ValueError:
+                    retry_after = None
+            if retry_after is not None:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return min(self.backoff_base * (2 ** intento) + random.uniform(0, self.backoff_base), self.max_espera)
+
+    def request(self, metodo, url, **kwargs):
+        """Envía la petición con límite por host y reintentos; devuelve la última respuesta."""
+        host = urlparse(url).hostname or ""
+        kwargs.setdefault("timeout", self.timeout)
+        limitador = self._limitador(host)
+        for intento in range(self.max_reintentos + 1):
+            if limitador is not None:
+                self._contar(host, segundos_espera_limite=limitador.adquirir())
+            self._contar(host, peticiones=1)
+            try:
+                respuesta = self.sesion.request(metodo, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._contar(host, errores=1)
+                if intento == self.max_reintentos:
+                    raise
+                respuesta = None
+            else:
+                self._contar(host, bytes=len(respuesta.content))
+                if respuesta.status_code == 429:
+                    self._contar(host, respuestas_429=1)
+                if respuesta.status_code not in CODIGOS_REINTENTABLES or intento == self.max_reintentos:
+                    return respuesta
+            espera = self._espera_reintento(respuesta, intento)
+            if espera > self.max_espera:
+                # Solo el servidor puede pedir más que el máximo (el backoff propio ya está acotado)
+                self._contar(host, esperas_excesivas=1)
+                return respuesta
+            self._contar(host, reintentos=1, segundos_backoff=espera)
+            time.sleep(espera)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def resumen(self):
+        """Copia de los contadores por host."""
+        with self._lock:
+            return {host: dict(contador) for host, contador in self.contadores.items()}
+
+
+_CLIENTE = None
+_LOCK_CLIENTE = threading.Lock()
+
+
+def obtener_cliente():
+    """Devuelve el cliente HTTP compartido del proceso."""
+    global _CLIENTE
+    with _LOCK_CLIENTE:
+        if _CLIENTE is None:
+            _CLIENTE = ClienteHTTP()
+        return _CLIENTE
@@ -0,0 +1,266 @@
+"""Configuración del análisis: valores por defecto, lectura de variables de entorno y validación.
+
+Este módulo no importa pandas ni yfinance, para que validar o mostrar la configuración sea inmediato.
+"""
+import json
+import os
+import re
+from dataclasses import dataclass, field, fields
+
+from ranking import CLAVES_ORDEN
+
+# Configuraciones por defecto (ajustables manualmente)
+DEFAULT_CONFIG = {
+    "TICKERS": "WBD,UNFI,GOOGL,EPAM,NFE,GLNG,GLOB,NVDA",
+    "MIN_RENTABILIDAD_ANUAL": 45.0,
+    "MAX_DIAS_VENCIMIENTO": 45,
+    "MIN_DIFERENCIA_PORCENTUAL": 5.0,
+    "MIN_VOLUMEN": 1,
+    "MIN_VOLATILIDAD_IMPLICITA": 35.0,
+    "MIN_OPEN_INTEREST": 1,
+    "FILTRO_TIPO_OPCION": "OTM",
+    "TOP_CONTRATOS": 5,
+    "ALERTA_RENTABILIDAD_ANUAL": 50.0,
+    "ALERTA_VOLATILIDAD_MINIMA": 50.0,
+    "MIN_BID": 0.99,
+    "MAX_WORKERS": 8,
+    "MAX_DELTA": 1.0,
+    "MIN_PROB_BENEFICIO": 0.0,
+    "ORDEN_MEJORES": "rentabilidad",
+    "ESTRATEGIA": "put",
+    "MAX_ANCHO_SPREAD": 5.0,
+    "MIN_CREDITO_SPREAD": 0.3
+}
+
+# Parámetros fijados en el script (no se leen de variables de entorno)
+PARAMETROS_FIJOS = {"MIN_VOLUMEN", "MIN_OPEN_INTEREST", "ALERTA_RENTABILIDAD_ANUAL", "ALERTA_VOLATILIDAD_MINIMA"}
+
+TIPOS_OPCION = ["OTM", "ITM", "TODAS"]
+
+# put: puts vendidas; spread: bull put spreads (put vendida y put comprada de strike menor)
+ESTRATEGIAS = ["put", "spread"]
+
+# Claves del diccionario de filtros que reciben filtrar_opciones y el resto de etapas
+CLAVES_FILTROS = [
+    "MIN_RENTABILIDAD_ANUAL", "MAX_DIAS_VENCIMIENTO", "MIN_DIFERENCIA_PORCENTUAL", "MIN_VOLUMEN",
+    "MIN_VOLATILIDAD_IMPLICITA", "MIN_OPEN_INTEREST", "FILTRO_TIPO_OPCION", "ALERTA_RENTABILIDAD_ANUAL",
+    "ALERTA_VOLATILIDAD_MINIMA", "MIN_BID", "MAX_DELTA", "MIN_PROB_BENEFICIO", "MAX_ANCHO_SPREAD", "MIN_CREDITO_SPREAD"
+]
+
+# Claves que puede sobrescribir cada perfil (los tickers y los hilos son comunes a todos)
+CLAVES_PERFIL = CLAVES_FILTROS + ["TOP_CONTRATOS", "ORDEN_MEJORES", "ESTRATEGIA"]
+
+# Perfil que se usa cuando no se define PERFILES; sus informes conservan los nombres de siempre
+PERFIL_PRINCIPAL = "principal"
+
+
+@dataclass(frozen=True)
+class Perfil:
+    """Conjunto de filtros con nombre. Todos los perfiles se evalúan sobre las mismas cadenas descargadas."""
+    nombre: str
+    filtros: dict
+    top_contratos: int
+    orden_mejores: str
+    estrategia: str = "put"
+
+    @property
+    def tipo_opcion_texto(self):
+        tipo = self.filtros["FILTRO_TIPO_OPCION"]
+        return "Out of the Money" if tipo == "OTM" else "In the Money" if tipo == "ITM" else "Todas"
+
+
+def diferencias_perfil(config, perfil):
+    """Claves en las que un perfil se aparta de la configuración general."""
+    cambios = {clave: valor for clave, valor in perfil.filtros.items() if valor != getattr(config, clave.lower())}
+    if perfil.top_contratos != config.top_contratos:
+        cambios["TOP_CONTRATOS"] = perfil.top_contratos
+    if perfil.orden_mejores != config.orden_mejores:
+        cambios["ORDEN_MEJORES"] = perfil.orden_mejores
+    if perfil.estrategia != config.estrategia:
+        cambios["ESTRATEGIA"] = perfil.estrategia
+    return cambios
+
+
+def filtros_envolventes(perfiles):
+    """Filtros más permisivos que cubren todos los perfiles: los que se usan para descargar y podar una sola vez."""
+    envolventes = dict(perfiles[0].filtros)
+    for perfil in perfiles[1:]:
+        for clave, valor in perfil.filtros.items():
+            if clave == "FILTRO_TIPO_OPCION":
+                if valor != envolventes[clave]:
+                    envolventes[clave] = "TODAS"
+            elif clave.startswith("MAX_"):
+                envolventes[clave] = max(envolventes[clave], valor)
+            else:
+                envolventes[clave] = min(envolventes[clave], valor)
+    return envolventes
+
+
+@dataclass(frozen=True)
+class Configuracion:
+    """Configuración de una ejecución. Los nombres de campo son los de DEFAULT_CONFIG en minúsculas."""
+    tickers: list
+    min_rentabilidad_anual: float
+    max_dias_vencimiento: int
+    min_diferencia_porcentual: float
+    min_volumen: int
+    min_volatilidad_implicita: float
+    min_open_interest: int
+    filtro_tipo_opcion: str
+    top_contratos: int
+    alerta_rentabilidad_anual: float
+    alerta_volatilidad_minima: float
+    min_bid: float
+    max_workers: int
+    max_delta: float
+    min_prob_beneficio: float
+    orden_mejores: str
+    estrategia: str
+    max_ancho_spread: float
+    min_credito_spread: float
+    perfiles: tuple = field(default=(), compare=False)
+
+    def filtros(self):
+        """Diccionario de filtros con las claves de DEFAULT_CONFIG."""
+        return {clave: getattr(self, clave.lower()) for clave in CLAVES_FILTROS}
+
+    def como_diccionario(self):
+        return {campo.name.upper(): getattr(self, campo.name) for campo in fields(self) if campo.name != "perfiles"}
+
+
+def _leer(nombre, tipo):
+    """Lee una variable de entorno con el tipo del valor por defecto; si está vacía usa el defecto."""
+    defecto = DEFAULT_CONFIG[nombre]
+    if nombre in PARAMETROS_FIJOS:
+        return defecto
+    valor = os.getenv(nombre, str(defecto))
+    if not valor:
+        return defecto
+    try:
+        return tipo(valor)
+    except ValueError:
+        raise ValueError(f"Valor inválido para {nombre}: {valor!r} (se esperaba {tipo.__name__}).")
+
+
+def _validar(valores, avisos, prefijo=""):
+    """Sustituye por el valor por defecto (y anota el aviso) los valores fuera de rango."""
+    valores["filtro_tipo_opcion"] = valores["filtro_tipo_opcion"].upper()
+    if valores["filtro_tipo_opcion"] not in TIPOS_OPCION:
+        avisos.append(f"{prefijo}Valor inválido para FILTRO_TIPO_OPCION: {valores['filtro_tipo_opcion']}. "
+                      f"Usando valor por defecto: {DEFAULT_CONFIG['FILTRO_TIPO_OPCION']}")
+        valores["filtro_tipo_opcion"] = DEFAULT_CONFIG["FILTRO_TIPO_OPCION"]
+
+    valores["orden_mejores"] = valores["orden_mejores"].lower()
+    if valores["orden_mejores"] not in CLAVES_ORDEN:
+        avisos.append(f"{prefijo}Valor inválido para ORDEN_MEJORES: {valores['orden_mejores']}. "
+                      f"Usando valor por defecto: {DEFAULT_CONFIG['ORDEN_MEJORES']}")
+        valores["orden_mejores"] = DEFAULT_CONFIG["ORDEN_MEJORES"]
+
+    valores["estrategia"] = valores["estrategia"].lower()
+    if valores["estrategia"] not in ESTRATEGIAS:
+        avisos.append(f"{prefijo}Valor inválido para ESTRATEGIA: {valores['estrategia']}. "
+                      f"Usando valor por defecto: {DEFAULT_CONFIG['ESTRATEGIA']}")
+        valores["estrategia"] = DEFAULT_CONFIG["ESTRATEGIA"]
+
+    if valores["top_contratos"] < 1:
+        avisos.append(f"{prefijo}Valor inválido para TOP_CONTRATOS: {valores['top_contratos']}. "
+                      f"Usando valor por defecto: {DEFAULT_CONFIG['TOP_CONTRATOS']}")
+        valores["top_contratos"] = DEFAULT_CONFIG["TOP_CONTRATOS"]
+
+
+def _leer_perfiles(texto, base, avisos):
+    """Perfiles de PERFILES: JSON {nombre: {CLAVE: valor}} o ruta a un fichero con ese JSON.
+
+    Cada perfil parte de la configuración general y sobrescribe solo las claves que indica.
+    """
+    if not texto.lstrip().startswith("{"):
+        try:
+            with open(texto) as f:
+                texto = f.read()
+        except OSError as e:
+            raise ValueError(f"No se pudo leer el fichero de PERFILES {texto!r}: {e}")
+    try:
+        definiciones = json.loads(texto)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"PERFILES no es un JSON válido: {e}")
+    if not isinstance(definiciones, dict) or not definiciones:
+        raise ValueError("PERFILES debe ser un objeto JSON con al menos un perfil.")
+
+    perfiles = []
+    for nombre, cambios in definiciones.items():
+        # El nombre forma parte de los ficheros de salida
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", nombre):
+            raise ValueError(f"Nombre de perfil inválido: {nombre!r} (solo letras, números, '_' y '-').")
+        if not isinstance(cambios, dict):
+            raise ValueError(f"El perfil {nombre} debe ser un objeto JSON.")
+        valores = {clave.lower(): base[clave.lower()] for clave in CLAVES_PERFIL}
+        for clave, valor in cambios.items():
+            clave = clave.upper()
+            if clave not in CLAVES_PERFIL:
+                raise ValueError(f"Clave no admitida en el perfil {nombre}: {clave}. Admitidas: {', '.join(CLAVES_PERFIL)}")
+            tipo = type(DEFAULT_CONFIG[clave])
+            try:
+                valores[clave.lower()] = tipo(valor)
+            except (TypeError, ValueError):
+                raise ValueError(f"Valor inválido para {clave} en el perfil {nombre}: {valor!r} (se esperaba {tipo.__name__}).")
+        _validar(valores, avisos, prefijo=f"[{nombre}] ")
+        perfiles.append(Perfil(
+            nombre=nombre,
+            filtros={clave: valores[clave.lower()] for clave in CLAVES_FILTROS},
+            top_contratos=valores["top_contratos"],
+            orden_mejores=valores["orden_mejores"],
+            estrategia=valores["estrategia"]
+        ))
+    return tuple(perfiles)
+
+
+def obtener_configuracion(mostrar=True):
+    """Obtiene la configuración desde variables de entorno con valores por defecto del script.
+
+    Los valores fuera de rango se sustituyen por el valor por defecto y se anotan en `avisos`;
+    los que no se pueden interpretar lanzan ValueError. Devuelve (Configuracion, avisos).
+    Si no se define PERFILES, la configuración general es el único perfil (PERFIL_PRINCIPAL).
+    """
+    avisos = []
+
+    tickers = os.getenv("TICKERS", DEFAULT_CONFIG["TICKERS"])
+    if not tickers:
+        raise ValueError("No se especificaron tickers válidos. Define TICKERS en las variables de entorno.")
+    tickers = [t.strip() for t in tickers.split(",") if t.strip()]  # Eliminar espacios y elementos vacíos
+    tickers = list(dict.fromkeys(tickers))  # Eliminar duplicados conservando el orden
+    if not tickers:
+        raise ValueError("La lista de tickers está vacía después de procesar.")
+
+    valores = {"tickers": tickers}
+    for nombre in DEFAULT_CONFIG:
+        if nombre != "TICKERS":
+            valores[nombre.lower()] = _leer(nombre, type(DEFAULT_CONFIG[nombre]))
+
+    _validar(valores, avisos)
+    if valores["max_workers"] < 1:
+        avisos.append(f"Valor inválido para MAX_WORKERS: {valores['max_workers']}. "
+                      f"Usando valor por defecto: {DEFAULT_CONFIG['MAX_WORKERS']}")
+        valores["max_workers"] = DEFAULT_CONFIG["MAX_WORKERS"]
+
+    texto_perfiles = os.getenv("PERFILES", "").strip()
+    if texto_perfiles:
+        valores["perfiles"] = _leer_perfiles(texto_perfiles, valores, avisos)
+    else:
+        valores["perfiles"] = (Perfil(
+            nombre=PERFIL_PRINCIPAL,
+            filtros={clave: valores[clave.lower()] for clave in CLAVES_FILTROS},
+            top_contratos=valores["top_contratos"],
+            orden_mejores=valores["orden_mejores"],
+            estrategia=valores["estrategia"]
+        ),)
+
+    config = Configuracion(**valores)
+    if mostrar:
+        for aviso in avisos:
+            print(aviso)
+        for nombre, valor in config.como_diccionario().items():
+            print(f"{nombre}: {valor}")
+        if texto_perfiles:
+            for perfil in config.perfiles:
+                print(f"PERFIL {perfil.nombre}: {diferencias_perfil(config, perfil) or 'sin cambios'}")
+    return config, avisos
@@ -0,0 +1 @@
+"""Configuración de pytest: su presencia en la raíz permite importar los módulos desde tests/."""
@@ -0,0 +1,217 @@
+"""Representación compacta de los contratos que superan los filtros.
+
+Las cadenas viajan como DataFrames desde la descarga hasta el filtrado; cada contrato filtrado
+pasa después a ser un Contrato (put vendida) o un Spread (bull put spread), dataclasses con
+__slots__ y sin diccionario por instancia, para el ranking, los informes y los avisos. El ticker
+y la fuente se internan, así que todos los contratos comparten un único objeto str por valor, y
+el vencimiento se guarda como días desde 1970-01-01. Medido con
+`python benchmark_opciones.py --memoria-contratos 1000000`.
+
+Para la exportación tipada (Parquet) cada campo tiene su tipo de Arrow: el vencimiento es date32,
+que también cuenta días desde 1970-01-01, así que se escribe sin conversión.
+
+Este módulo no importa pandas; pyarrow solo se importa al exportar o leer Parquet.
+"""
+import sys
+from dataclasses import dataclass, fields
+from datetime import date, datetime, timedelta
+
+EPOCA = date(1970, 1, 1)
+
+
+def a_dias(fecha):
+    """Fecha (date, datetime o 'YYYY-MM-DD') a días desde la época."""
+    if isinstance(fecha, str):
+        fecha = datetime.strptime(fecha, "%Y-%m-%d")
+    if isinstance(fecha, datetime):
+        fecha = fecha.date()
+    return (fecha - EPOCA).days
+
+
+def desde_dias(dias):
+    """Días desde la época a date."""
+    return EPOCA + timedelta(days=int(dias))
+
+
+class _Registro:
+    """Comportamiento común de Contrato y Spread (sin __dict__: solo aporta métodos)."""
+    __slots__ = ()
+
+    @property
+    def vencimiento_texto(self):
+        """Vencimiento como 'YYYY-MM-DD'."""
+        return desde_dias(self.vencimiento).isoformat()
+
+    def valores(self):
+        """Valores sin formato en el orden de los campos, con el vencimiento como texto."""
+        return tuple(self.vencimiento_texto if campo == "vencimiento" else getattr(self, campo)
+                     for campo in CAMPOS[self.estrategia])
+
+
+@dataclass(slots=True)
+class Contrato(_Registro):
+    """Una put vendida que cumple los filtros, con los campos de COLUMNAS_FILTRADAS."""
+    ticker: str
+    strike: float
+    lastPrice: float
+    bid: float
+    vencimiento: int  # días desde la época
+    dias_vencimiento: int
+    rentabilidad_diaria: float
+    rentabilidad_anual: float
+    break_even: float
+    diferencia_porcentual: float
+    volatilidad_implícita: float
+    volumen: int
+    open_interest: int
+    delta: float
+    theta: float
+    prob_beneficio: float
+    source: str
+
+    estrategia = "put"
+
+    @property
+    def clave(self):
+        """Identificador del contrato para los avisos: (ticker, vencimiento, strike, strike comprado)."""
+        return self.ticker, self.vencimiento_texto, round(self.strike, 4), 0.0
+
+    @property
+    def strikes_texto(self):
+        return f"${self.strike:.2f}"
+
+    @property
+    def prima(self):
+        """Lo que se cobra por contrato (por acción)."""
+        return self.bid
+
+
+@dataclass(slots=True)
+class Spread(_Registro):
+    """Un bull put spread: put vendida a `strike` y put comprada a `strike_largo`, del mismo vencimiento.
+
+    Volumen e interés abierto son los de la pata menos líquida; volatilidad implícita, la de la
+    pata vendida; delta y theta, los netos de la posición (put vendida menos put comprada).
+    """
+    ticker: str
+    strike: float
+    strike_largo: float
+    bid: float  # bid de la pata vendida
+    credito: float
+    ancho: float
+    vencimiento: int  # días desde la época
+    dias_vencimiento: int
+    rentabilidad_riesgo: float
+    rentabilidad_anual: float
+    break_even: float
+    diferencia_porcentual: float
+    volatilidad_implícita: float
+    volumen: int
+    open_interest: int
+    delta: float
+    theta: float
+    prob_beneficio: float
+    source: str
+
+    estrategia = "spread"
+
+    @property
+    def clave(self):
+        return self.ticker, self.vencimiento_texto, round(self.strike, 4), round(self.strike_largo, 4)
+
+    @property
+    def strikes_texto(self):
+        return f"${self.strike:.2f}/${self.strike_largo:.2f}"
+
+    @property
+    def prima(self):
+        return self.credito
+
+    @property
+    def perdida_maxima(self):
+        """Pérdida máxima por acción: ancho menos crédito."""
+        return self.ancho - self.credito
+
+
+# Tipo de registro de cada estrategia y sus campos (en el orden de las columnas de su tabla)
+TIPOS = {"put": Contrato, "spread": Spread}
+CAMPOS = {estrategia: [campo.name for campo in fields(tipo)] for estrategia, tipo in TIPOS.items()}
+CAMPOS_CONTRATO = CAMPOS["put"]
+
+
+def _internados(valores):
+    """Valor internado de cada texto distinto de una columna."""
+    return {valor: sys.intern(str(valor)) for valor in set(valores)}
+
+
+def contratos_de_tabla(tabla, tipo=Contrato):
+    """Convierte un DataFrame con las columnas de `tipo` (vencimiento como 'YYYY-MM-DD') en una lista de registros.
+
+    Las conversiones de ticker, fuente y vencimiento se hacen una vez por valor distinto, no por fila.
+    """
+    if len(tabla) == 0:
+        return []
+    columnas = []
+    for campo in fields(tipo):
+        columna = tabla[campo.name].tolist()
+        if campo.type is str:
+            valores = _internados(columna)
+        elif campo.name == "vencimiento":
+            valores = {texto: a_dias(texto) for texto in set(columna)}
+        else:
+            valores = None
+        columnas.append(columna if valores is None else [valores[valor] for valor in columna])
+    return [tipo(*fila) for fila in zip(*columnas)]
+
+
+def contrato_de_textos(textos, tipo=Contrato):
+    """Registro a partir de sus valores como texto (p. ej. una fila de CSV escrita con valores())."""
+    return tipo(*(
+        sys.intern(texto) if campo.type is str
+        else a_dias(texto) if campo.name == "vencimiento"
+        else campo.type(texto)
+        for campo, texto in zip(fields(tipo), textos)
+    ))
+
+
+def esquema_arrow(tipo=Contrato):
+    """Esquema de Arrow de los registros de `tipo`: textos como diccionario, vencimiento como date32."""
+    import pyarrow as pa
+    tipos = {str: pa.dictionary(pa.int32(), pa.string()), float: pa.float64(), int: pa.int32()}
+    campos = [pa.field(campo.name, pa.date32() if campo.name == "vencimiento" else tipos[campo.type])
+              for campo in fields(tipo)]
+    return pa.schema(campos, metadata={"estrategia": tipo.estrategia})
+
+
+def tabla_arrow(registros, tipo=Contrato):
+    """Tabla de Arrow con los valores sin formato de los registros, una columna por campo."""
+    import pyarrow as pa
+    esquema = esquema_arrow(tipo)
+    columnas = []
+    for campo in esquema:
+        valores = [getattr(registro, campo.name) for registro in registros]
+        if campo.name == "vencimiento":
+            columnas.append(pa.array(valores, pa.int32()).cast(pa.date32()))
+        elif pa.types.is_dictionary(campo.type):
+            columnas.append(pa.array(valores, pa.string()).dictionary_encode())
+        else:
+            columnas.append(pa.array(valores, campo.type))
+    return pa.Table.from_arrays(columnas, schema=esquema)
+
+
+def contratos_de_arrow(tabla):
+    """Registros de una tabla escrita con tabla_arrow(); el tipo se toma de los metadatos del esquema."""
+    metadatos = tabla.schema.metadata or {}
+    tipo = TIPOS[metadatos.get(b"estrategia", b"put").decode()]
+    columnas = []
+    for campo in fields(tipo):
+        columna = tabla.column(campo.name)
+        if campo.name == "vencimiento":
+            columnas.append(columna.cast("int32").to_pylist())
+        elif campo.type is str:
+            valores = columna.to_pylist()
+            internados = _internados(valores)
+            columnas.append([internados[valor] for valor in valores])
+        else:
+            columnas.append(columna.to_pylist())
+    return [tipo(*fila) for fila in zip(*columnas)]
@@ -0,0 +1,51 @@
+"""Enumeración vectorizada de estrategias de varias patas sobre la cadena combinada.
+
+Un bull put spread vende una put y compra otra de strike menor del mismo vencimiento. Con n puts
+por vencimiento hay O(n²) pares, así que no se recorren en Python: en cada vencimiento se evalúan
+todas las combinaciones por bloques con broadcasting de NumPy y solo se materializan los índices
+de los pares que cumplen los límites de ancho, crédito y colchón.
+"""
+import os
+
+import numpy as np
+
+# Máximo de pares que se evalúan de una vez (acota la memoria de las matrices de cada bloque)
+MAX_PARES_BLOQUE = int(os.getenv("MAX_PARES_BLOQUE", "1000000"))
+
+
+def pares_bull_put(vencimiento, strike, bid, coste, es_corta, es_larga, precio_subyacente,
+                   max_ancho, min_credito, min_diferencia, max_pares_bloque=MAX_PARES_BLOQUE):
+    """Índices (vendida, comprada) de los bull put spreads que cumplen los límites.
+
+    Todos los argumentos salvo los límites son arrays con una posición por put. `vencimiento`
+    agrupa las patas; `es_corta` y `es_larga` marcan las que pueden hacer de pata vendida y
+    comprada. Un par es válido si el strike comprado es menor que el vendido con un ancho de como
+    mucho `max_ancho`, el crédito (bid de la vendida menos coste de la comprada) es al menos
+    `min_credito` y menor que el ancho, y el break-even queda al menos `min_diferencia` % por
+    debajo del subyacente.
+    """
+    vencimiento = np.asarray(vencimiento)
+    indices_cortas, indices_largas = [], []
+    for codigo in np.unique(vencimiento[es_corta]):
+        mismo_vencimiento = vencimiento == codigo
+        cortas = np.flatnonzero(mismo_vencimiento & es_corta)
+        largas = np.flatnonzero(mismo_vencimiento & es_larga)
+        if not len(largas):
+            continue
+        strike_largas = strike[largas][np.newaxis, :]
+        coste_largas = coste[largas][np.newaxis, :]
+        filas_bloque = max(1, max_pares_bloque // len(largas))
+        for inicio in range(0, len(cortas), filas_bloque):
+            bloque = cortas[inicio:inicio + filas_bloque]
+            strike_cortas = strike[bloque][:, np.newaxis]
+            ancho = strike_cortas - strike_largas
+            credito = bid[bloque][:, np.newaxis] - coste_largas
+            diferencia = 100 * (precio_subyacente - (strike_cortas - credito)) / precio_subyacente
+            validos = ((ancho > 0) & (ancho <= max_ancho) & (credito >= min_credito) & (credito < ancho) &
+                       (diferencia >= min_diferencia))
+            filas, columnas = np.nonzero(validos)
+            indices_cortas.append(bloque[filas])
+            indices_largas.append(largas[columnas])
+    if not indices_cortas:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(indices_cortas), np.concatenate(indices_largas)
@@ -0,0 +1,144 @@
+"""Reparto de un universo grande de tickers en fragmentos independientes y reducción de sus resultados.
+
+Cada fragmento se analiza en su propio proceso (o trabajo de una matriz de CI) con
+`cli.py analizar --fragmento I/N` y escribe sus informes parciales en parciales/fragmento_I/.
+`cli.py reducir` los combina en los informes globales, con los mejores contratos por ticker y un
+único aviso a Discord. El reparto equilibra el tamaño de las cadenas, no solo el número de tickers:
+los pesos son las filas de la cadena de cada ticker en las últimas ejecuciones (pesos_tickers.json).
+
+Este módulo no importa pandas para que planificar los fragmentos sea inmediato.
+"""
+import hashlib
+import heapq
+import json
+import os
+import statistics
+
+# Configuración de los fragmentos (ajustable por variables de entorno)
+PESOS_RUTA = os.getenv("PESOS_RUTA", "pesos_tickers.json")
+PLAN_FRAGMENTOS = os.getenv("PLAN_FRAGMENTOS", "")
+DIRECTORIO_PARCIALES = os.getenv("DIRECTORIO_PARCIALES", "parciales")
+MODOS_REPARTO = ["peso", "hash"]
+
+# Ficheros de cada resultado parcial (además de los informes habituales): los contratos sin
+# formato de cada estrategia y los metadatos del fragmento
+PARCIALES = {"put": "parcial_opciones.csv", "spread": "parcial_spreads.csv"}
+PARCIAL_META = "parcial.json"
+
+
+def parsear_fragmento(texto):
+    """'2/8' -> (2, 8). Los fragmentos se numeran desde 1."""
+    try:
+        indice, total = (int(parte) for parte in texto.split("/"))
+    except ValueError:
+        raise ValueError(f"Fragmento inválido: {texto!r} (se esperaba I/N, p. ej. 2/8).")
+    if total < 1 or not 1 <= indice <= total:
+        raise ValueError(f"Fragmento inválido: {texto!r} (I debe estar entre 1 y N).")
+    return indice, total
+
+
+def directorio_fragmento(indice, base=DIRECTORIO_PARCIALES):
+    return os.path.join(base, f"fragmento_{indice:03d}")
+
+
+def cargar_pesos(ruta=PESOS_RUTA):
+    """Pesos por ticker guardados por la última reducción ({} si no hay)."""
+    try:
+        with open(ruta) as f:
+            return {ticker: float(peso) for ticker, peso in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def guardar_pesos(nuevos, ruta=PESOS_RUTA):
+    """Actualiza los pesos conocidos con los medidos en esta ejecución (los demás se conservan)."""
+    pesos = cargar_pesos(ruta)
+    pesos.update({ticker: float(peso) for ticker, peso in nuevos.items() if peso > 0})
+    with open(ruta, "w") as f:
+        json.dump(dict(sorted(pesos.items())), f, indent=2)
+    return pesos
+
+
+def pesos_completos(tickers, pesos=None):
+    """Peso de cada ticker; los que no tienen peso conocido reciben la mediana de los conocidos (1 si no hay)."""
+    pesos = pesos or {}
+    conocidos = [pesos[ticker] for ticker in tickers if ticker in pesos]
+    por_defecto = statistics.median(conocidos) if conocidos else 1.0
+    return {ticker: pesos.get(ticker, por_defecto) for ticker in tickers}
+
+
+def ordenar_por_peso(tickers, pesos=None):
+    """Tickers de la cadena más grande a la más pequeña (a igual peso, en el orden de `tickers`)."""
+    peso = pesos_completos(tickers, pesos)
+    return sorted(tickers, key=lambda ticker: -peso[ticker])
+
+
+def _hash_ticker(ticker):
+    return int.from_bytes(hashlib.blake2b(ticker.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def asignar_fragmentos(tickers, num_fragmentos, pesos=None, modo="peso"):
+    """Reparte los tickers en `num_fragmentos` listas; devuelve [(tickers, peso total)].
+
+    Con modo="peso" se asigna cada ticker, del más pesado al más ligero, al fragmento con menos
+    carga (LPT), de modo que una cadena enorme no acaba junto a otras grandes. Los tickers sin
+    peso conocido reciben la mediana de los conocidos. Con modo="hash" cada ticker va siempre al
+    mismo fragmento, sin importar el resto del universo. Dentro de cada fragmento se conserva
+    el orden de `tickers`; el resultado es determinista.
+    """
+    if modo not in MODOS_REPARTO:
+        raise ValueError(f"Modo de reparto inválido: {modo}. Disponibles: {', '.join(MODOS_REPARTO)}")
+    peso = pesos_completos(tickers, pesos)
+
+    asignacion = {}
+    if modo == "hash":
+        for ticker in tickers:
+            asignacion[ticker] = _hash_ticker(ticker) % num_fragmentos
+    else:
+        cargas = [(0.0, indice) for indice in range(num_fragmentos)]
+        for ticker in sorted(tickers, key=lambda t: (-peso[t], t)):
+            carga, indice = heapq.heappop(cargas)
+            asignacion[ticker] = indice
+            heapq.heappush(cargas, (carga + peso[ticker], indice))
+
+    fragmentos = [([], 0.0) for _ in range(num_fragmentos)]
+    for ticker in tickers:
+        lista, total = fragmentos[asignacion[ticker]]
+        lista.append(ticker)
+        fragmentos[asignacion[ticker]] = (lista, total + peso[ticker])
+    return fragmentos
+
+
+def crear_plan(tickers, num_fragmentos, pesos=None, modo="peso"):
+    """Plan serializable del reparto, para que todos los fragmentos usen exactamente el mismo."""
+    return {
+        "modo": modo,
+        "fragmentos": [{"indice": indice, "tickers": lista, "peso": round(total, 1)}
+                       for indice, (lista, total) in enumerate(asignar_fragmentos(tickers, num_fragmentos, pesos, modo), 1)]
+    }
+
+
+def tickers_del_fragmento(tickers, indice, total, ruta_plan=PLAN_FRAGMENTOS, modo="peso"):
+    """Tickers del fragmento `indice` de `total`: los del plan si se indica uno, si no los del reparto por pesos."""
+    if ruta_plan:
+        with open(ruta_plan) as f:
+            plan = json.load(f)
+        if len(plan["fragmentos"]) != total:
+            raise ValueError(f"El plan {ruta_plan} tiene {len(plan['fragmentos'])} fragmentos, no {total}.")
+        return plan["fragmentos"][indice - 1]["tickers"]
+    return asignar_fragmentos(tickers, total, cargar_pesos(), modo)[indice - 1][0]
+
+
+def pesos_de_metricas(ruta_metricas):
+    """Filas de la cadena combinada de cada ticker según el metrics.json de una ejecución o fragmento.
+
+    Se omiten los tickers que agotaron su tiempo: su cadena está incompleta y conservan el peso anterior.
+    """
+    try:
+        with open(ruta_metricas) as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    incompletos = set((datos.get("plazos") or {}).get("incompletos", []))
+    return {ticker: etapas["combinacion"]["filas_salida"] for ticker, etapas in datos.get("por_ticker", {}).items()
+            if "combinacion" in etapas and ticker not in incompletos}
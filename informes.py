@@ -0,0 +1,294 @@
+"""Informes de la ejecución: ficheros que se escriben por partes y formato de presentación de los contratos.
+
+Los contratos viajan como números (Contrato o Spread) hasta aquí; solo se convierten a texto
+("$12.50", "48.31%") al escribir el CSV o las tablas de presentación. El export Parquet guarda los
+valores sin formato y con tipo, para leerlos sin volver a interpretar texto.
+"""
+import csv
+import os
+
+from contratos import TIPOS, esquema_arrow, tabla_arrow
+
+# Formatos de los informes de contratos: csv (con formato de presentación) y/o parquet (tipado)
+FORMATOS_EXPORTACION = os.getenv("FORMATOS_EXPORTACION", "csv,parquet")
+FORMATOS_DISPONIBLES = ["csv", "parquet"]
+# Registros por grupo de filas de los Parquet exportados
+FILAS_POR_GRUPO_PARQUET = int(os.getenv("FILAS_POR_GRUPO_PARQUET", "65536"))
+
+
+class SalidaTexto:
+    """Fichero de texto que se escribe por partes a medida que avanza el análisis.
+
+    Cada escritura se vuelca a disco para que, si la ejecución se interrumpe, el fichero
+    conserve todo lo escrito hasta ese momento. Con perezoso=True el fichero no se crea
+    hasta la primera escritura.
+    """
+
+    def __init__(self, ruta, cabecera="", perezoso=False):
+        self.ruta = ruta
+        self.cabecera = cabecera
+        self._fichero = None
+        if not perezoso:
+            self._abrir()
+
+    def _abrir(self):
+        self._fichero = open(self.ruta, "w")
+        if self.cabecera:
+            self._fichero.write(self.cabecera)
+
+    @property
+    def abierto(self):
+        return self._fichero is not None
+
+    def escribir(self, texto):
+        if self._fichero is None:
+            self._abrir()
+        self._fichero.write(texto)
+        self._fichero.flush()
+
+    def cerrar(self):
+        if self._fichero is not None:
+            self._fichero.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class SalidaCSV:
+    """CSV que se escribe fila a fila; la cabecera se escribe al abrirlo, así que nunca queda vacío."""
+
+    def __init__(self, ruta, cabeceras):
+        self.ruta = ruta
+        self.filas = 0
+        self._fichero = open(ruta, "w", newline="")
+        self._escritor = csv.writer(self._fichero)
+        self._escritor.writerow(cabeceras)
+        self._fichero.flush()
+
+    def escribir_filas(self, filas):
+        for fila in filas:
+            self._escritor.writerow(fila)
+            self.filas += 1
+        self._fichero.flush()
+
+    def cerrar(self):
+        self._fichero.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class SalidaParquet:
+    """Parquet tipado de registros (Contrato o Spread) que se escribe por grupos de filas.
+
+    Los registros se acumulan hasta completar un grupo de `filas_por_grupo`. Parquet escribe su
+    índice al final, así que el fichero solo es legible una vez cerrado; sin registros queda un
+    fichero con el esquema y ninguna fila.
+    """
+
+    def __init__(self, ruta, tipo, filas_por_grupo=FILAS_POR_GRUPO_PARQUET):
+        import pyarrow.parquet as pq
+        self.ruta = ruta
+        self.tipo = tipo
+        self.filas = 0
+        self.filas_por_grupo = filas_por_grupo
+        self._pendientes = []
+        self._escritor = pq.ParquetWriter(ruta, esquema_arrow(tipo))
+
+    def escribir(self, registros):
+        self._pendientes.extend(registros)
+        if len(self._pendientes) >= self.filas_por_grupo:
+            self._volcar()
+
+    def _volcar(self):
+        if self._pendientes:
+            self._escritor.write_table(tabla_arrow(self._pendientes, self.tipo))
+            self.filas += len(self._pendientes)
+            self._pendientes = []
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._volcar()
+            self._escritor.close()
+            self._escritor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def formatos_exportacion(texto=FORMATOS_EXPORTACION):
+    """Formatos pedidos en FORMATOS_EXPORTACION; parquet se omite, con un aviso, si falta pyarrow."""
+    formatos = list(dict.fromkeys(formato.strip().lower() for formato in texto.split(",") if formato.strip()))
+    if not formatos or any(formato not in FORMATOS_DISPONIBLES for formato in formatos):
+        raise ValueError(f"FORMATOS_EXPORTACION inválido: {texto!r}. Disponibles: {', '.join(FORMATOS_DISPONIBLES)}")
+    if "parquet" in formatos:
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            print(f"Exportación Parquet desactivada (falta pyarrow): {e}")
+            formatos.remove("parquet")
+    return formatos or ["csv"]
+
+
+class SalidaContratos:
+    """Informe de contratos (todas_las_opciones, mejores_contratos) en los formatos de exportación pedidos.
+
+    `ruta` es la del CSV; el Parquet usa la misma con extensión .parquet. Las filas solo se
+    formatean como texto si se pide el CSV. Los ficheros de un formato no pedido que queden de
+    una ejecución anterior se borran para que no se confundan con los actuales.
+    """
+
+    def __init__(self, ruta, estrategia, formatos):
+        rutas = {"csv": ruta, "parquet": os.path.splitext(ruta)[0] + ".parquet"}
+        for formato, ruta_formato in rutas.items():
+            if formato not in formatos:
+                eliminar_si_existe(ruta_formato)
+        cabeceras, self._formatear = FORMATOS[estrategia]
+        self._csv = SalidaCSV(rutas["csv"], cabeceras) if "csv" in formatos else None
+        self._parquet = SalidaParquet(rutas["parquet"], TIPOS[estrategia]) if "parquet" in formatos else None
+        self.ruta = " y ".join(salida.ruta for salida in (self._csv, self._parquet) if salida is not None)
+        self.filas = 0
+
+    def escribir(self, registros):
+        """Añade una lista de registros a todos los formatos."""
+        if self._csv is not None:
+            self._csv.escribir_filas(self._formatear(registro) for registro in registros)
+        if self._parquet is not None:
+            self._parquet.escribir(registros)
+        self.filas += len(registros)
+
+    def cerrar(self):
+        for salida in (self._csv, self._parquet):
+            if salida is not None:
+                salida.cerrar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def eliminar_si_existe(ruta):
+    """Borra un informe de una ejecución anterior para que no se confunda con el actual."""
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def ruta_de_perfil(ruta, perfil=None):
+    """Ruta del informe de un perfil: ('mejores_contratos.csv', 'conservador') -> 'mejores_contratos_conservador.csv'."""
+    if not perfil:
+        return ruta
+    base, extension = os.path.splitext(ruta)
+    return f"{base}_{perfil}{extension}"
+
+
+# Cabeceras de todas_las_opciones.csv y mejores_contratos.csv (las tablas por ticker omiten "Ticker")
+HEADERS_CSV = [
+    "Ticker",
+    "Strike",
+    "Last Closed",
+    "Bid",
+    "Vencimiento",
+    "Días Venc.",
+    "Rent. Diaria",
+    "Rent. Anual",
+    "Break-even",
+    "Dif. % (Suby.-Break.)",
+    "Volatilidad Implícita",
+    "Volumen",
+    "Interés Abierto",
+    "Delta",
+    "Theta",
+    "Prob. Beneficio",
+    "Fuente"
+]
+
+
+def formatear_opcion(opcion):
+    """Fila de texto de un Contrato, en el orden de HEADERS_CSV."""
+    return [
+        opcion.ticker,
+        f"${opcion.strike:.2f}",
+        f"${opcion.lastPrice:.2f}",
+        f"${opcion.bid:.2f}",
+        opcion.vencimiento_texto,
+        opcion.dias_vencimiento,
+        f"{opcion.rentabilidad_diaria:.2f}%",
+        f"{opcion.rentabilidad_anual:.2f}%",
+        f"${opcion.break_even:.2f}",
+        f"{opcion.diferencia_porcentual:.2f}%",
+        f"{opcion.volatilidad_implícita:.2f}%",
+        opcion.volumen,
+        opcion.open_interest,
+        f"{opcion.delta:.3f}",
+        f"{opcion.theta:.3f}",
+        f"{opcion.prob_beneficio:.1f}%",
+        opcion.source
+    ]
+
+
+# Cabeceras de los informes de los perfiles de spreads
+HEADERS_SPREAD = [
+    "Ticker",
+    "Strike Vendido",
+    "Strike Comprado",
+    "Bid Vendido",
+    "Crédito",
+    "Ancho",
+    "Pérdida Máx.",
+    "Vencimiento",
+    "Días Venc.",
+    "Rent. s/Riesgo",
+    "Rent. Anual",
+    "Break-even",
+    "Dif. % (Suby.-Break.)",
+    "Volatilidad Implícita",
+    "Volumen",
+    "Interés Abierto",
+    "Delta",
+    "Theta",
+    "Prob. Beneficio",
+    "Fuente"
+]
+
+
+def formatear_spread(spread):
+    """Fila de texto de un Spread, en el orden de HEADERS_SPREAD."""
+    return [
+        spread.ticker,
+        f"${spread.strike:.2f}",
+        f"${spread.strike_largo:.2f}",
+        f"${spread.bid:.2f}",
+        f"${spread.credito:.2f}",
+        f"${spread.ancho:.2f}",
+        f"${spread.perdida_maxima:.2f}",
+        spread.vencimiento_texto,
+        spread.dias_vencimiento,
+        f"{spread.rentabilidad_riesgo:.2f}%",
+        f"{spread.rentabilidad_anual:.2f}%",
+        f"${spread.break_even:.2f}",
+        f"{spread.diferencia_porcentual:.2f}%",
+        f"{spread.volatilidad_implícita:.2f}%",
+        spread.volumen,
+        spread.open_interest,
+        f"{spread.delta:.3f}",
+        f"{spread.theta:.3f}",
+        f"{spread.prob_beneficio:.1f}%",
+        spread.source
+    ]
+
+
+# Cabeceras y formato de las filas de cada estrategia
+FORMATOS = {"put": (HEADERS_CSV, formatear_opcion), "spread": (HEADERS_SPREAD, formatear_spread)}
@@ -0,0 +1,110 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Fichero de métricas y perfil (ajustables por variables de entorno)
+METRICAS_RUTA = os.getenv("METRICAS_RUTA", "metrics.json")
+PERFIL_RUTA = os.getenv("PERFIL_RUTA", "perfil.prof")
+
+
+def _acumulado_vacio():
+    return {"llamadas": 0, "errores": 0, "segundos": 0.0, "segundos_max": 0.0,
+            "filas_entrada": 0, "filas_salida": 0, "bytes": 0}
+
+
+def tamano_en_memoria(tabla):
+    """Bytes que ocupa en memoria un DataFrame (con el contenido de las cadenas de texto)."""
+    return int(tabla.memory_usage(deep=True).sum())
+
+
+class Metricas:
+    """Acumula, por etapa y por ticker, tiempo de pared, llamadas, filas y bytes.
+
+    Cada medida se toma con el gestor de contexto etapa(); el diccionario que devuelve admite
+    `filas_entrada`, `filas_salida` y `bytes`. Las etapas de descarga anotan en `bytes` el tamaño
+    en memoria de lo obtenido (tamano_en_memoria), que cuenta igual la caché, yfinance y las
+    fuentes HTTP. Es seguro usarlo desde varios hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.inicio = time.time()
+            self.etapas = {}
+            self.por_ticker = {}
+
+    @contextmanager
+    def etapa(self, nombre, ticker=None):
+        medida = {"filas_entrada": 0, "filas_salida": 0, "bytes": 0}
+        error = False
+        inicio = time.perf_counter()
+        try:
+            yield medida
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._registrar(nombre, ticker, time.perf_counter() - inicio, medida, error)
+
+    def _registrar(self, nombre, ticker, segundos, medida, error):
+        with self._lock:
+            destinos = [self.etapas.setdefault(nombre, _acumulado_vacio())]
+            if ticker is not None:
+                destinos.append(self.por_ticker.setdefault(ticker, {}).setdefault(nombre, _acumulado_vacio()))
+            for acumulado in destinos:
+                acumulado["llamadas"] += 1
+                acumulado["errores"] += int(error)
+                acumulado["segundos"] += segundos
+                acumulado["segundos_max"] = max(acumulado["segundos_max"], segundos)
+                for clave in ("filas_entrada", "filas_salida", "bytes"):
+                    acumulado[clave] += int(medida.get(clave) or 0)
+
+    def resumen(self):
+        with self._lock:
+            return {
+                "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.inicio)),
+                "segundos_totales": round(time.time() - self.inicio, 3),
+                "etapas": {nombre: dict(acumulado) for nombre, acumulado in self.etapas.items()},
+                "por_ticker": {ticker: {nombre: dict(acumulado) for nombre, acumulado in etapas.items()}
+                               for ticker, etapas in self.por_ticker.items()}
+            }
+
+    def guardar(self, ruta=METRICAS_RUTA, **extra):
+        """Escribe el resumen en JSON junto con los bloques adicionales (HTTP, caché, poda...)."""
+        datos = self.resumen()
+        datos.update(extra)
+        with open(ruta, "w") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False, default=str)
+        return ruta
+
+
+METRICAS = Metricas()
+
+
+def etapa(nombre, ticker=None):
+    """Atajo para METRICAS.etapa()."""
+    return METRICAS.etapa(nombre, ticker)
+
+
+@contextmanager
+def perfilado(activo, ruta=PERFIL_RUTA, lineas=30):
+    """Si `activo`, ejecuta el bloque bajo cProfile, guarda el perfil en `ruta` e imprime las funciones más costosas."""
+    if not activo:
+        yield
+        return
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield
+    finally:
+        perfil.disable()
+        perfil.dump_stats(ruta)
+        print(f"Perfil guardado en {ruta} (ábrelo con `python -m pstats {ruta}` o snakeviz).")
+        pstats.Stats(perfil).sort_stats("cumulative").print_stats(lineas)
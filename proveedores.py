@@ -0,0 +1,287 @@
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from analitica import TASA_LIBRE_RIESGO, precio_put
+from cliente_http import obtener_cliente
+
+# Proveedores que usa el análisis, en orden de prioridad (ajustable con la variable PROVEEDORES)
+PROVEEDORES_POR_DEFECTO = "yahoo,finnhub"
+
+# Clave API de Finnhub (secreto FINNHUB_API_KEY); sin ella el proveedor Finnhub se desactiva
+FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY", "")
+# URL base de la API de Finnhub (p. ej. la del servidor simulado de servidor_simulado.py)
+FINNHUB_URL = os.getenv("FINNHUB_URL", "https://finnhub.io").rstrip("/")
+
+# Parámetros del proveedor sintético
+SINTETICO_SEMILLA = int(os.getenv("SINTETICO_SEMILLA", "42"))
+SINTETICO_VENCIMIENTOS = int(os.getenv("SINTETICO_VENCIMIENTOS", "12"))
+SINTETICO_STRIKES = int(os.getenv("SINTETICO_STRIKES", "80"))
+
+# Columnas de una cadena de opciones PUT normalizada (una fila por contrato)
+COLUMNAS_CADENA = ["strike", "lastPrice", "bid", "expirationDate", "volume", "impliedVolatility", "openInterest", "source"]
+
+# Campos que se completan con la fuente de respaldo cuando faltan o valen 0
+CAMPOS_RESPALDO = ["bid", "lastPrice", "volume", "openInterest", "impliedVolatility"]
+
+
+def cadena_vacia():
+    """Devuelve una cadena de opciones vacía con las columnas normalizadas."""
+    return pd.DataFrame(columns=COLUMNAS_CADENA)
+
+
+def _columna(df, nombre, defecto=0.0):
+    """Devuelve la columna como float, o una columna constante si la fuente no la trae."""
+    if nombre in df.columns:
+        return pd.to_numeric(df[nombre], errors="coerce").astype(float)
+    return pd.Series(defecto, index=df.index, dtype=float)
+
+
+def normalizar_cadena(puts, fecha, source, columna_precio="lastPrice"):
+    """Convierte la tabla de PUTs de un vencimiento al formato columnar de COLUMNAS_CADENA."""
+    return pd.DataFrame({
+        "strike": _columna(puts, "strike"),
+        "lastPrice": _columna(puts, columna_precio),
+        "bid": _columna(puts, "bid"),
+        "expirationDate": fecha,
+        "volume": _columna(puts, "volume"),
+        "impliedVolatility": _columna(puts, "impliedVolatility") * 100,
+        "openInterest": _columna(puts, "openInterest"),
+        "source": source
+    }, columns=COLUMNAS_CADENA)
+
+
+class Proveedor:
+    """Interfaz de una fuente de datos de opciones.
+
+    Un proveedor sabe dar la cotización del subyacente, la lista de vencimientos de un ticker y la
+    cadena de PUTs de un vencimiento en el formato de COLUMNAS_CADENA. Los que no ofrecen
+    cotización lanzan NotImplementedError y el análisis usa el siguiente proveedor.
+    """
+
+    nombre = ""
+    # Si es False, sus datos no se guardan en la caché de instantáneas
+    cacheable = True
+    # Si es False, sus datos no son de mercado y no se envían alertas a Discord
+    datos_reales = True
+
+    def cotizacion(self, ticker):
+        """Devuelve {"precio", "minimo_52_semanas", "maximo_52_semanas"} del subyacente."""
+        raise NotImplementedError
+
+    def cotizaciones(self, tickers):
+        """Cotizaciones de varios tickers en lote; devuelve solo las que haya podido resolver."""
+        return {}
+
+    def vencimientos(self, ticker):
+        """Devuelve la lista de vencimientos (YYYY-MM-DD) disponibles para el ticker."""
+        raise NotImplementedError
+
+    def cadena(self, ticker, vencimiento):
+        """Devuelve la cadena de PUTs de un vencimiento como DataFrame normalizado."""
+        raise NotImplementedError
+
+
+class ProveedorYahoo(Proveedor):
+    """Yahoo Finance a través de yfinance."""
+
+    nombre = "Yahoo Finance"
+
+    def __init__(self):
+        # yfinance se importa al crear el proveedor: los comandos que no descargan datos no lo cargan
+        import yfinance
+        self._yf = yfinance
+        self._stocks = {}
+        self._lock = threading.Lock()
+
+    def _stock(self, ticker):
+        with self._lock:
+            if ticker not in self._stocks:
+                self._stocks[ticker] = self._yf.Ticker(ticker)
+            return self._stocks[ticker]
+
+    def cotizacion(self, ticker):
+        info = self._stock(ticker).info
+        datos = {
+            "precio": info.get('regularMarketPrice', None),
+            "minimo_52_semanas": info.get('fiftyTwoWeekLow', None),
+            "maximo_52_semanas": info.get('fiftyTwoWeekHigh', None)
+        }
+        if None in datos.values():
+            raise ValueError(f"No se encontraron datos válidos para el subyacente {ticker}")
+        return datos
+
+    def cotizaciones(self, tickers):
+        """Precio y rango de 52 semanas desde una sola descarga del histórico diario del último año."""
+        historico = self._yf.download(list(tickers), period="1y", interval="1d", group_by="ticker",
+                                      auto_adjust=False, progress=False, threads=True)
+        resultado = {}
+        for ticker in tickers:
+            try:
+                serie = historico[ticker] if isinstance(historico.columns, pd.MultiIndex) else historico
+                cierres = serie["Close"].dropna()
+                if cierres.empty:
+                    continue
+                resultado[ticker] = {
+                    "precio": float(cierres.iloc[-1]),
+                    "minimo_52_semanas": float(serie["Low"].min()),
+                    "maximo_52_semanas": float(serie["High"].max())
+                }
+            except KeyError:
+                continue
+        return resultado
+
+    def vencimientos(self, ticker):
+        return list(self._stock(ticker).options)
+
+    def cadena(self, ticker, vencimiento):
+        return normalizar_cadena(self._stock(ticker).option_chain(vencimiento).puts, vencimiento, self.nombre)
+
+
+class ProveedorFinnhub(Proveedor):
+    """Finnhub: una sola petición devuelve todos los vencimientos; se memoriza por ticker."""
+
+    nombre = "Finnhub"
+
+    def __init__(self, api_key=FINNHUB_API_KEY, url=FINNHUB_URL):
+        self.api_key = api_key
+        self.url = url
+        self._cadenas = {}
+        self._lock = threading.Lock()
+
+    def _cadena_completa(self, ticker):
+        with self._lock:
+            if ticker in self._cadenas:
+                return self._cadenas[ticker]
+        url = f"{self.url}/api/v1/stock/option-chain?symbol={ticker}&token={self.api_key}"
+        response = obtener_cliente().get(url)
+        response.raise_for_status()
+        data = response.json()
+        fragmentos = []
+        for expiration in data.get("data", []):
+            puts = pd.DataFrame(expiration["options"]["PUT"])
+            fragmentos.append(normalizar_cadena(puts, expiration["expirationDate"], self.nombre, columna_precio="last"))
+        cadena = pd.concat(fragmentos, ignore_index=True) if fragmentos else cadena_vacia()
+        # Finnhub devuelve null en los campos sin dato; se tratan como 0
+        cadena[CAMPOS_RESPALDO] = cadena[CAMPOS_RESPALDO].fillna(0)
+        with self._lock:
+            self._cadenas[ticker] = cadena
+        return cadena
+
+    def vencimientos(self, ticker):
+        return list(dict.fromkeys(self._cadena_completa(ticker)["expirationDate"]))
+
+    def cadena(self, ticker, vencimiento):
+        cadena = self._cadena_completa(ticker)
+        return cadena[cadena["expirationDate"] == vencimiento].reset_index(drop=True)
+
+
+class ProveedorSintetico(Proveedor):
+    """Genera cadenas realistas y deterministas sin acceder a la red.
+
+    Para una misma semilla, ticker y vencimiento siempre produce los mismos datos, sea cual sea el
+    orden de las llamadas. Los precios salen de Black-Scholes con una sonrisa de volatilidad
+    (más volatilidad en strikes bajos), horquilla bid/ask proporcional y volumen e interés abierto
+    que decaen al alejarse del dinero. Sirve para pruebas de carga y perfiles de rendimiento.
+    """
+
+    nombre = "Sintético"
+    cacheable = False
+    datos_reales = False
+
+    def __init__(self, semilla=SINTETICO_SEMILLA, num_vencimientos=SINTETICO_VENCIMIENTOS,
+                 strikes_por_vencimiento=SINTETICO_STRIKES, fecha_base=None, tasa_libre_riesgo=TASA_LIBRE_RIESGO):
+        self.semilla = semilla
+        self.num_vencimientos = num_vencimientos
+        self.strikes_por_vencimiento = strikes_por_vencimiento
+        self.fecha_base = fecha_base or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.tasa_libre_riesgo = tasa_libre_riesgo
+
+    def _generador(self, *partes):
+        return np.random.default_rng([self.semilla] + [zlib.crc32(str(parte).encode("utf-8")) for parte in partes])
+
+    def _parametros_ticker(self, ticker):
+        rng = self._generador(ticker)
+        precio = float(np.round(rng.lognormal(np.log(80), 0.9), 2))
+        volatilidad = float(rng.uniform(0.25, 0.9))
+        return precio, volatilidad
+
+    def cotizacion(self, ticker):
+        precio, volatilidad = self._parametros_ticker(ticker)
+        rng = self._generador(ticker, "52s")
+        return {
+            "precio": precio,
+            "minimo_52_semanas": round(precio * (1 - rng.uniform(0.1, volatilidad)), 2),
+            "maximo_52_semanas": round(precio * (1 + rng.uniform(0.1, volatilidad)), 2)
+        }
+
+    def cotizaciones(self, tickers):
+        return {ticker: self.cotizacion(ticker) for ticker in tickers}
+
+    def vencimientos(self, ticker):
+        # Viernes semanales a partir de la fecha base
+        primer_viernes = self.fecha_base + timedelta(days=(4 - self.fecha_base.weekday()) % 7 or 7)
+        return [(primer_viernes + timedelta(weeks=i)).strftime("%Y-%m-%d") for i in range(self.num_vencimientos)]
+
+    def cadena(self, ticker, vencimiento):
+        precio, volatilidad = self._parametros_ticker(ticker)
+        rng = self._generador(ticker, vencimiento)
+        n = self.strikes_por_vencimiento
+        dias = max((datetime.strptime(vencimiento, "%Y-%m-%d") - self.fecha_base).days, 1)
+        t = dias / 365
+
+        paso = max(round(precio * 0.8 / n, 2), 0.01)
+        strike = np.round(precio * 0.6 + paso * np.arange(n), 2)
+        moneyness = np.log(strike / precio)
+        iv = np.clip(volatilidad - 0.6 * moneyness + 1.5 * moneyness ** 2 + rng.normal(0, 0.01, n), 0.05, 3.0)
+
+        teorico = np.maximum(precio_put(precio, strike, t, iv, self.tasa_libre_riesgo), 0.01)
+
+        horquilla = np.maximum(0.01, teorico * rng.uniform(0.02, 0.12, n))
+        bid = np.maximum(np.round(teorico - horquilla / 2, 2), 0.0)
+        ultimo = np.round(np.maximum(teorico * (1 + rng.normal(0, 0.03, n)), 0.01), 2)
+        liquidez = np.exp(-8 * np.abs(moneyness))
+        volumen = np.floor(rng.lognormal(4, 1.2, n) * liquidez)
+        interes_abierto = np.floor(rng.lognormal(6, 1.3, n) * liquidez)
+
+        return pd.DataFrame({
+            "strike": strike,
+            "lastPrice": ultimo,
+            "bid": bid,
+            "expirationDate": vencimiento,
+            "volume": volumen,
+            "impliedVolatility": iv * 100,
+            "openInterest": interes_abierto,
+            "source": self.nombre
+        }, columns=COLUMNAS_CADENA)
+
+
+# Registro de proveedores por nombre (variable PROVEEDORES)
+PROVEEDORES_DISPONIBLES = {
+    "yahoo": ProveedorYahoo,
+    "finnhub": ProveedorFinnhub,
+    "sintetico": ProveedorSintetico
+}
+
+
+def crear_proveedores(nombres=None, offline=False):
+    """Crea los proveedores indicados (lista separada por comas) en orden de prioridad.
+
+    Sin FINNHUB_API_KEY se omite Finnhub, salvo en modo offline (se reproduce desde la caché).
+    """
+    nombres = nombres or os.getenv("PROVEEDORES") or PROVEEDORES_POR_DEFECTO
+    proveedores = []
+    for nombre in [n.strip().lower() for n in nombres.split(",") if n.strip()]:
+        if nombre not in PROVEEDORES_DISPONIBLES:
+            raise ValueError(f"Proveedor desconocido: {nombre}. Disponibles: {', '.join(PROVEEDORES_DISPONIBLES)}")
+        if nombre == "finnhub" and not FINNHUB_API_KEY and not offline:
+            print("Proveedor Finnhub desactivado: no se ha configurado FINNHUB_API_KEY.")
+            continue
+        proveedores.append(PROVEEDORES_DISPONIBLES[nombre]())
+    if not proveedores:
+        raise ValueError("No se especificó ningún proveedor de datos.")
+    return proveedores
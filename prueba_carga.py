@@ -0,0 +1,181 @@
+"""Prueba de carga de extremo a extremo del análisis contra el servidor simulado.
+
+Arranca servidor_simulado.py en otro proceso (su CPU y su memoria no se mezclan con las del
+análisis) y ejecuta analizar_opciones() completo para N tickers, con Yahoo, Finnhub y el webhook
+de Discord apuntando al servidor: descarga concurrente, reintentos, filtrado, informes, archivo
+y avisos. Guarda en JSON el tiempo total, las peticiones por servicio vistas por el cliente HTTP
+y por el servidor (con reintentos, 429 y errores inyectados), la concurrencia máxima atendida,
+el pico de memoria residente del proceso del análisis y las métricas por etapa. La salida del
+análisis queda en ejecucion.log dentro del directorio de trabajo.
+
+    python prueba_carga.py --tickers 300 --latencia-ms 50 --jitter-ms 100 --tasa-429 0.02
+
+yfinance no permite cambiar el host al que se conecta, así que Yahoo se sustituye por
+ProveedorYahooSimulado, que lee el mismo JSON de la API v7 a través de cliente_http. Finnhub y
+Discord usan el código de producción sin cambios, solo con la URL del servidor. Los ajustes del
+análisis (MAX_WORKERS, PLAZO_EJECUCION_SEGUNDOS, HTTP_*...) se toman del entorno.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import requests
+
+import analizar_opciones
+from cliente_http import obtener_cliente
+from metricas import METRICAS_RUTA
+from proveedores import Proveedor, ProveedorFinnhub, normalizar_cadena
+from servidor_simulado import (SIMULADOR_JITTER_MS, SIMULADOR_LATENCIA_MS, SIMULADOR_RETRY_AFTER, SIMULADOR_SEMILLA,
+                               SIMULADOR_TASA_429, SIMULADOR_TASA_ERRORES)
+
+SERVIDOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "servidor_simulado.py")
+
+
+class ProveedorYahooSimulado(Proveedor):
+    """Yahoo Finance servido por servidor_simulado.py (API v7 de opciones, como la que usa yfinance)."""
+
+    nombre = "Yahoo Finance"
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def _resultado(self, ticker, vencimiento=None):
+        parametros = ""
+        if vencimiento is not None:
+            fecha = datetime.strptime(vencimiento, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            parametros = f"?date={int(fecha.timestamp())}"
+        respuesta = obtener_cliente().get(f"{self.url}/v7/finance/options/{ticker}{parametros}")
+        respuesta.raise_for_status()
+        resultado = respuesta.json()["optionChain"]["result"]
+        return resultado[0] if resultado else None
+
+    def cotizacion(self, ticker):
+        resultado = self._resultado(ticker)
+        if resultado is None:
+            raise ValueError(f"No se encontraron datos válidos para el subyacente {ticker}")
+        cotizacion = resultado["quote"]
+        return {
+            "precio": cotizacion["regularMarketPrice"],
+            "minimo_52_semanas": cotizacion["fiftyTwoWeekLow"],
+            "maximo_52_semanas": cotizacion["fiftyTwoWeekHigh"]
+        }
+
+    def vencimientos(self, ticker):
+        resultado = self._resultado(ticker)
+        if resultado is None:
+            return []
+        return [datetime.fromtimestamp(epoca, timezone.utc).strftime("%Y-%m-%d") for epoca in resultado["expirationDates"]]
+
+    def cadena(self, ticker, vencimiento):
+        resultado = self._resultado(ticker, vencimiento)
+        opciones = resultado["options"] if resultado else []
+        puts = pd.DataFrame(opciones[0]["puts"] if opciones else [])
+        return normalizar_cadena(puts, vencimiento, self.nombre)
+
+
+def arrancar_servidor(args):
+    """Lanza el servidor simulado en un puerto libre; devuelve (proceso, URL base)."""
+    comando = [sys.executable, SERVIDOR, "--puerto", "0", "--latencia-ms", str(args.latencia_ms),
+               "--jitter-ms", str(args.jitter_ms), "--tasa-errores", str(args.tasa_errores),
+               "--tasa-429", str(args.tasa_429), "--retry-after", str(args.retry_after), "--semilla", str(args.semilla)]
+    if args.archivo:
+        comando += ["--archivo", os.path.abspath(args.archivo)]
+    proceso = subprocess.Popen(comando, stdout=subprocess.PIPE, text=True)
+    linea = proceso.stdout.readline().strip()
+    if not linea.startswith("Servidor simulado en "):
+        proceso.kill()
+        raise RuntimeError(f"No se pudo arrancar el servidor simulado: {linea or 'sin salida'}")
+    return proceso, linea[len("Servidor simulado en "):]
+
+
+def pico_memoria_mb():
+    """Pico de memoria residente del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def ejecutar_prueba(url, tickers, directorio):
+    """Ejecuta el análisis completo en `directorio` contra el servidor de `url` y devuelve las medidas."""
+    os.makedirs(directorio, exist_ok=True)
+    os.chdir(directorio)
+    os.environ["TICKERS"] = ",".join(tickers)
+    os.environ["FORCE_DISCORD_NOTIFICATION"] = "true"
+    analizar_opciones.DISCORD_WEBHOOK_URL = f"{url}/api/webhooks/0/prueba-carga"
+    proveedores = [ProveedorYahooSimulado(url), ProveedorFinnhub(api_key="prueba-carga", url=url)]
+
+    # La salida del análisis (una línea por oportunidad) va a un fichero y no a la consola
+    memoria_inicial = pico_memoria_mb()
+    with open("ejecucion.log", "w") as registro, contextlib.redirect_stdout(registro):
+        inicio = time.perf_counter()
+        analizar_opciones.analizar_opciones(proveedores=proveedores)
+        segundos = time.perf_counter() - inicio
+
+    with open(analizar_opciones.ruta_informe(METRICAS_RUTA)) as f:
+        metricas = json.load(f)
+    return {
+        "segundos_totales": round(segundos, 3),
+        "tickers_por_segundo": round(len(tickers) / segundos, 2) if segundos > 0 else None,
+        "memoria": {"rss_inicial_mb": memoria_inicial, "pico_rss_mb": pico_memoria_mb()},
+        "cliente_http": metricas.get("http"),
+        "incompletos": (metricas.get("plazos") or {}).get("estados"),
+        "archivo": metricas.get("archivo"),
+        "alertas": metricas.get("alertas"),
+        "etapas": metricas.get("etapas")
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del análisis completo contra el servidor simulado.")
+    parser.add_argument("--tickers", type=int, default=300, help="Número de tickers sintéticos (por defecto: 300).")
+    parser.add_argument("--lista", help="Tickers separados por comas (en lugar de --tickers; p. ej. los de --archivo).")
+    parser.add_argument("--archivo", metavar="RUTA", help="Reproduce las instantáneas de este archivo histórico.")
+    parser.add_argument("--latencia-ms", type=float, default=SIMULADOR_LATENCIA_MS)
+    parser.add_argument("--jitter-ms", type=float, default=SIMULADOR_JITTER_MS)
+    parser.add_argument("--tasa-errores", type=float, default=SIMULADOR_TASA_ERRORES)
+    parser.add_argument("--tasa-429", type=float, default=SIMULADOR_TASA_429)
+    parser.add_argument("--retry-after", type=float, default=SIMULADOR_RETRY_AFTER)
+    parser.add_argument("--semilla", type=int, default=SIMULADOR_SEMILLA)
+    parser.add_argument("--directorio", help="Directorio de trabajo de la ejecución (por defecto: uno temporal).")
+    parser.add_argument("--salida", default="prueba_carga.json")
+    args = parser.parse_args()
+
+    tickers = ([t.strip().upper() for t in args.lista.split(",") if t.strip()] if args.lista
+               else [f"T{indice:04d}" for indice in range(args.tickers)])
+    salida = os.path.abspath(args.salida)
+    directorio = os.path.abspath(args.directorio) if args.directorio else tempfile.mkdtemp(prefix="prueba_carga_")
+    print(f"Prueba de carga: {len(tickers)} tickers en {directorio}")
+
+    proceso, url = arrancar_servidor(args)
+    try:
+        resultado = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "tickers": len(tickers),
+            "directorio": directorio,
+            "registro": os.path.join(directorio, "ejecucion.log"),
+            **ejecutar_prueba(url, tickers, directorio)
+        }
+        estadisticas = requests.get(f"{url}/estadisticas", timeout=10).json()
+        resultado["servidor"] = estadisticas
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+    with open(salida, "w") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"{resultado['tickers']} tickers en {resultado['segundos_totales']:.1f}s "
+          f"({resultado['tickers_por_segundo']} tickers/s), pico de memoria {resultado['memoria']['pico_rss_mb']} MB")
+    for servicio, contador in estadisticas["servicios"].items():
+        print(f"  {servicio}: {contador}")
+    print(f"  concurrencia máxima en el servidor: {estadisticas['concurrencia_maxima']}")
+    print(f"Resultados guardados en {salida}")
@@ -0,0 +1,104 @@
+import heapq
+import itertools
+
+
+def clave_rentabilidad(opcion):
+    """Mayor rentabilidad anual, menor tiempo al vencimiento y mayor diferencia porcentual."""
+    return (-opcion.rentabilidad_anual, opcion.dias_vencimiento, -opcion.diferencia_porcentual)
+
+
+def clave_diferencia(opcion):
+    """Mayor colchón hasta el break-even, luego mayor rentabilidad anual."""
+    return (-opcion.diferencia_porcentual, -opcion.rentabilidad_anual, opcion.dias_vencimiento)
+
+
+def clave_volatilidad(opcion):
+    """Mayor volatilidad implícita, luego mayor rentabilidad anual."""
+    return (-opcion.volatilidad_implícita, -opcion.rentabilidad_anual, opcion.dias_vencimiento)
+
+
+def clave_delta(opcion):
+    """Menor delta en valor absoluto (menos probabilidad de asignación), luego mayor rentabilidad anual."""
+    return (abs(opcion.delta), -opcion.rentabilidad_anual, opcion.dias_vencimiento)
+
+
+def clave_probabilidad(opcion):
+    """Mayor probabilidad de terminar por encima del break-even, luego mayor rentabilidad anual."""
+    return (-opcion.prob_beneficio, -opcion.rentabilidad_anual, opcion.dias_vencimiento)
+
+
+# Criterios de orden disponibles (menor clave = mejor contrato)
+CLAVES_ORDEN = {
+    "rentabilidad": clave_rentabilidad,
+    "diferencia": clave_diferencia,
+    "volatilidad": clave_volatilidad,
+    "delta": clave_delta,
+    "probabilidad": clave_probabilidad
+}
+
+
+class _Entrada:
+    """Elemento del heap; el peor contrato queda en la cima para poder sustituirlo en O(log K)."""
+    __slots__ = ("clave", "orden", "opcion")
+
+    def __init__(self, clave, orden, opcion):
+        self.clave = clave
+        self.orden = orden
+        self.opcion = opcion
+
+    def __lt__(self, otra):
+        # A igual clave es peor el que llegó después, igual que con un sort estable
+        return (self.clave, self.orden) > (otra.clave, otra.orden)
+
+
+class RankingTopK:
+    """Ranking incremental de los K mejores contratos por ticker y, opcionalmente, global.
+
+    Los contratos se añaden uno a uno con agregar(); solo se conservan los que cumplen
+    `predicado` (p. ej. las reglas de alerta) y, de ellos, los `top_por_ticker` mejores de cada
+    ticker según `clave`. El coste es O(n log K) y la memoria O(K) por ticker, y la clasificación
+    se puede consultar en cualquier momento del análisis.
+    """
+
+    def __init__(self, top_por_ticker, top_global=None, clave=clave_rentabilidad, predicado=None):
+        self.top_por_ticker = top_por_ticker
+        self.top_global = top_global
+        self.clave = CLAVES_ORDEN[clave] if isinstance(clave, str) else clave
+        self.predicado = predicado
+        self._heaps = {}
+        self._heap_global = []
+        self._contador = itertools.count()
+
+    @staticmethod
+    def _insertar(heap, tope, entrada):
+        if tope is None or tope <= 0:
+            return
+        if len(heap) < tope:
+            heapq.heappush(heap, entrada)
+        elif heap[0] < entrada:
+            heapq.heapreplace(heap, entrada)
+
+    def agregar(self, opcion):
+        """Añade un contrato; devuelve False si no cumple el predicado."""
+        if self.predicado is not None and not self.predicado(opcion):
+            return False
+        entrada = _Entrada(self.clave(opcion), next(self._contador), opcion)
+        self._insertar(self._heaps.setdefault(opcion.ticker, []), self.top_por_ticker, entrada)
+        self._insertar(self._heap_global, self.top_global, entrada)
+        return True
+
+    def agregar_varias(self, opciones):
+        for opcion in opciones:
+            self.agregar(opcion)
+
+    @staticmethod
+    def _ordenar(heap):
+        return [entrada.opcion for entrada in sorted(heap, key=lambda e: (e.clave, e.orden))]
+
+    def mejores(self, ticker):
+        """Mejores contratos actuales de un ticker, del mejor al peor."""
+        return self._ordenar(self._heaps.get(ticker, []))
+
+    def mejores_globales(self):
+        """Mejores contratos actuales de todos los tickers (vacío si no hay top global)."""
+        return self._ordenar(self._heap_global)
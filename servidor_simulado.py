@@ -0,0 +1,340 @@
+"""Servidor HTTP local que sustituye a Yahoo, Finnhub y Discord en las pruebas de carga.
+
+Responde con el mismo formato JSON que los servicios reales:
+
+    GET  /v7/finance/options/TICKER[?date=EPOCH]        cadena de opciones de Yahoo (API v7)
+    GET  /api/v1/stock/option-chain?symbol=TICKER       cadena de opciones de Finnhub
+    POST /api/webhooks/ID/TOKEN                         webhook de Discord (cuenta los mensajes)
+    GET  /estadisticas                                  contadores por servicio, en JSON
+
+Las cadenas salen del ProveedorSintetico (deterministas por ticker y vencimiento) o, con
+--archivo, de la última instantánea de cada ticker en el archivo histórico, con los vencimientos
+desplazados para conservar los días al vencimiento que tenían al capturarse. Se pueden inyectar
+latencia, errores 503 y respuestas 429 con Retry-After (retry_after en el cuerpo para Discord);
+la semilla hace que la secuencia de fallos sea reproducible.
+
+    python servidor_simulado.py --puerto 8765 --latencia-ms 80 --tasa-errores 0.02 --tasa-429 0.05
+"""
+import argparse
+import calendar
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from archivo_cadenas import ARCHIVO_RUTA, ArchivoCadenas
+from contratos import a_dias, desde_dias
+from proveedores import COLUMNAS_CADENA, Proveedor, ProveedorSintetico, cadena_vacia
+
+# Configuración de los fallos inyectados (ajustable por variables de entorno o argumentos)
+SIMULADOR_LATENCIA_MS = float(os.getenv("SIMULADOR_LATENCIA_MS", "0"))
+SIMULADOR_JITTER_MS = float(os.getenv("SIMULADOR_JITTER_MS", "0"))
+SIMULADOR_TASA_ERRORES = float(os.getenv("SIMULADOR_TASA_ERRORES", "0"))
+SIMULADOR_TASA_429 = float(os.getenv("SIMULADOR_TASA_429", "0"))
+SIMULADOR_RETRY_AFTER = float(os.getenv("SIMULADOR_RETRY_AFTER", "1"))
+SIMULADOR_SEMILLA = int(os.getenv("SIMULADOR_SEMILLA", "7"))
+
+
+class ProveedorArchivo(Proveedor):
+    """Reproduce la última instantánea archivada de cada ticker como si se hubiera capturado hoy.
+
+    El archivo no guarda el rango de 52 semanas: se usa ±25 % del precio del subyacente.
+    """
+
+    nombre = "Archivo"
+    cacheable = False
+
+    def __init__(self, ruta=ARCHIVO_RUTA, hoy=None):
+        self.archivo = ArchivoCadenas(ruta)
+        self.hoy = a_dias(hoy or date.today())
+        self._instantaneas = {}
+        self._lock = threading.Lock()
+
+    def _instantanea(self, ticker):
+        with self._lock:
+            if ticker in self._instantaneas:
+                return self._instantaneas[ticker]
+        datos = self.archivo.consultar(ticker)
+        if datos.empty:
+            instantanea = (None, cadena_vacia())
+        else:
+            datos = datos[datos["capturado"] == datos["capturado"].max()]
+            vencimientos = {dias: desde_dias(self.hoy + int(dias)).isoformat() for dias in datos["dias_vencimiento"].unique()}
+            cadena = pd.DataFrame({
+                "strike": datos["strike"].astype(float).to_numpy(),
+                "lastPrice": datos["lastPrice"].astype(float).to_numpy(),
+                "bid": datos["bid"].astype(float).to_numpy(),
+                "expirationDate": datos["dias_vencimiento"].map(vencimientos).to_numpy(),
+                "volume": datos["volume"].to_numpy(),
+                "impliedVolatility": datos["impliedVolatility"].astype(float).to_numpy(),
+                "openInterest": datos["openInterest"].to_numpy(),
+                "source": self.nombre
+            }, columns=COLUMNAS_CADENA)
+            instantanea = (float(datos["precio_subyacente"].iloc[0]), cadena)
+        with self._lock:
+            self._instantaneas[ticker] = instantanea
+        return instantanea
+
+    def cotizacion(self, ticker):
+        precio, _ = self._instantanea(ticker)
+        if precio is None:
+            raise ValueError(f"El archivo no tiene instantáneas de {ticker}")
+        return {"precio": precio, "minimo_52_semanas": round(precio * 0.75, 2), "maximo_52_semanas": round(precio * 1.25, 2)}
+
+    def vencimientos(self, ticker):
+        return sorted(set(self._instantanea(ticker)[1]["expirationDate"]))
+
+    def cadena(self, ticker, vencimiento):
+        cadena = self._instantanea(ticker)[1]
+        return cadena[cadena["expirationDate"] == vencimiento].reset_index(drop=True)
+
+
+def _epoca(vencimiento):
+    """'YYYY-MM-DD' a segundos desde la época (medianoche UTC), como los vencimientos de Yahoo."""
+    return calendar.timegm(datetime.strptime(vencimiento, "%Y-%m-%d").timetuple())
+
+
+def _puts(cadena, ticker, nombres):
+    """Filas de la cadena como diccionarios con los nombres de campo del servicio (NaN como null)."""
+    filas = []
+    for strike, ultimo, bid, vencimiento, volumen, iv, interes in zip(
+            cadena["strike"], cadena["lastPrice"], cadena["bid"], cadena["expirationDate"], cadena["volume"],
+            cadena["impliedVolatility"], cadena["openInterest"]):
+        valores = {
+            "contrato": f"{ticker}{vencimiento.replace('-', '')[2:]}P{int(round(strike * 1000)):08d}",
+            "strike": strike, "ultimo": ultimo, "bid": bid, "vencimiento": vencimiento,
+            "volumen": int(volumen) if volumen == volumen else None,
+            "iv": iv / 100,
+            "interes": int(interes) if interes == interes else None
+        }
+        filas.append({nombre: (None if valores[clave] != valores[clave] else valores[clave])
+                      for clave, nombre in nombres.items()})
+    return filas
+
+
+def respuesta_yahoo(proveedor, ticker, fecha=None):
+    """Cuerpo de /v7/finance/options: vencimientos, cotización y PUTs de un vencimiento (el primero si no se indica)."""
+    vencimientos = proveedor.vencimientos(ticker)
+    if not vencimientos:
+        return {"optionChain": {"result": [], "error": None}}
+    cotizacion = proveedor.cotizacion(ticker)
+    por_epoca = {_epoca(vencimiento): vencimiento for vencimiento in vencimientos}
+    elegido = por_epoca.get(fecha) if fecha is not None else vencimientos[0]
+    opciones = []
+    if elegido is not None:
+        puts = _puts(proveedor.cadena(ticker, elegido), ticker, {
+            "contrato": "contractSymbol", "strike": "strike", "ultimo": "lastPrice", "bid": "bid",
+            "volumen": "volume", "iv": "impliedVolatility", "interes": "openInterest"
+        })
+        for put in puts:
+            put["expiration"] = _epoca(elegido)
+        opciones.append({"expirationDate": _epoca(elegido), "hasMiniOptions": False, "calls": [], "puts": puts})
+    return {"optionChain": {"result": [{
+        "underlyingSymbol": ticker,
+        "expirationDates": list(por_epoca),
+        "quote": {"symbol": ticker, "regularMarketPrice": cotizacion["precio"],
+                  "fiftyTwoWeekLow": cotizacion["minimo_52_semanas"], "fiftyTwoWeekHigh": cotizacion["maximo_52_semanas"]},
+        "options": opciones
+    }], "error": None}}
+
+
+def respuesta_finnhub(proveedor, ticker):
+    """Cuerpo de /api/v1/stock/option-chain: todos los vencimientos del ticker en una respuesta."""
+    datos = []
+    for vencimiento in proveedor.vencimientos(ticker):
+        puts = _puts(proveedor.cadena(ticker, vencimiento), ticker, {
+            "contrato": "contractName", "strike": "strike", "ultimo": "last", "bid": "bid", "vencimiento": "expirationDate",
+            "volumen": "volume", "iv": "impliedVolatility", "interes": "openInterest"
+        })
+        datos.append({"expirationDate": vencimiento, "options": {"CALL": [], "PUT": puts}})
+    return {"code": ticker, "exchange": "US", "data": datos}
+
+
+class Fallos:
+    """Latencia y fallos inyectados en cada respuesta, con una secuencia reproducible por semilla."""
+
+    def __init__(self, latencia_ms=SIMULADOR_LATENCIA_MS, jitter_ms=SIMULADOR_JITTER_MS, tasa_errores=SIMULADOR_TASA_ERRORES,
+                 tasa_429=SIMULADOR_TASA_429, retry_after=SIMULADOR_RETRY_AFTER, semilla=SIMULADOR_SEMILLA):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.tasa_errores = tasa_errores
+        self.tasa_429 = tasa_429
+        self.retry_after = retry_after
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def sortear(self):
+        """Devuelve (segundos de latencia, código de fallo o None)."""
+        with self._lock:
+            latencia = (self.latencia_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+            sorteo = self._rng.random()
+        if sorteo < self.tasa_429:
+            return latencia, 429
+        if sorteo < self.tasa_429 + self.tasa_errores:
+            return latencia, 503
+        return latencia, None
+
+    def configuracion(self):
+        return {"latencia_ms": self.latencia_ms, "jitter_ms": self.jitter_ms, "tasa_errores": self.tasa_errores,
+                "tasa_429": self.tasa_429, "retry_after": self.retry_after}
+
+
+class Estadisticas:
+    """Contadores por servicio y concurrencia máxima atendida."""
+
+    def __init__(self):
+        self.servicios = {}
+        self.en_curso = 0
+        self.concurrencia_maxima = 0
+        self._lock = threading.Lock()
+
+    def empezar(self):
+        with self._lock:
+            self.en_curso += 1
+            self.concurrencia_maxima = max(self.concurrencia_maxima, self.en_curso)
+
+    def terminar(self, servicio, **incrementos):
+        with self._lock:
+            self.en_curso -= 1
+            contador = self.servicios.setdefault(servicio, {
+                "peticiones": 0, "respuestas_429": 0, "errores_inyectados": 0, "errores": 0, "bytes": 0, "mensajes": 0
+            })
+            contador["peticiones"] += 1
+            for clave, valor in incrementos.items():
+                contador[clave] += valor
+
+    def resumen(self):
+        with self._lock:
+            return {"servicios": {servicio: dict(contador) for servicio, contador in self.servicios.items()},
+                    "concurrencia_maxima": self.concurrencia_maxima}
+
+
+class ManejadorSimulado(BaseHTTPRequestHandler):
+    """Atiende una petición: identifica el servicio, aplica los fallos y responde como el servicio real."""
+
+    # HTTP/1.1 para que el cliente reutilice las conexiones como con los servicios reales
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, codigo, cuerpo=None, cabeceras=None):
+        datos = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else b""
+        self.send_response(codigo)
+        if cuerpo is not None:
+            self.send_header("Content-Type", "application/json")
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+        return len(datos)
+
+    def _servicio(self, ruta):
+        if ruta.startswith("/v7/finance/options/"):
+            return "yahoo"
+        if ruta == "/api/v1/stock/option-chain":
+            return "finnhub"
+        if ruta.startswith("/api/webhooks/"):
+            return "discord"
+        return "desconocido"
+
+    def _atender(self, metodo):
+        url = urlparse(self.path)
+        if metodo == "GET" and url.path == "/estadisticas":
+            self._responder(200, dict(self.server.estadisticas.resumen(), fallos=self.server.fallos.configuracion()))
+            return
+        servicio = self._servicio(url.path)
+        longitud = int(self.headers.get("Content-Length") or 0)
+        cuerpo = self.rfile.read(longitud) if longitud else b""
+        self.server.estadisticas.empezar()
+        incrementos = {}
+        try:
+            latencia, fallo = self.server.fallos.sortear()
+            if latencia > 0:
+                time.sleep(latencia)
+            if servicio == "desconocido" or (metodo == "POST") != (servicio == "discord"):
+                incrementos["bytes"] = self._responder(404, {"error": f"Ruta no simulada: {metodo} {url.path}"})
+            elif fallo == 429:
+                incrementos["respuestas_429"] = 1
+                retry_after = self.server.fallos.retry_after
+                if servicio == "discord":
+                    incrementos["bytes"] = self._responder(429, {"message": "You are being rate limited.",
+                                                                 "retry_after": retry_after, "global": False})
+                else:
+                    incrementos["bytes"] = self._responder(429, {"error": "API limit reached."},
+                                                           {"Retry-After": f"{retry_after:g}"})
+            elif fallo is not None:
+                incrementos["errores_inyectados"] = 1
+                incrementos["bytes"] = self._responder(fallo, {"error": "Service Unavailable"})
+            else:
+                incrementos["bytes"] = self._responder(*self._contenido(servicio, url, cuerpo))
+                if servicio == "discord":
+                    incrementos["mensajes"] = 1
+        except Exception as e:
+            incrementos["errores"] = 1
+            incrementos["bytes"] = self._responder(500, {"error": str(e)})
+        finally:
+            self.server.estadisticas.terminar(servicio, **incrementos)
+
+    def _contenido(self, servicio, url, cuerpo):
+        """(código, cuerpo JSON) de una respuesta correcta del servicio."""
+        parametros = parse_qs(url.query)
+        proveedor = self.server.proveedor
+        if servicio == "yahoo":
+            ticker = url.path.rsplit("/", 1)[-1].upper()
+            fecha = int(parametros["date"][0]) if "date" in parametros else None
+            return 200, respuesta_yahoo(proveedor, ticker, fecha)
+        if servicio == "finnhub":
+            return 200, respuesta_finnhub(proveedor, parametros.get("symbol", [""])[0].upper())
+        # Discord responde 204 sin cuerpo a los webhooks sin ?wait=true
+        return 204, None
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+
+def crear_servidor(host="127.0.0.1", puerto=8765, proveedor=None, fallos=None):
+    """Servidor sin arrancar (con puerto=0 elige uno libre, en server_address)."""
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorSimulado)
+    servidor.daemon_threads = True
+    servidor.proveedor = proveedor or ProveedorSintetico()
+    servidor.fallos = fallos or Fallos()
+    servidor.estadisticas = Estadisticas()
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que simula Yahoo, Finnhub y el webhook de Discord.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto (0 elige uno libre; por defecto: 8765).")
+    parser.add_argument("--archivo", metavar="RUTA", help="Reproduce las instantáneas de este archivo histórico en lugar de datos sintéticos.")
+    parser.add_argument("--latencia-ms", type=float, default=SIMULADOR_LATENCIA_MS, help="Latencia fija de cada respuesta.")
+    parser.add_argument("--jitter-ms", type=float, default=SIMULADOR_JITTER_MS, help="Latencia adicional aleatoria, entre 0 y este valor.")
+    parser.add_argument("--tasa-errores", type=float, default=SIMULADOR_TASA_ERRORES, help="Fracción de respuestas 503.")
+    parser.add_argument("--tasa-429", type=float, default=SIMULADOR_TASA_429, help="Fracción de respuestas 429.")
+    parser.add_argument("--retry-after", type=float, default=SIMULADOR_RETRY_AFTER, help="Segundos de espera indicados en los 429.")
+    parser.add_argument("--semilla", type=int, default=SIMULADOR_SEMILLA)
+    args = parser.parse_args()
+
+    proveedor = ProveedorArchivo(args.archivo) if args.archivo else ProveedorSintetico()
+    fallos = Fallos(args.latencia_ms, args.jitter_ms, args.tasa_errores, args.tasa_429, args.retry_after, args.semilla)
+    servidor = crear_servidor(args.host, args.puerto, proveedor, fallos)
+    host, puerto = servidor.server_address[:2]
+    # La primera línea indica la URL base (prueba_carga.py la lee para conocer el puerto elegido)
+    print(f"Servidor simulado en http://{host}:{puerto}", flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
@@ -0,0 +1,137 @@
+import sqlite3
+import time
+
+import pytest
+
+import alertas
+from alertas import DISCORD_MAX_CARACTERES, EstadoAlertas, NotificadorDiscord, agrupar_mensajes
+from contratos import Contrato, a_dias
+
+VENCIMIENTO = "2099-01-16"
+
+
+def contrato(strike, rentabilidad=30.0, ticker="AAA"):
+    return Contrato(ticker=ticker, strike=strike, lastPrice=1.0, bid=1.0, vencimiento=a_dias(VENCIMIENTO),
+                    dias_vencimiento=30, rentabilidad_diaria=0.1, rentabilidad_anual=rentabilidad, break_even=strike - 1,
+                    diferencia_porcentual=10.0, volatilidad_implícita=40.0, volumen=10, open_interest=100, delta=-0.2,
+                    theta=-0.01, prob_beneficio=0.8, source="Yahoo Finance")
+
+
+class Respuesta:
+    def __init__(self, estado):
+        self.status_code = estado
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class ClienteFalso:
+    """Registra los envíos y falla a partir del envío número `fallar_en` (1 = el primero)."""
+
+    def __init__(self, fallar_en=None):
+        self.envios = []
+        self.fallar_en = fallar_en
+
+    def post(self, url, **kwargs):
+        self.envios.append(kwargs)
+        return Respuesta(503 if self.fallar_en is not None and len(self.envios) >= self.fallar_en else 204)
+
+
+@pytest.fixture
+def estado(tmp_path):
+    estado = EstadoAlertas(str(tmp_path / "alertas.sqlite"), umbral=1.0, repetir_horas=24)
+    yield estado
+    estado.cerrar()
+
+
+def notificar(monkeypatch, estado, cliente, pendientes, max_mensajes=3):
+    monkeypatch.setattr(alertas, "obtener_cliente", lambda: cliente)
+    notificador = NotificadorDiscord("http://discord.invalid/webhook", estado, lote_segundos=0, max_mensajes=max_mensajes)
+    notificador.encolar("principal", "Perfil principal", pendientes)
+    assert notificador.vaciar(timeout=10)
+    return notificador
+
+
+def test_agrupar_mensajes_respeta_el_limite_y_repite_la_cabecera():
+    lineas = [f"{indice:03d} " + "x" * 296 for indice in range(20)]
+    mensajes = agrupar_mensajes([("", ["Cabecera general"]), ("Perfil A", lineas)])
+
+    assert len(mensajes) == 4
+    assert all(len(mensaje) <= DISCORD_MAX_CARACTERES for mensaje in mensajes)
+    assert mensajes[0].startswith("Cabecera general\nPerfil A\n000 ")
+    assert all(mensaje.startswith("Perfil A\n") for mensaje in mensajes[1:])
+    contenido = [linea for mensaje in mensajes for linea in mensaje.split("\n") if linea.endswith("x")]
+    assert contenido == lineas
+
+
+def test_agrupar_mensajes_recorta_las_lineas_demasiado_largas():
+    mensajes = agrupar_mensajes([("Perfil", ["y" * 5000])], limite=100)
+    assert mensajes == ["Perfil\n" + "y" * 92]
+
+
+def test_adjunto_si_superan_max_mensajes(monkeypatch, estado):
+    cliente = ClienteFalso()
+    pendientes = [(contrato(float(strike)), "nuevo") for strike in range(1, 101)]
+    notificador = notificar(monkeypatch, estado, cliente, pendientes, max_mensajes=3)
+
+    assert len(cliente.envios) == 1
+    assert "files" in cliente.envios[0]
+    assert cliente.envios[0]["files"]["file"][1].decode("utf-8").count("\n") == 100
+    assert notificador.resumen() == {"contratos_enviados": 100, "mensajes": 1, "errores": 0}
+    assert estado.pendientes("principal", [opcion for opcion, _ in pendientes]) == []
+
+
+def test_un_envio_fallido_a_medias_solo_repite_lo_no_entregado(monkeypatch, estado):
+    cliente = ClienteFalso(fallar_en=3)
+    pendientes = [(contrato(float(strike)), "nuevo") for strike in range(1, 81)]
+    notificador = notificar(monkeypatch, estado, cliente, pendientes, max_mensajes=10)
+
+    entregados = [linea for envio in cliente.envios[:2] for linea in envio["json"]["content"].split("\n") if "[nuevo]" in linea]
+    assert len(cliente.envios) == 3
+    assert notificador.resumen() == {"contratos_enviados": len(entregados), "mensajes": 2, "errores": 1}
+    repetir = estado.pendientes("principal", [opcion for opcion, _ in pendientes])
+    assert 0 < len(repetir) < len(pendientes)
+    assert len(repetir) == len(pendientes) - len(entregados)
+    assert [opcion.strike for opcion, _ in repetir] == [float(strike) for strike in range(len(entregados) + 1, 81)]
+
+
+def test_pendientes_por_umbral_y_repeticion(estado):
+    ahora = time.time()
+    assert estado.pendientes("principal", [contrato(100.0)], ahora) == [(contrato(100.0), "nuevo")]
+    estado.registrar("principal", [contrato(100.0, rentabilidad=30.0)], ahora)
+
+    assert estado.pendientes("principal", [contrato(100.0, rentabilidad=30.5)], ahora + 60) == []
+    assert estado.pendientes("principal", [contrato(100.0, rentabilidad=31.5)], ahora + 60) == [
+        (contrato(100.0, rentabilidad=31.5), "antes 30.00%")]
+    # Otro perfil lleva su propio estado
+    assert estado.pendientes("agresivo", [contrato(100.0)], ahora + 60)[0][1] == "nuevo"
+
+    recordatorio = estado.pendientes("principal", [contrato(100.0)], ahora + 25 * 3600)
+    assert [motivo for _, motivo in recordatorio] == ["recordatorio, avisado hace 25h"]
+    estado.repetir_horas = 0
+    assert estado.pendientes("principal", [contrato(100.0)], ahora + 1000 * 3600) == []
+
+
+def test_migracion_del_esquema_anterior_a_los_spreads(tmp_path):
+    ruta = str(tmp_path / "alertas.sqlite")
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("CREATE TABLE avisos (perfil TEXT NOT NULL, ticker TEXT NOT NULL, vencimiento TEXT NOT NULL,"
+                     " strike REAL NOT NULL, rentabilidad REAL NOT NULL, avisado REAL NOT NULL,"
+                     " PRIMARY KEY (perfil, ticker, vencimiento, strike))")
+    ahora = time.time()
+    conexion.executemany("INSERT INTO avisos VALUES (?, ?, ?, ?, ?, ?)",
+                         [("principal", "AAA", VENCIMIENTO, 100.0, 30.0, ahora),
+                          ("principal", "AAA", "2000-01-21", 90.0, 30.0, ahora)])
+    conexion.commit()
+    conexion.close()
+
+    estado = EstadoAlertas(ruta, umbral=1.0, repetir_horas=24)
+    try:
+        # El aviso vigente se conserva como put suelta (strike_largo 0) y el vencido se purga
+        assert estado.resumen() == {"contratos": 1}
+        assert estado.pendientes("principal", [contrato(100.0)], ahora + 60) == []
+        estado.registrar("principal", [contrato(95.0)], ahora)
+        assert estado.resumen() == {"contratos": 2}
+    finally:
+        estado.cerrar()
@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+
+from analitica import TASA_LIBRE_RIESGO, cdf_normal, griegas_put, precio_put, probabilidad_por_encima, volatilidad_implicita_put
+
+
+def precio_put_exacto(precio, strike, t, volatilidad, tasa=TASA_LIBRE_RIESGO):
+    """Black-Scholes con math.erf, sin el error de la aproximación de cdf_normal."""
+    cdf = np.vectorize(lambda x: 0.5 * (1 + math.erf(x / math.sqrt(2))))
+    d1 = (np.log(precio / strike) + (tasa + 0.5 * volatilidad ** 2) * t) / (volatilidad * np.sqrt(t))
+    d2 = d1 - volatilidad * np.sqrt(t)
+    return strike * np.exp(-tasa * t) * cdf(-d2) - precio * cdf(-d1)
+
+
+def rejilla():
+    precio = 100.0
+    strike, t, volatilidad = (v.ravel() for v in np.meshgrid([60.0, 80.0, 95.0, 100.0, 105.0, 130.0],
+                                                             [7 / 365, 30 / 365, 0.5, 2.0],
+                                                             [0.08, 0.25, 0.6, 1.5]))
+    return precio, strike, t, volatilidad
+
+
+def test_cdf_normal_frente_a_erf():
+    x = np.linspace(-6, 6, 241)
+    exacta = np.array([0.5 * (1 + math.erf(v / math.sqrt(2))) for v in x])
+    assert np.max(np.abs(cdf_normal(x) - exacta)) < 1.5e-7
+
+
+def test_volatilidad_implicita_recupera_la_del_precio():
+    precio, strike, t, volatilidad = rejilla()
+    prima = precio_put(precio, strike, t, volatilidad)
+    # Sin valor temporal apreciable la prima no determina la volatilidad con la tolerancia de precio
+    medible = prima - np.maximum(strike * np.exp(-TASA_LIBRE_RIESGO * t) - precio, 0.0) > 1e-3
+    implicita = volatilidad_implicita_put(prima[medible], precio, strike[medible], t[medible])
+    assert np.all(np.isfinite(implicita))
+    np.testing.assert_allclose(precio_put(precio, strike[medible], t[medible], implicita), prima[medible], atol=1e-5)
+    np.testing.assert_allclose(implicita, volatilidad[medible], rtol=1e-3)
+
+
+def test_volatilidad_implicita_fuera_de_los_limites_de_arbitraje():
+    # Por debajo del intrínseco descontado, por encima del strike descontado, prima nula y t nulo
+    prima = np.array([10.0, 120.0, 0.0, 1.0])
+    strike = np.array([120.0, 110.0, 100.0, 100.0])
+    t = np.array([0.25, 0.25, 0.25, 0.0])
+    assert np.all(np.isnan(volatilidad_implicita_put(prima, 100.0, strike, t)))
+
+
+def test_griegas_frente_a_diferencias_finitas():
+    precio, strike, t, volatilidad = rejilla()
+    delta, theta, vega = griegas_put(precio, strike, t, volatilidad)
+    h = 1e-6
+    exacto = lambda **cambios: precio_put_exacto(**{"precio": precio, "strike": strike, "t": t, "volatilidad": volatilidad, **cambios})
+    delta_numerica = (exacto(precio=precio * (1 + h)) - exacto(precio=precio * (1 - h))) / (2 * h * precio)
+    vega_numerica = (exacto(volatilidad=volatilidad * (1 + h)) - exacto(volatilidad=volatilidad * (1 - h))) / (2 * h * volatilidad) / 100
+    theta_numerica = -(exacto(t=t * (1 + h)) - exacto(t=t * (1 - h))) / (2 * h * t) / 365
+    np.testing.assert_allclose(delta, delta_numerica, atol=1e-5)
+    np.testing.assert_allclose(vega, vega_numerica, atol=1e-5)
+    np.testing.assert_allclose(theta, theta_numerica, atol=1e-5)
+    assert np.all((delta <= 0) & (delta >= -1) & (vega >= 0))
+
+
+def test_probabilidad_por_encima():
+    probabilidad = probabilidad_por_encima(100.0, np.array([0.0, 50.0, 100.0, 200.0]), 0.25, 0.3)
+    assert probabilidad[0] == 1.0
+    assert np.all(np.diff(probabilidad) < 0)
+    assert 0.4 < probabilidad[2] < 0.6
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_opciones
+from cache_opciones import CacheOpciones, SinDatosEnCache
+from proveedores import normalizar_cadena
+
+
+class Reloj:
+    def __init__(self, inicio=1_000_000.0):
+        self.ahora = inicio
+
+    def time(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cache_opciones, "time", reloj)
+    return reloj
+
+
+def abrir(tmp_path, **opciones):
+    return CacheOpciones(str(tmp_path / "cache.sqlite"), **opciones)
+
+
+def test_acierto_dentro_del_ttl_y_fallo_despues(tmp_path, reloj):
+    cache = abrir(tmp_path, ttl=900)
+    cache.guardar("AAA", "subyacente", "", {"precio": 100.0})
+
+    reloj.ahora += 899
+    assert cache.obtener("AAA", "subyacente") == {"precio": 100.0}
+    reloj.ahora += 2
+    assert cache.obtener("AAA", "subyacente") is None
+    resumen = cache.resumen()
+    assert (resumen["entradas"], resumen["aciertos"], resumen["fallos"]) == (1, 1, 1)
+
+
+def test_recuperar_solo_carga_en_un_fallo(tmp_path, reloj):
+    cache = abrir(tmp_path, ttl=900)
+    cargas = []
+    cargar = lambda: cargas.append(1) or ["2026-11-20"]
+    assert cache.recuperar("AAA", "Yahoo Finance", "vencimientos", cargar) == ["2026-11-20"]
+    assert cache.recuperar("AAA", "Yahoo Finance", "vencimientos", cargar) == ["2026-11-20"]
+    reloj.ahora += 901
+    cache.recuperar("AAA", "Yahoo Finance", "vencimientos", cargar)
+    assert len(cargas) == 2
+
+
+def test_expulsa_las_menos_usadas_al_superar_el_tamano(tmp_path, reloj):
+    valor = {"datos": list(range(200))}
+    cache = abrir(tmp_path, max_bytes=10 ** 9)
+    cache.guardar("MEDIDA", "x", "", valor)
+    tamano = cache.resumen()["bytes"]
+    cache.cerrar()
+
+    cache = CacheOpciones(str(tmp_path / "otra.sqlite"), max_bytes=3 * tamano)
+    for ticker in ("A", "B", "C"):
+        reloj.ahora += 1
+        cache.guardar(ticker, "x", "", valor)
+    reloj.ahora += 1
+    assert cache.obtener("A", "x") == valor  # A pasa a ser la más usada recientemente
+    reloj.ahora += 1
+    cache.guardar("D", "x", "", valor)
+    assert sorted(ticker for ticker, *_ in cache.listar()) == ["A", "C", "D"]
+    reloj.ahora += 1
+    cache.guardar("E", "x", "", valor)
+    assert sorted(ticker for ticker, *_ in cache.listar()) == ["A", "D", "E"]
+    assert cache.resumen()["bytes"] <= 3 * tamano
+
+
+def test_dataframe_conserva_tipos_y_nan(tmp_path, reloj):
+    puts = pd.DataFrame({"strike": [90.0, 95.0, 100.0], "bid": [1.0, np.nan, 2.5], "lastPrice": [1.1, 1.5, np.nan],
+                         "volume": [10.0, 0.0, 5.0], "openInterest": [1.0, 2.0, 3.0], "impliedVolatility": [0.3, 0.4, 0.5]})
+    cadena = normalizar_cadena(puts, "2026-11-20", "Yahoo Finance")
+    cache = abrir(tmp_path)
+    cache.guardar("AAA", "Yahoo Finance", "2026-11-20", cadena)
+
+    leida = cache.obtener("AAA", "Yahoo Finance", "2026-11-20")
+    pd.testing.assert_frame_equal(leida, cadena)
+    assert leida["expirationDate"].tolist() == ["2026-11-20"] * 3
+
+
+def test_offline_ignora_el_ttl_y_falla_si_no_hay_datos(tmp_path, reloj):
+    cache = abrir(tmp_path, ttl=900)
+    cache.guardar("AAA", "subyacente", "", {"precio": 100.0})
+    cache.cerrar()
+
+    offline = abrir(tmp_path, ttl=900, offline=True)
+    reloj.ahora += 10 * 86400
+    assert offline.recuperar("AAA", "subyacente", "", lambda: pytest.fail("offline no debe cargar")) == {"precio": 100.0}
+    with pytest.raises(SinDatosEnCache, match="BBB"):
+        offline.recuperar("BBB", "Yahoo Finance", "2026-11-20", lambda: pytest.fail("offline no debe cargar"))
+    # En offline no se escribe nada
+    offline.guardar("BBB", "subyacente", "", {"precio": 1.0})
+    assert offline.obtener("BBB", "subyacente") is None
@@ -0,0 +1,137 @@
+import json
+
+import pytest
+import requests
+
+import cliente_http
+from cliente_http import ClienteHTTP, LimitadorTokens
+
+
+class Reloj:
+    """Sustituye a time en cliente_http: sleep() avanza el reloj en lugar de dormir."""
+
+    def __init__(self):
+        self.ahora = 0.0
+        self.esperas = []
+
+    def monotonic(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+class SesionFalsa:
+    """Devuelve (o lanza) en orden los elementos de `guion`."""
+
+    def __init__(self, guion):
+        self.guion = list(guion)
+        self.peticiones = []
+
+    def request(self, metodo, url, **kwargs):
+        self.peticiones.append((metodo, url))
+        elemento = self.guion.pop(0)
+        if isinstance(elemento, Exception):
+            raise elemento
+        return elemento
+
+
+def respuesta(estado, cuerpo=None, **cabeceras):
+    r = requests.Response()
+    r.status_code = estado
+    r._content = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else b""
+    r.headers.update(cabeceras)
+    return r
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cliente_http, "time", reloj)
+    # Sin jitter, para que el backoff sea exacto
+    monkeypatch.setattr(cliente_http.random, "uniform", lambda a, b: 0.0)
+    return reloj
+
+
+def cliente(guion, limites=None, **opciones):
+    opciones = {"max_reintentos": 3, "backoff_base": 1.0, "max_espera": 60, **opciones}
+    cliente = ClienteHTTP(limites=limites or {}, **opciones)
+    cliente.sesion = SesionFalsa(guion)
+    return cliente
+
+
+def test_reintenta_5xx_con_backoff_exponencial(reloj):
+    c = cliente([respuesta(503), respuesta(502), respuesta(200, {"ok": True})])
+    assert c.get("https://api.ejemplo.com/x").json() == {"ok": True}
+    assert reloj.esperas == [1.0, 2.0]
+    contador = c.resumen()["api.ejemplo.com"]
+    assert (contador["peticiones"], contador["reintentos"], contador["segundos_backoff"]) == (3, 2, 3.0)
+
+
+def test_agota_los_reintentos_y_devuelve_la_ultima_respuesta(reloj):
+    c = cliente([respuesta(500)] * 4)
+    assert c.get("https://api.ejemplo.com/x").status_code == 500
+    assert len(c.sesion.peticiones) == 4
+    assert reloj.esperas == [1.0, 2.0, 4.0]
+
+
+def test_no_reintenta_los_demas_codigos(reloj):
+    c = cliente([respuesta(404)])
+    assert c.get("https://api.ejemplo.com/x").status_code == 404
+    assert reloj.esperas == []
+
+
+def test_respeta_retry_after_de_la_cabecera(reloj):
+    c = cliente([respuesta(429, **{"Retry-After": "7"}), respuesta(200)])
+    assert c.get("https://finnhub.io/api/v1/x").status_code == 200
+    assert reloj.esperas == [7.0]
+    assert c.resumen()["finnhub.io"]["respuestas_429"] == 1
+
+
+def test_respeta_retry_after_del_json_de_discord(reloj):
+    c = cliente([respuesta(429, {"message": "You are being rate limited.", "retry_after": 0.5}), respuesta(204)])
+    assert c.post("https://discord.com/api/webhooks/1/x", json={"content": "hola"}).status_code == 204
+    assert reloj.esperas == [0.5]
+
+
+def test_una_espera_mayor_que_max_espera_no_se_reintenta(reloj):
+    c = cliente([respuesta(429, **{"Retry-After": "3600"}), respuesta(200)], max_espera=60)
+    assert c.get("https://api.ejemplo.com/x").status_code == 429
+    assert reloj.esperas == []
+    assert c.resumen()["api.ejemplo.com"]["esperas_excesivas"] == 1
+
+
+def test_el_backoff_propio_se_acota_a_max_espera(reloj):
+    c = cliente([respuesta(503), respuesta(503), respuesta(200)], backoff_base=100, max_espera=5)
+    assert c.get("https://api.ejemplo.com/x").status_code == 200
+    assert reloj.esperas == [5, 5]
+
+
+def test_reintenta_errores_de_conexion(reloj):
+    c = cliente([requests.exceptions.ConnectionError("caída"), requests.exceptions.Timeout("lento"), respuesta(200)])
+    assert c.get("https://api.ejemplo.com/x").status_code == 200
+    assert c.resumen()["api.ejemplo.com"]["errores"] == 2
+
+    c = cliente([requests.exceptions.ConnectionError("caída")] * 4)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        c.get("https://api.ejemplo.com/x")
+
+
+def test_limitador_de_tokens(reloj):
+    limitador = LimitadorTokens(tasa=2, capacidad=3)
+    assert [limitador.adquirir() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limitador.adquirir() == pytest.approx(0.5)
+    # Tras una pausa larga la ráfaga no pasa de la capacidad
+    reloj.ahora += 100
+    assert [limitador.adquirir() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limitador.adquirir() == pytest.approx(0.5)
+
+
+def test_el_limite_se_aplica_por_host_y_subdominio(reloj):
+    c = cliente([respuesta(200)] * 4, limites={"finnhub.io": (1.0, 2)})
+    for _ in range(3):
+        c.get("https://api.finnhub.io/x")
+    c.get("https://api.ejemplo.com/x")
+    assert c.resumen()["api.finnhub.io"]["segundos_espera_limite"] == pytest.approx(1.0)
+    assert c.resumen()["api.ejemplo.com"]["segundos_espera_limite"] == 0.0
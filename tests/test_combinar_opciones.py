@@ -0,0 +1,49 @@
+import pandas as pd
+
+from analizar_opciones import combinar_opciones, fuente_de_campo
+from proveedores import normalizar_cadena
+
+VENCIMIENTO = "2026-11-20"
+
+
+def cadena(source, **columnas):
+    return normalizar_cadena(pd.DataFrame(columnas), VENCIMIENTO, source)
+
+
+def cadenas():
+    yahoo = cadena("Yahoo Finance", strike=[90, 95, 100], bid=[1.0, 0.0, 2.0], lastPrice=[1.1, 1.5, 0.0],
+                   volume=[10, 0, 5], openInterest=[1, 2, 3], impliedVolatility=[0.3, 0.4, 0.0])
+    finnhub = cadena("Finnhub", strike=[95, 100, 105], bid=[1.4, 2.5, 3.0], lastPrice=[1.6, 2.2, 3.1],
+                     volume=[7, 8, 9], openInterest=[4, 5, 6], impliedVolatility=[0.41, 0.5, 0.6])
+    return yahoo, finnhub
+
+
+def test_la_fuente_principal_manda_y_los_huecos_se_rellenan():
+    yahoo, finnhub = cadenas()
+    combinadas = combinar_opciones(yahoo, finnhub)
+
+    # Orden de la fuente principal y, al final, los contratos que solo trae la secundaria
+    assert combinadas["strike"].tolist() == [90.0, 95.0, 100.0, 105.0]
+    # Los valores no nulos de Yahoo se conservan; los 0 se toman de Finnhub
+    assert combinadas["bid"].tolist() == [1.0, 1.4, 2.0, 3.0]
+    assert combinadas["lastPrice"].tolist() == [1.1, 1.5, 2.2, 3.1]
+    assert combinadas["volume"].tolist() == [10.0, 7.0, 5.0, 9.0]
+    assert combinadas["impliedVolatility"].tolist() == [30.0, 40.0, 50.0, 60.0]
+    assert fuente_de_campo(combinadas, "bid").tolist() == ["Yahoo Finance", "Finnhub", "Yahoo Finance", "Finnhub"]
+    assert combinadas["source"].tolist() == ["Yahoo Finance", "Yahoo + Finnhub", "Yahoo + Finnhub", "Finnhub"]
+
+
+def test_prioridad_explicita():
+    yahoo, finnhub = cadenas()
+    combinadas = combinar_opciones(yahoo, finnhub, prioridad=["Finnhub", "Yahoo Finance"])
+
+    assert combinadas.attrs["fuentes"] == ["Finnhub", "Yahoo Finance"]
+    assert combinadas["strike"].tolist() == [95.0, 100.0, 105.0, 90.0]
+    assert combinadas["bid"].tolist() == [1.4, 2.5, 3.0, 1.0]
+    assert fuente_de_campo(combinadas, "bid").tolist() == ["Finnhub", "Finnhub", "Finnhub", "Yahoo Finance"]
+
+
+def test_sin_fuentes_devuelve_cadena_vacia():
+    yahoo, _ = cadenas()
+    assert combinar_opciones(None, yahoo.iloc[0:0]).empty
+    assert combinar_opciones(yahoo)["strike"].tolist() == [90.0, 95.0, 100.0]
@@ -0,0 +1,82 @@
+import json
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from analizar_opciones import aplicar_perfil, filtrar_opciones
+from configuracion import DEFAULT_CONFIG, filtros_envolventes, obtener_configuracion
+from proveedores import ProveedorSintetico
+
+PERFILES = {
+    "conservador": {"MAX_DIAS_VENCIMIENTO": 20, "FILTRO_TIPO_OPCION": "OTM", "MIN_RENTABILIDAD_ANUAL": 15,
+                    "MIN_DIFERENCIA_PORCENTUAL": 8, "MAX_DELTA": 0.3},
+    "agresivo": {"MAX_DIAS_VENCIMIENTO": 60, "FILTRO_TIPO_OPCION": "itm", "MIN_RENTABILIDAD_ANUAL": 5,
+                 "MIN_DIFERENCIA_PORCENTUAL": -50, "MIN_BID": 0.5, "TOP_CONTRATOS": 3}
+}
+
+
+def configuracion(monkeypatch, perfiles=PERFILES, **entorno):
+    monkeypatch.setenv("TICKERS", "AAA")
+    monkeypatch.setenv("MIN_VOLATILIDAD_IMPLICITA", "0")
+    for nombre, valor in entorno.items():
+        monkeypatch.setenv(nombre, str(valor))
+    monkeypatch.setenv("PERFILES", json.dumps(perfiles))
+    return obtener_configuracion(mostrar=False)
+
+
+def test_los_perfiles_heredan_la_configuracion_general(monkeypatch):
+    config, avisos = configuracion(monkeypatch, MIN_BID=0.2)
+    conservador, agresivo = config.perfiles
+
+    assert avisos == []
+    assert (conservador.nombre, agresivo.nombre) == ("conservador", "agresivo")
+    assert conservador.filtros["MIN_BID"] == 0.2
+    assert agresivo.filtros["MIN_BID"] == 0.5
+    assert agresivo.filtros["FILTRO_TIPO_OPCION"] == "ITM"
+    assert isinstance(agresivo.filtros["MIN_RENTABILIDAD_ANUAL"], float)
+    assert (conservador.top_contratos, agresivo.top_contratos) == (DEFAULT_CONFIG["TOP_CONTRATOS"], 3)
+
+
+def test_perfiles_invalidos(monkeypatch):
+    with pytest.raises(ValueError, match="Clave no admitida"):
+        configuracion(monkeypatch, {"a": {"TICKERS": "BBB"}})
+    with pytest.raises(ValueError, match="Nombre de perfil inválido"):
+        configuracion(monkeypatch, {"a b": {}})
+    with pytest.raises(ValueError, match="MAX_DIAS_VENCIMIENTO"):
+        configuracion(monkeypatch, {"a": {"MAX_DIAS_VENCIMIENTO": "muchos"}})
+    config, avisos = configuracion(monkeypatch, {"a": {"FILTRO_TIPO_OPCION": "LEJOS"}})
+    assert config.perfiles[0].filtros["FILTRO_TIPO_OPCION"] == DEFAULT_CONFIG["FILTRO_TIPO_OPCION"]
+    assert avisos and avisos[0].startswith("[a] ")
+
+
+def test_filtros_envolventes(monkeypatch):
+    config, _ = configuracion(monkeypatch)
+    envolventes = filtros_envolventes(config.perfiles)
+
+    assert envolventes["MAX_DIAS_VENCIMIENTO"] == 60
+    assert envolventes["FILTRO_TIPO_OPCION"] == "TODAS"
+    assert envolventes["MIN_RENTABILIDAD_ANUAL"] == 5
+    assert envolventes["MIN_DIFERENCIA_PORCENTUAL"] == -50
+    assert envolventes["MIN_BID"] == min(DEFAULT_CONFIG["MIN_BID"], 0.5)
+    assert envolventes["MAX_DELTA"] == DEFAULT_CONFIG["MAX_DELTA"]
+
+    # Con el mismo lado en todos los perfiles no hace falta descargar los dos
+    mismos_lados = {"a": {"FILTRO_TIPO_OPCION": "OTM"}, "b": {"FILTRO_TIPO_OPCION": "OTM", "MAX_DIAS_VENCIMIENTO": 10}}
+    config, _ = configuracion(monkeypatch, mismos_lados)
+    assert filtros_envolventes(config.perfiles)["FILTRO_TIPO_OPCION"] == "OTM"
+
+
+def test_aplicar_perfil_da_lo_mismo_que_filtrar_cada_perfil_por_separado(monkeypatch):
+    config, _ = configuracion(monkeypatch)
+    ahora = datetime.now()
+    proveedor = ProveedorSintetico(num_vencimientos=10, fecha_base=ahora.replace(hour=0, minute=0, second=0, microsecond=0))
+    cadena = pd.concat([proveedor.cadena("CCC", vencimiento) for vencimiento in proveedor.vencimientos("CCC")],
+                       ignore_index=True)
+    precio = proveedor.cotizacion("CCC")["precio"]
+
+    envolventes = filtrar_opciones(cadena, "CCC", precio, filtros_envolventes(config.perfiles), ahora)
+    for perfil in config.perfiles:
+        por_separado = filtrar_opciones(cadena, "CCC", precio, perfil.filtros, ahora).reset_index(drop=True)
+        assert len(por_separado) > 0
+        pd.testing.assert_frame_equal(aplicar_perfil(envolventes, precio, perfil.filtros), por_separado)
@@ -0,0 +1,54 @@
+from datetime import date
+
+import pandas as pd
+
+from contratos import CAMPOS, Contrato, Spread, a_dias, contrato_de_textos, contratos_de_tabla, desde_dias
+
+
+def tabla_contratos():
+    return pd.DataFrame({
+        "ticker": ["AAA", "AAA", "BBB"], "strike": [95.0, 100.0, 40.5], "lastPrice": [1.2, 2.3, 0.8],
+        "bid": [1.1, 2.2, 0.75], "vencimiento": ["2026-11-20", "2026-12-18", "2026-11-20"],
+        "dias_vencimiento": [33, 61, 33], "rentabilidad_diaria": [0.035, 0.036, 0.056],
+        "rentabilidad_anual": [12.6, 13.1, 20.4], "break_even": [93.9, 97.8, 39.75],
+        "diferencia_porcentual": [6.1, 2.2, 12.3], "volatilidad_implícita": [31.0, 29.5, 55.2],
+        "volumen": [120, 30, 5], "open_interest": [1500, 800, 60], "delta": [-0.21, -0.38, -0.12],
+        "theta": [-0.03, -0.02, -0.01], "prob_beneficio": [0.81, 0.66, 0.9],
+        "source": ["Yahoo Finance", "Yahoo + Finnhub", "Yahoo Finance"]
+    }, columns=CAMPOS["put"])
+
+
+def test_contratos_de_tabla():
+    contratos = contratos_de_tabla(tabla_contratos())
+
+    assert [type(contrato) for contrato in contratos] == [Contrato] * 3
+    assert contratos[0].vencimiento == a_dias(date(2026, 11, 20)) == (date(2026, 11, 20) - date(1970, 1, 1)).days
+    assert desde_dias(contratos[1].vencimiento) == date(2026, 12, 18)
+    assert [contrato.vencimiento_texto for contrato in contratos] == ["2026-11-20", "2026-12-18", "2026-11-20"]
+    # Textos internados: un único objeto por valor
+    assert contratos[0].ticker is contratos[1].ticker
+    assert contratos[0].source is contratos[2].source
+    assert contratos[1].clave == ("AAA", "2026-12-18", 100.0, 0.0)
+    assert not hasattr(contratos[0], "__dict__")
+    assert contratos_de_tabla(tabla_contratos().iloc[0:0]) == []
+
+
+def test_valores_y_textos_ida_y_vuelta():
+    for contrato in contratos_de_tabla(tabla_contratos()):
+        textos = [str(valor) for valor in contrato.valores()]
+        assert contrato_de_textos(textos) == contrato
+
+
+def test_spread():
+    tabla = pd.DataFrame([{
+        "ticker": "AAA", "strike": 100.0, "strike_largo": 95.0, "bid": 2.2, "credito": 1.1, "ancho": 5.0,
+        "vencimiento": "2026-11-20", "dias_vencimiento": 33, "rentabilidad_riesgo": 28.2, "rentabilidad_anual": 312.0,
+        "break_even": 98.9, "diferencia_porcentual": 3.1, "volatilidad_implícita": 30.0, "volumen": 30,
+        "open_interest": 800, "delta": -0.17, "theta": 0.01, "prob_beneficio": 0.7, "source": "Yahoo Finance"
+    }], columns=CAMPOS["spread"])
+    spread, = contratos_de_tabla(tabla, Spread)
+
+    assert spread.clave == ("AAA", "2026-11-20", 100.0, 95.0)
+    assert spread.prima == 1.1
+    assert spread.perdida_maxima == 3.9
+    assert spread.strikes_texto == "$100.00/$95.00"
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from estrategias import pares_bull_put
+
+PRECIO = 100.0
+
+
+def cadena(n=120, semilla=5):
+    aleatorio = np.random.default_rng(semilla)
+    vencimiento = aleatorio.integers(0, 3, n)
+    strike = aleatorio.choice(np.arange(70.0, 101.0, 2.5), n)
+    bid = np.round(np.maximum(strike - 80, 0) * 0.2 + aleatorio.uniform(0, 1.5, n), 2)
+    coste = np.round(bid + aleatorio.uniform(0, 0.3, n), 2)
+    es_corta = aleatorio.random(n) < 0.7
+    es_larga = aleatorio.random(n) < 0.7
+    return vencimiento, strike, bid, coste, es_corta, es_larga
+
+
+def fuerza_bruta(vencimiento, strike, bid, coste, es_corta, es_larga, max_ancho, min_credito, min_diferencia):
+    pares = set()
+    for i in np.flatnonzero(es_corta):
+        for j in np.flatnonzero(es_larga):
+            ancho = strike[i] - strike[j]
+            credito = bid[i] - coste[j]
+            diferencia = 100 * (PRECIO - (strike[i] - credito)) / PRECIO
+            if (vencimiento[i] == vencimiento[j] and 0 < ancho <= max_ancho and min_credito <= credito < ancho
+                    and diferencia >= min_diferencia):
+                pares.add((i, j))
+    return pares
+
+
+@pytest.mark.parametrize("max_pares_bloque", [1, 37, 1000000])
+def test_coincide_con_la_enumeracion_completa(max_pares_bloque):
+    vencimiento, strike, bid, coste, es_corta, es_larga = cadena()
+    cortas, largas = pares_bull_put(vencimiento, strike, bid, coste, es_corta, es_larga, PRECIO,
+                                    max_ancho=10, min_credito=0.1, min_diferencia=5, max_pares_bloque=max_pares_bloque)
+
+    pares = set(zip(cortas.tolist(), largas.tolist()))
+    assert len(pares) == len(cortas)
+    assert pares == fuerza_bruta(vencimiento, strike, bid, coste, es_corta, es_larga, 10, 0.1, 5)
+    assert pares
+
+
+def test_invariantes_de_los_pares():
+    vencimiento, strike, bid, coste, es_corta, es_larga = cadena(300, semilla=11)
+    cortas, largas = pares_bull_put(vencimiento, strike, bid, coste, es_corta, es_larga, PRECIO,
+                                    max_ancho=7.5, min_credito=0.05, min_diferencia=0)
+    ancho = strike[cortas] - strike[largas]
+    credito = bid[cortas] - coste[largas]
+    assert len(cortas)
+    assert np.all(vencimiento[cortas] == vencimiento[largas])
+    assert np.all(es_corta[cortas] & es_larga[largas])
+    assert np.all((ancho > 0) & (ancho <= 7.5))
+    assert np.all((credito >= 0.05) & (credito < ancho))
+
+
+def test_sin_patas_largas():
+    vencimiento, strike, bid, coste, es_corta, _ = cadena()
+    cortas, largas = pares_bull_put(vencimiento, strike, bid, coste, es_corta, np.zeros_like(es_corta), PRECIO,
+                                    max_ancho=10, min_credito=0, min_diferencia=0)
+    assert len(cortas) == len(largas) == 0
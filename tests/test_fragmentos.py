@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from fragmentos import asignar_fragmentos
+
+
+def universo(n=200, semilla=3):
+    aleatorio = random.Random(semilla)
+    tickers = [f"T{indice:03d}" for indice in range(n)]
+    # Cadenas de tamaño muy desigual: unas pocas enormes y una cola larga de pequeñas
+    pesos = {ticker: round(aleatorio.paretovariate(1.2) * 100) for ticker in tickers}
+    return tickers, pesos
+
+
+@pytest.mark.parametrize("num_fragmentos", [1, 4, 7])
+def test_reparto_por_peso_equilibrado(num_fragmentos):
+    tickers, pesos = universo()
+    fragmentos = asignar_fragmentos(tickers, num_fragmentos, pesos)
+
+    assert sorted(t for lista, _ in fragmentos for t in lista) == sorted(tickers)
+    for lista, total in fragmentos:
+        assert lista == [t for t in tickers if t in set(lista)]
+        assert total == pytest.approx(sum(pesos[t] for t in lista))
+    # Garantía de LPT: la diferencia entre el fragmento más cargado y el menos no supera el ticker más pesado
+    cargas = [total for _, total in fragmentos]
+    assert max(cargas) - min(cargas) <= max(pesos.values())
+    assert max(cargas) <= max(sum(pesos.values()) / num_fragmentos * 4 / 3, max(pesos.values()))
+
+
+def test_reparto_determinista_e_independiente_del_orden():
+    tickers, pesos = universo()
+    desordenados = random.Random(1).sample(tickers, len(tickers))
+    primero = asignar_fragmentos(tickers, 5, pesos)
+    assert asignar_fragmentos(tickers, 5, pesos) == primero
+    assert [sorted(lista) for lista, _ in asignar_fragmentos(desordenados, 5, pesos)] == [sorted(lista) for lista, _ in primero]
+
+
+def test_pesos_desconocidos_reciben_la_mediana():
+    fragmentos = asignar_fragmentos(["A", "B", "C", "D"], 2, {"A": 10, "B": 2, "C": 4})
+    assert sorted(total for _, total in fragmentos) == [10.0, 10.0]
+
+
+def test_reparto_por_hash_estable():
+    tickers, _ = universo()
+    fragmento = {t: i for i, (lista, _) in enumerate(asignar_fragmentos(tickers, 6, modo="hash")) for t in lista}
+    parcial = asignar_fragmentos(tickers[::3], 6, modo="hash")
+    assert all(fragmento[t] == i for i, (lista, _) in enumerate(parcial) for t in lista)
+
+
+def test_modo_invalido():
+    with pytest.raises(ValueError):
+        asignar_fragmentos(["A"], 2, modo="aleatorio")
@@ -0,0 +1,68 @@
+import csv
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from contratos import Contrato, contratos_de_arrow, contratos_de_tabla
+from informes import SalidaContratos, SalidaParquet
+from test_contratos import tabla_contratos
+
+
+def test_parquet_ida_y_vuelta(tmp_path):
+    contratos = contratos_de_tabla(tabla_contratos())
+    ruta = str(tmp_path / "todas_las_opciones.parquet")
+    # Grupos de dos filas para que el fichero tenga varios
+    with SalidaParquet(ruta, Contrato, filas_por_grupo=2) as salida:
+        for contrato in contratos:
+            salida.escribir([contrato])
+
+    fichero = pq.ParquetFile(ruta)
+    assert fichero.metadata.num_row_groups == 2
+    tabla = pq.read_table(ruta)
+    tipos = dict(zip(tabla.schema.names, tabla.schema.types))
+    assert tipos["vencimiento"] == pa.date32()
+    assert tipos["ticker"] == tipos["source"] == pa.dictionary(pa.int32(), pa.string())
+    assert tipos["strike"] == pa.float64()
+    assert tipos["volumen"] == tipos["dias_vencimiento"] == pa.int32()
+    assert tabla.column("vencimiento").to_pylist() == [date(2026, 11, 20), date(2026, 12, 18), date(2026, 11, 20)]
+
+    leidos = contratos_de_arrow(tabla)
+    assert leidos == contratos
+    assert leidos[0].ticker is leidos[1].ticker
+    assert leidos[0].vencimiento == contratos[0].vencimiento
+
+
+def test_parquet_sin_registros_conserva_el_esquema(tmp_path):
+    ruta = str(tmp_path / "vacio.parquet")
+    SalidaParquet(ruta, Contrato).cerrar()
+    tabla = pq.read_table(ruta)
+    assert tabla.num_rows == 0
+    assert tabla.schema.metadata[b"estrategia"] == b"put"
+
+
+def test_solo_csv_borra_el_parquet_anterior(tmp_path):
+    ruta_csv = tmp_path / "mejores_contratos.csv"
+    ruta_parquet = tmp_path / "mejores_contratos.parquet"
+    ruta_parquet.write_bytes(b"de una ejecucion anterior")
+
+    with SalidaContratos(str(ruta_csv), "put", ["csv"]) as salida:
+        salida.escribir(contratos_de_tabla(tabla_contratos()))
+
+    assert not ruta_parquet.exists()
+    with open(ruta_csv, newline="") as f:
+        filas = list(csv.reader(f))
+    assert len(filas) == 4
+    assert filas[1][0] == "AAA"
+
+
+def test_solo_parquet_borra_el_csv_anterior(tmp_path):
+    ruta_csv = tmp_path / "todas_las_opciones.csv"
+    ruta_csv.write_text("de una ejecucion anterior\n")
+
+    with SalidaContratos(str(ruta_csv), "put", ["parquet"]) as salida:
+        salida.escribir(contratos_de_tabla(tabla_contratos()))
+
+    assert not ruta_csv.exists()
+    assert salida.filas == 3
+    assert len(contratos_de_arrow(pq.read_table(tmp_path / "todas_las_opciones.parquet"))) == 3
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+import analizar_opciones
+from analizar_opciones import calcular_limite, resultados_en_orden
+from configuracion import obtener_configuracion
+from proveedores import ProveedorSintetico
+
+
+class ProveedorBloqueado(ProveedorSintetico):
+    """Sintético que se queda colgado en la cadena de un vencimiento (o en todas) de los tickers `bloqueados`."""
+
+    def __init__(self, bloqueados, solo_un_vencimiento=True):
+        super().__init__(num_vencimientos=4)
+        self.bloqueados = bloqueados
+        self.solo_un_vencimiento = solo_un_vencimiento
+        self.liberar = threading.Event()
+
+    def cadena(self, ticker, vencimiento):
+        if ticker in self.bloqueados and (not self.solo_un_vencimiento or vencimiento == self.vencimientos(ticker)[1]):
+            self.liberar.wait(30)
+        return super().cadena(ticker, vencimiento)
+
+
+@pytest.fixture
+def entorno(monkeypatch):
+    monkeypatch.setenv("TICKERS", "AAA,LENTO,BBB")
+    monkeypatch.setattr(analizar_opciones, "COTIZACIONES", {})
+    monkeypatch.setattr(analizar_opciones, "CACHE", None)
+    monkeypatch.setattr(analizar_opciones, "ARCHIVO", None)
+    proveedores = []
+
+    def usar(proveedor):
+        proveedores.append(proveedor)
+        monkeypatch.setattr(analizar_opciones, "PROVEEDORES", [proveedor])
+        return obtener_configuracion(mostrar=False)[0]
+
+    yield usar
+    for proveedor in proveedores:
+        proveedor.liberar.set()
+
+
+def analizar(config, max_workers, plazo=None):
+    inicio = time.monotonic()
+    resultados = {ticker: futuro.result() for ticker, futuro in
+                  resultados_en_orden(config.tickers, config.perfiles, max_workers, plazo=plazo)}
+    return resultados, time.monotonic() - inicio
+
+
+def test_el_presupuesto_solo_afecta_al_ticker_lento(entorno, monkeypatch):
+    monkeypatch.setattr(analizar_opciones, "PRESUPUESTO_TICKER_SEGUNDOS", 1.0)
+    config = entorno(ProveedorBloqueado({"LENTO"}))
+    resultados, segundos = analizar(config, max_workers=4)
+
+    assert segundos < 10
+    assert {ticker: estado for ticker, (_, _, estado) in resultados.items()} == {
+        "AAA": "completo", "LENTO": "parcial", "BBB": "completo"}
+    # Solo queda pendiente la cadena colgada; las demás se filtran con normalidad
+    assert "Estado: parcial (tiempo agotado: Sintético: faltan 1 de 4 cadenas)" in resultados["LENTO"][0]
+    assert all("Estado:" not in texto for ticker, (texto, _, _) in resultados.items() if ticker != "LENTO")
+
+
+def test_sin_ninguna_cadena_el_ticker_queda_sin_tiempo(entorno, monkeypatch):
+    monkeypatch.setattr(analizar_opciones, "PRESUPUESTO_TICKER_SEGUNDOS", 1.0)
+    config = entorno(ProveedorBloqueado({"LENTO"}, solo_un_vencimiento=False))
+    resultados, _ = analizar(config, max_workers=8)
+
+    texto, opciones, estado = resultados["LENTO"]
+    assert estado == "tiempo agotado"
+    assert "Estado: tiempo agotado" in texto
+    assert not any(opciones.values())
+    assert resultados["AAA"][2] == resultados["BBB"][2] == "completo"
+
+
+def test_el_plazo_de_la_ejecucion_deja_de_programar_tickers(entorno, monkeypatch):
+    monkeypatch.setattr(analizar_opciones, "PRESUPUESTO_TICKER_SEGUNDOS", 60.0)
+    monkeypatch.setenv("TICKERS", "LENTO,AAA,BBB")
+    config = entorno(ProveedorBloqueado({"LENTO"}, solo_un_vencimiento=False))
+    # Con un solo hilo por pool AAA y BBB esperan a que LENTO termine, y para entonces el plazo ya pasó
+    resultados, segundos = analizar(config, max_workers=1, plazo=calcular_limite(1.0))
+
+    assert segundos < 10
+    assert [resultados[ticker][2] for ticker in ("LENTO", "AAA", "BBB")] == ["tiempo agotado", "sin analizar", "sin analizar"]
+    assert "Estado: sin analizar (plazo de la ejecución agotado)" in resultados["AAA"][0]
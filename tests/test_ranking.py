@@ -0,0 +1,36 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from ranking import RankingTopK, clave_rentabilidad
+
+
+def opciones_aleatorias(n, semilla=7):
+    aleatorio = random.Random(semilla)
+    # Valores redondeados para que haya empates y se compruebe la estabilidad
+    return [SimpleNamespace(ticker=aleatorio.choice("ABC"), rentabilidad_anual=aleatorio.randint(0, 20),
+                            dias_vencimiento=aleatorio.randint(1, 5), diferencia_porcentual=aleatorio.randint(0, 3),
+                            id=indice)
+            for indice in range(n)]
+
+
+@pytest.mark.parametrize("k", [1, 3, 10, 1000])
+def test_coincide_con_ordenar_todo(k):
+    opciones = opciones_aleatorias(500)
+    predicado = lambda opcion: opcion.rentabilidad_anual >= 5
+    ranking = RankingTopK(k, top_global=k, predicado=predicado)
+    ranking.agregar_varias(opciones)
+
+    candidatas = sorted((opcion for opcion in opciones if predicado(opcion)), key=clave_rentabilidad)
+    assert [o.id for o in ranking.mejores_globales()] == [o.id for o in candidatas[:k]]
+    for ticker in "ABC":
+        esperadas = [o.id for o in candidatas if o.ticker == ticker][:k]
+        assert [o.id for o in ranking.mejores(ticker)] == esperadas
+
+
+def test_sin_top_global_y_ticker_desconocido():
+    ranking = RankingTopK(2, clave="rentabilidad")
+    ranking.agregar_varias(opciones_aleatorias(20))
+    assert ranking.mejores_globales() == []
+    assert ranking.mejores("Z") == []